@@ -1,7 +1,15 @@
-from typing import Dict, Any
+import datetime
+from typing import Dict, Any, Iterator, Optional
+
+def budget_result(new_budget: float, success: bool, dry_run: bool = False, error: Optional[str] = None) -> Dict[str, Any]:
+    """Outcome of one campaign's budget change, as returned by update_budgets."""
+    return {"success": success, "new_budget": new_budget, "dry_run": dry_run, "error": error}
 
 class AdPlatformConnector:
     """Abstract base class for Ad Platforms."""
+
+    # Can list only the campaigns changed since a given time (see iter_campaign_changes)
+    supports_incremental_sync = False
     
     def __init__(self, platform_name: str, config: Dict[str, Any]):
         self.platform_name = platform_name
@@ -11,15 +19,46 @@ class AdPlatformConnector:
         """Fetches active campaigns and their current budgets."""
         raise NotImplementedError
 
+    def iter_campaigns(self) -> Iterator[Dict[str, Any]]:
+        """Streams active campaigns (platforms with paginated APIs yield them page by page)."""
+        for campaign_id, campaign in self.get_campaigns().items():
+            yield {"platform_id": campaign_id, **campaign}
+
+    def iter_campaign_changes(self, since: Optional[datetime.datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        For the campaign mirror: the active campaigns when `since` is None,
+        otherwise the campaigns of any status updated after `since` (with
+        `updated_time` and `effective_status` when the platform reports them).
+        """
+        if since is not None:
+            raise NotImplementedError
+        return self.iter_campaigns()
+
     def update_budget(self, campaign_id: str, new_budget: float) -> bool:
         """Updates the budget for a specific campaign."""
         raise NotImplementedError
 
+    def update_budgets(self, changes: Dict[str, float]) -> Dict[str, Dict[str, Any]]:
+        """
+        Applies {campaign_id: new daily budget} and returns a budget_result per
+        campaign. Platforms with a bulk API override this; by default the
+        campaigns are updated one at a time.
+        """
+        results = {}
+        for campaign_id, new_budget in changes.items():
+            try:
+                success = self.update_budget(campaign_id, new_budget)
+                results[campaign_id] = budget_result(new_budget, success, error=None if success else "Update failed")
+            except Exception as e:
+                results[campaign_id] = budget_result(new_budget, False, error=str(e))
+        return results
+
 class MockAdConnector(AdPlatformConnector):
     """Mock implementation of an Ad Platform."""
     
     def __init__(self, platform_name: str = "mock_platform", config: Dict[str, Any] = None):
         super().__init__(platform_name, config or {})
+        self.dry_run = bool(self.config.get("dry_run", False))
         # Simulating initial state
         self._campaigns = {
             "campaign_1": {"name": "Alpha Launch", "daily_budget": 100.0, "status": "ACTIVE"},
@@ -38,3 +77,15 @@ class MockAdConnector(AdPlatformConnector):
             self._campaigns[campaign_id]["daily_budget"] = new_budget
             return True
         return False
+
+    def update_budgets(self, changes: Dict[str, float]) -> Dict[str, Dict[str, Any]]:
+        print(f"[{self.platform_name}] {'[DRY RUN] ' if self.dry_run else ''}UPDATING {len(changes)} BUDGETS")
+        results = {}
+        for campaign_id, new_budget in changes.items():
+            if campaign_id not in self._campaigns:
+                results[campaign_id] = budget_result(new_budget, False, self.dry_run, error="Campaign not found")
+                continue
+            if not self.dry_run:
+                self._campaigns[campaign_id]["daily_budget"] = new_budget
+            results[campaign_id] = budget_result(new_budget, True, self.dry_run)
+        return results
@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Any, Optional, Tuple
+from .ad_connector import AdPlatformConnector, budget_result
+
+logger = logging.getLogger(__name__)
+
+# Seconds a platform gets to return its campaigns (<PLATFORM>_TIMEOUT_SECONDS overrides it per platform)
+AD_PLATFORM_TIMEOUT_SECONDS = float(os.getenv("AD_PLATFORM_TIMEOUT_SECONDS", "20"))
+
+OK = "ok"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+# Shared by all tenants: a platform that times out keeps its thread until its
+# call returns, so the pool bounds how many such calls can pile up
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AD_PLATFORM_WORKERS", "16")), thread_name_prefix="ad-platforms"
+)
+
+def platform_timeout(platform: str) -> float:
+    return float(os.getenv(f"{platform.upper()}_TIMEOUT_SECONDS") or AD_PLATFORM_TIMEOUT_SECONDS)
+
+class CompositeAdConnector(AdPlatformConnector):
+    """
+    Fans out to several ad platforms at once, each with its own timeout.
+    Campaigns are merged into one map, tagged with their `platform`; a
+    platform that is slow or failing is reported in `platform_status`
+    instead of failing (or delaying) the others.
+    """
+
+    def __init__(self, connectors: Dict[str, AdPlatformConnector], timeouts: Optional[Dict[str, float]] = None):
+        super().__init__("composite", {})
+        self.connectors = connectors
+        self.timeouts = {name: (timeouts or {}).get(name) or platform_timeout(name) for name in connectors}
+        self.platform_status: Dict[str, Dict[str, Any]] = {}
+        # Merged campaign key -> (platform, campaign id on that platform), for update_budgets
+        self._routes: Dict[str, Tuple[str, str]] = {}
+
+    @staticmethod
+    def _timed(connector: AdPlatformConnector) -> Tuple[Dict[str, Any], float]:
+        start = time.monotonic()
+        campaigns = connector.get_campaigns()
+        return campaigns, time.monotonic() - start
+
+    def fetch(self) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+        """(merged campaigns, status per platform). Raises only when no platform answered."""
+        start = time.monotonic()
+        futures = {name: _executor.submit(self._timed, connector) for name, connector in self.connectors.items()}
+
+        results, status, first_error = {}, {}, None
+        # Shortest deadline first: every platform is waited for until its own deadline at most
+        for name in sorted(futures, key=self.timeouts.get):
+            future = futures[name]
+            try:
+                results[name], seconds = future.result(timeout=max(0.0, start + self.timeouts[name] - time.monotonic()))
+                status[name] = {"status": OK, "campaigns": len(results[name]), "seconds": round(seconds, 3)}
+            except FutureTimeout:
+                future.cancel()
+                first_error = first_error or TimeoutError(f"{name}: no campaigns after {self.timeouts[name]}s")
+                status[name] = {"status": TIMEOUT, "seconds": self.timeouts[name]}
+                logger.warning(f"{name}: no campaigns after {self.timeouts[name]}s, answering without them")
+            except Exception as e:
+                first_error = first_error or e
+                status[name] = {"status": ERROR, "error": str(e), "seconds": round(time.monotonic() - start, 3)}
+                logger.error(f"{name}: error fetching campaigns: {e}")
+
+        status = {name: status[name] for name in self.connectors}
+        self.platform_status = status
+        if not results and first_error is not None:
+            raise first_error
+
+        campaigns, routes = {}, {}
+        for name in self.connectors:
+            for campaign_id, campaign in results.get(name, {}).items():
+                # Ids are only unique per platform
+                key = campaign_id if campaign_id not in campaigns else f"{name}:{campaign_id}"
+                campaigns[key] = {**campaign, "platform": name}
+                routes[key] = (name, campaign_id)
+        self._routes = routes
+        return campaigns, status
+
+    def get_campaigns(self) -> Dict[str, Any]:
+        return self.fetch()[0]
+
+    def update_budgets(self, changes: Dict[str, float]) -> Dict[str, Dict[str, Any]]:
+        """Sends each platform its share of the changes, all platforms at once (keys from the last fetch)."""
+        per_platform: Dict[str, Dict[str, float]] = {}
+        results = {}
+        for key, new_budget in changes.items():
+            route = self._routes.get(key)
+            if route is None:
+                results[key] = budget_result(new_budget, False, error="Unknown campaign (fetch campaigns first)")
+                continue
+            per_platform.setdefault(route[0], {})[route[1]] = new_budget
+
+        futures = {
+            name: _executor.submit(self.connectors[name].update_budgets, platform_changes)
+            for name, platform_changes in per_platform.items()
+        }
+        keys = {route: key for key, route in self._routes.items()}
+        for name, future in futures.items():
+            try:
+                platform_results = future.result()
+            except Exception as e:
+                platform_results = {c: budget_result(b, False, error=str(e)) for c, b in per_platform[name].items()}
+            for campaign_id, result in platform_results.items():
+                results[keys[(name, campaign_id)]] = result
+        return results
+
+    def update_budget(self, campaign_id: str, new_budget: float) -> bool:
+        return self.update_budgets({campaign_id: new_budget})[campaign_id]["success"]
@@ -0,0 +1,162 @@
+import os
+import logging
+import threading
+from typing import Dict, Any, Optional, Sequence, Tuple
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+
+logger = logging.getLogger(__name__)
+
+
+class GoogleClientRegistry:
+    """
+    Process-wide cache of Google API credentials and service objects.
+
+    - Credentials: one object per (service account file, scopes), shared by
+      every tenant, so its access token is fetched once and reused until it
+      is close to expiry (google-auth treats a token as invalid a few minutes
+      before it actually expires) instead of once per connector.
+    - Discovery documents: read once from the copy bundled with
+      google-api-python-client (no network, no per-build file read).
+    - Service objects: httplib2 is not thread-safe, so each thread gets its
+      own service per (api, version, endpoint, credentials), built once and
+      reused by every later request handled on that thread. Nested resources
+      (`service.spreadsheets().values()`) are rebuilt by the client library on
+      every access, which costs more than the request itself: get_resource
+      caches them per thread as well.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_locks: Dict[Tuple, threading.Lock] = {}
+        self._credentials: Dict[Tuple, Credentials] = {}
+        self._documents: Dict[Tuple[str, str], str] = {}
+        self._local = threading.local()
+        self.stats_counters = {"credentials_loaded": 0, "token_refreshes": 0, "services_built": 0}
+
+    @staticmethod
+    def _credentials_key(service_account_path: str, scopes: Sequence[str]) -> Tuple:
+        return (os.path.abspath(service_account_path), tuple(sorted(scopes)))
+
+    def get_credentials(self, service_account_path: str, scopes: Sequence[str]) -> Credentials:
+        key = self._credentials_key(service_account_path, scopes)
+        creds = self._credentials.get(key)
+        if creds is not None:
+            return creds
+
+        with self._lock:
+            creds = self._credentials.get(key)
+            if creds is None:
+                if not os.path.exists(service_account_path):
+                    raise FileNotFoundError(
+                        f"Service account file not found at {service_account_path}. "
+                        "Please download it from Google Cloud Console > IAM > Service Accounts."
+                    )
+                creds = Credentials.from_service_account_file(service_account_path, scopes=list(scopes))
+                self._credentials[key] = creds
+                self.stats_counters["credentials_loaded"] += 1
+                logger.info(f"[GoogleClientRegistry] Loaded credentials for {creds.service_account_email}")
+        return creds
+
+    def _ensure_fresh(self, key: Tuple, creds: Credentials):
+        if creds.valid:
+            return
+        # Only one thread refreshes, the others reuse its token
+        with self._refresh_locks.setdefault(key, threading.Lock()):
+            if not creds.valid:
+                creds.refresh(Request())
+                self.stats_counters["token_refreshes"] += 1
+
+    def get_access_token(self, service_account_path: str, scopes: Sequence[str]) -> str:
+        """Shared OAuth access token, refreshed only when near expiry."""
+        creds = self.get_credentials(service_account_path, scopes)
+        self._ensure_fresh(self._credentials_key(service_account_path, scopes), creds)
+        return creds.token
+
+    def _get_document(self, api: str, version: str) -> str:
+        key = (api, version)
+        document = self._documents.get(key)
+        if document is None:
+            document = discovery_cache.get_static_doc(api, version)
+            if document is None:
+                raise ValueError(f"No bundled discovery document for {api} {version}")
+            self._documents[key] = document
+        return document
+
+    def get_service(
+        self,
+        api: str,
+        version: str,
+        service_account_path: str,
+        scopes: Sequence[str],
+        api_url: Optional[str] = None
+    ):
+        """Service object for the calling thread, with a token valid for this call."""
+        creds = self.get_credentials(service_account_path, scopes)
+        creds_key = self._credentials_key(service_account_path, scopes)
+        self._ensure_fresh(creds_key, creds)
+
+        services = getattr(self._local, "services", None)
+        if services is None:
+            services = self._local.services = {}
+
+        key = (api, version, api_url, creds_key)
+        service = services.get(key)
+        if service is None:
+            client_options = {"api_endpoint": api_url} if api_url else None
+            service = build_from_document(
+                self._get_document(api, version),
+                credentials=creds,
+                client_options=client_options
+            )
+            services[key] = service
+            with self._lock:
+                self.stats_counters["services_built"] += 1
+        return service
+
+    def get_resource(
+        self,
+        api: str,
+        version: str,
+        service_account_path: str,
+        scopes: Sequence[str],
+        path: str,
+        api_url: Optional[str] = None
+    ):
+        """Nested resource like "spreadsheets.values" of get_service(...), cached per thread."""
+        service = self.get_service(api, version, service_account_path, scopes, api_url=api_url)
+
+        resources = getattr(self._local, "resources", None)
+        if resources is None:
+            resources = self._local.resources = {}
+
+        key = (id(service), path)
+        resource = resources.get(key)
+        if resource is None:
+            resource = service
+            for name in path.split("."):
+                resource = getattr(resource, name)()
+            resources[key] = resource
+        return resource
+
+    def clear(self):
+        """Drops everything (e.g. after rotating the service account key)."""
+        with self._lock:
+            self._credentials.clear()
+            self._refresh_locks.clear()
+            self._documents.clear()
+            self._local = threading.local()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats_counters,
+                "credentials": len(self._credentials),
+                "discovery_documents": len(self._documents)
+            }
+
+
+# Shared by every connector in the process
+google_clients = GoogleClientRegistry()
@@ -1,8 +1,13 @@
 import os
 import logging
-from typing import Optional
+import threading
+from collections import deque
+from typing import Optional, Callable, Dict, List
 from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+from .google_clients import google_clients
+from .google_sheet_connector import DRIVE_API_URL
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +20,20 @@ SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets'
 ]
 
+# File IDs reserved with files.generateIds per call, so a copy can be created
+# with a known ID and shared in the same batch request
+RESERVED_IDS_BATCH = 10
+
+# Drive rejects batches of more than 100 calls
+MAX_BATCH_REQUESTS = 100
+
+# Name of unassigned copies in the template pool (renamed when claimed)
+POOL_COPY_TITLE = "Antigravity - (available)"
+
+# Reserved file IDs, per service account
+_reserved_ids: Dict[str, deque] = {}
+_reserved_ids_lock = threading.Lock()
+
 
 class GoogleDriveService:
     """
@@ -22,75 +41,114 @@ class GoogleDriveService:
     Uses a Service Account for server-to-server authentication.
     """
 
-    def __init__(self, credentials_path: str = "service_account.json"):
+    def __init__(self, credentials_path: str = "service_account.json", api_url: Optional[str] = None):
         self.credentials_path = credentials_path
-        self._drive_service = None
-        self._sheets_service = None
+        self.api_url = (api_url or DRIVE_API_URL).rstrip("/")
 
     def _get_credentials(self) -> Credentials:
-        """Load service account credentials."""
-        if not os.path.exists(self.credentials_path):
-            raise FileNotFoundError(
-                f"Service account file not found at {self.credentials_path}. "
-                "Please download it from Google Cloud Console > IAM > Service Accounts."
-            )
-        return Credentials.from_service_account_file(self.credentials_path, scopes=SCOPES)
+        """Service account credentials (shared process-wide, see google_clients)."""
+        return google_clients.get_credentials(self.credentials_path, SCOPES)
 
     def _get_drive_service(self):
-        """Get or create Google Drive API service."""
-        if not self._drive_service:
-            creds = self._get_credentials()
-            self._drive_service = build('drive', 'v3', credentials=creds)
-        return self._drive_service
+        """Google Drive API service for the calling thread."""
+        return google_clients.get_service('drive', 'v3', self.credentials_path, SCOPES, api_url=self.api_url)
 
     def _get_sheets_service(self):
-        """Get or create Google Sheets API service."""
-        if not self._sheets_service:
-            creds = self._get_credentials()
-            self._sheets_service = build('sheets', 'v4', credentials=creds)
-        return self._sheets_service
+        """Google Sheets API service for the calling thread."""
+        return google_clients.get_service('sheets', 'v4', self.credentials_path, SCOPES)
+
+    def _get_drive_resource(self, path: str):
+        """Drive resource like "files" for the calling thread (building one is not free)."""
+        return google_clients.get_resource('drive', 'v3', self.credentials_path, SCOPES, path, api_url=self.api_url)
+
+    def _batch_uri(self) -> str:
+        # new_batch_http_request() always targets googleapis.com: derive it from api_url
+        root = self.api_url[:-len("/drive/v3")] if self.api_url.endswith("/drive/v3") else self.api_url
+        return f"{root}/batch/drive/v3"
 
-    def copy_template(self, client_name: str, client_email: Optional[str] = None, folder_id: Optional[str] = None) -> dict:
+    def _reserve_file_ids(self, count: int) -> List[str]:
+        """File IDs from files.generateIds (fetched at least RESERVED_IDS_BATCH at a time)."""
+        key = os.path.abspath(self.credentials_path)
+        with _reserved_ids_lock:
+            ids = _reserved_ids.setdefault(key, deque())
+            reserved = [ids.popleft() for _ in range(min(count, len(ids)))]
+        missing = count - len(reserved)
+        if missing:
+            generated = self._get_drive_resource("files").generateIds(
+                count=max(missing, RESERVED_IDS_BATCH), space='drive'
+            ).execute()["ids"]
+            reserved.extend(generated[:missing])
+            with _reserved_ids_lock:
+                _reserved_ids[key].extend(generated[missing:])
+        return reserved
+
+    def copy_template(
+        self,
+        client_name: str,
+        client_email: Optional[str] = None,
+        folder_id: Optional[str] = None,
+        on_progress: Optional[Callable[[str], None]] = None
+    ) -> dict:
         """
         Copy the template spreadsheet for a new client.
 
+        The copy is created with a reserved file ID so that it and its
+        permission go out as one batch HTTP request.
+
         Args:
             client_name: Name of the client (used in the new spreadsheet title)
             client_email: Optional email to share the new spreadsheet with
             folder_id: Optional ID of the parent folder to create the file in (to use owner's quota)
+            on_progress: Optional callback receiving the current step ("copying", "sharing")
 
         Returns:
             dict with 'spreadsheet_id' and 'spreadsheet_url'
         """
-        drive = self._get_drive_service()
-
         # 1. Copy the template
         new_title = f"Antigravity - {client_name}"
-        copy_metadata = {'name': new_title}
-        
-        if folder_id:
-            copy_metadata['parents'] = [folder_id]
 
         try:
-            copied_file = drive.files().copy(
-                fileId=TEMPLATE_SPREADSHEET_ID,
-                body=copy_metadata,
-                supportsAllDrives=True
-            ).execute()
+            spreadsheet_id = self._reserve_file_ids(1)[0]
+            copy_metadata = {'id': spreadsheet_id, 'name': new_title}
+            if folder_id:
+                copy_metadata['parents'] = [folder_id]
 
-            spreadsheet_id = copied_file.get('id')
-            spreadsheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
+            if on_progress:
+                on_progress("copying")
+
+            # 2. Permissions Management, in the same batch:
+            # share with a specific user, or fallback: make it accessible to
+            # anyone with the link (Writer) so the user who clicked the
+            # button can actually open it
+            responses = self._execute_batch({
+                "copy": self._get_drive_resource("files").copy(
+                    fileId=TEMPLATE_SPREADSHEET_ID,
+                    body=copy_metadata,
+                    supportsAllDrives=True
+                ),
+                "permission": self._permission_request(spreadsheet_id, client_email)
+            })
+
+            _, copy_error = responses["copy"]
+            if copy_error is not None:
+                raise copy_error
 
+            spreadsheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
             logger.info(f"Created new spreadsheet: {new_title} (ID: {spreadsheet_id})")
 
-            # 2. Permissions Management
-            if client_email:
-                # Share with specific user
-                self._share_with_user(spreadsheet_id, client_email)
+            _, permission_error = responses["permission"]
+            if permission_error is None:
+                logger.info(f"Shared spreadsheet {spreadsheet_id} with {client_email or 'anyone'} as writer")
+            elif isinstance(permission_error, HttpError) and permission_error.resp.status == 404:
+                # Batched calls may run in any order: the copy did not exist yet
+                if on_progress:
+                    on_progress("sharing")
+                if client_email:
+                    self._share_with_user(spreadsheet_id, client_email)
+                else:
+                    self._share_publicly(spreadsheet_id)
             else:
-                # Fallback: Make it accessible to anyone with the link (Writer)
-                # This ensures the user who clicked the button can actually open it
-                self._share_publicly(spreadsheet_id)
+                logger.warning(f"Could not share {spreadsheet_id}: {permission_error}")
 
             return {
                 "spreadsheet_id": spreadsheet_id,
@@ -102,24 +160,137 @@ class GoogleDriveService:
             logger.error(f"Error copying template: {e}")
             raise
 
-    def _share_with_user(self, file_id: str, email: str, role: str = "writer"):
+    def _execute_batch(self, requests: Dict[str, object]) -> Dict[str, tuple]:
+        """Sends {request_id: request} as one batch; returns {request_id: (response, exception)}."""
+        responses = {}
+
+        def collect(request_id, response, exception):
+            responses[request_id] = (response, exception)
+
+        batch = BatchHttpRequest(callback=collect, batch_uri=self._batch_uri())
+        for request_id, request in requests.items():
+            batch.add(request, request_id=request_id)
+        batch.execute()
+        return responses
+
+    # --- Pre-copied template pool (see app.template_pool) ---
+
+    def get_template_revision(self) -> str:
+        """Drive version of the master template (changes on every edit)."""
+        template = self._get_drive_resource("files").get(
+            fileId=TEMPLATE_SPREADSHEET_ID,
+            fields="version",
+            supportsAllDrives=True
+        ).execute()
+        return str(template["version"])
+
+    def create_pool_copies(self, count: int, folder_id: Optional[str] = None) -> List[str]:
+        """Copies the template `count` times in one batch request; returns the IDs created."""
+        files = self._get_drive_resource("files")
+        requests = {}
+        for file_id in self._reserve_file_ids(min(count, MAX_BATCH_REQUESTS)):
+            metadata = {'id': file_id, 'name': POOL_COPY_TITLE}
+            if folder_id:
+                metadata['parents'] = [folder_id]
+            requests[metadata['id']] = files.copy(
+                fileId=TEMPLATE_SPREADSHEET_ID,
+                body=metadata,
+                supportsAllDrives=True
+            )
+
+        created = []
+        for file_id, (_, error) in self._execute_batch(requests).items():
+            if error is None:
+                created.append(file_id)
+            else:
+                logger.warning(f"Could not create pool copy: {error}")
+        logger.info(f"Created {len(created)} template pool copies")
+        return created
+
+    def claim_pool_copy(
+        self,
+        file_id: str,
+        client_name: str,
+        client_email: Optional[str] = None,
+        folder_id: Optional[str] = None
+    ) -> dict:
         """
-        Share a file with a specific user.
+        Turns a pool copy into a client spreadsheet: renames it (and moves it
+        to `folder_id`) and shares it, in one batch request.
+        Same result as copy_template.
         """
-        drive = self._get_drive_service()
+        new_title = f"Antigravity - {client_name}"
+        files = self._get_drive_resource("files")
+        update_params = {}
+        if folder_id:
+            # A file has a single parent (the pool folder or the service
+            # account's root): moving it must remove the current one
+            parents = files.get(fileId=file_id, fields="parents", supportsAllDrives=True).execute().get("parents", [])
+            if folder_id in parents:
+                parents.remove(folder_id)
+            else:
+                update_params['addParents'] = folder_id
+            if parents:
+                update_params['removeParents'] = ",".join(parents)
+
+        responses = self._execute_batch({
+            "update": files.update(
+                fileId=file_id,
+                body={'name': new_title},
+                supportsAllDrives=True,
+                **update_params
+            ),
+            "permission": self._permission_request(file_id, client_email)
+        })
+        _, update_error = responses["update"]
+        if update_error is not None:
+            raise update_error
+        _, permission_error = responses["permission"]
+        if permission_error is not None:
+            logger.warning(f"Could not share {file_id}: {permission_error}")
 
-        permission = {
-            'type': 'user',
-            'role': role,
-            'emailAddress': email
+        return {
+            "spreadsheet_id": file_id,
+            "spreadsheet_url": f"https://docs.google.com/spreadsheets/d/{file_id}/edit",
+            "title": new_title
         }
 
-        try:
-            drive.permissions().create(
+    def delete_files(self, file_ids: List[str]) -> int:
+        """Deletes files in batches; returns how many are gone (already missing ones included)."""
+        files = self._get_drive_resource("files")
+        deleted = 0
+        for start in range(0, len(file_ids), MAX_BATCH_REQUESTS):
+            chunk = file_ids[start:start + MAX_BATCH_REQUESTS]
+            responses = self._execute_batch({
+                file_id: files.delete(fileId=file_id, supportsAllDrives=True) for file_id in chunk
+            })
+            for file_id, (_, error) in responses.items():
+                if error is None or (isinstance(error, HttpError) and error.resp.status == 404):
+                    deleted += 1
+                else:
+                    logger.warning(f"Could not delete {file_id}: {error}")
+        return deleted
+
+    def _permission_request(self, file_id: str, email: Optional[str] = None, role: str = "writer"):
+        """permissions.create request sharing a file with `email`, or with anyone with the link."""
+        permissions = self._get_drive_resource("permissions")
+        if email:
+            return permissions.create(
                 fileId=file_id,
-                body=permission,
+                body={'type': 'user', 'role': role, 'emailAddress': email},
                 sendNotificationEmail=True
-            ).execute()
+            )
+        return permissions.create(
+            fileId=file_id,
+            body={'type': 'anyone', 'role': role}
+        )
+
+    def _share_with_user(self, file_id: str, email: str, role: str = "writer"):
+        """
+        Share a file with a specific user.
+        """
+        try:
+            self._permission_request(file_id, email, role).execute()
             logger.info(f"Shared spreadsheet {file_id} with {email} as {role}")
         except Exception as e:
             logger.warning(f"Could not share with {email}: {e}")
@@ -128,18 +299,8 @@ class GoogleDriveService:
         """
         Make a file accessible to anyone with the link.
         """
-        drive = self._get_drive_service()
-        
-        permission = {
-            'type': 'anyone',
-            'role': role
-        }
-        
         try:
-            drive.permissions().create(
-                fileId=file_id,
-                body=permission
-            ).execute()
+            self._permission_request(file_id, role=role).execute()
             logger.info(f"Shared spreadsheet {file_id} with anyone as {role}")
         except Exception as e:
              logger.warning(f"Could not share publicly: {e}")
@@ -0,0 +1,273 @@
+import hmac
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from .google_sheet_connector import GoogleSheetConnector
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("payload", "revision", "layout", "fetched_at", "checked_at", "stale")
+
+    def __init__(self, payload: Dict[str, Any], revision: Optional[str], layout, now: float):
+        self.payload = payload
+        self.revision = revision
+        self.layout = layout
+        self.fetched_at = now
+        self.checked_at = now
+        self.stale = False
+
+
+class SheetDataCache:
+    """
+    Per-spreadsheet cache of parsed sheet payloads (campaigns, global caps).
+
+    A cached payload is served until the spreadsheet changes:
+    - at most every `revision_check_seconds`, the Drive revision of the file
+      (files.get, fields=version) is compared with the one it was read at;
+      the values are only reread when it moved;
+    - with a webhook configured (`webhook_url` and a `webhook_token`), every
+      spreadsheet read is also subscribed to Drive push notifications, which
+      mark the entry stale as soon as Google reports a change (see
+      handle_notification);
+    - when the revision cannot be checked, entries expire after
+      `ttl_seconds`.
+
+    Failed reads are not cached: the previous payload (if any) is served
+    instead. Concurrent misses for the same spreadsheet share one read.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 900.0,
+        revision_check_seconds: float = 30.0,
+        webhook_url: Optional[str] = None,
+        webhook_token: str = "",
+        channel_ttl_seconds: int = 86400
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.revision_check_seconds = revision_check_seconds
+        self.webhook_url = webhook_url
+        self.webhook_token = webhook_token
+        if webhook_url and not webhook_token:
+            # The token is what authenticates notifications: no watch channels without one
+            logger.warning("[SheetDataCache] GOOGLE_DRIVE_WEBHOOK_TOKEN is not set, Drive push notifications are disabled")
+            self.webhook_url = None
+        self.channel_ttl_seconds = channel_ttl_seconds
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fill_locks: Dict[str, threading.Lock] = {}
+        # channel id -> (spreadsheet id, expires at)
+        self._channels: Dict[str, tuple] = {}
+        self._watched: Dict[str, float] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.revision_checks = 0
+        self.revision_changes = 0
+        self.push_invalidations = 0
+        self.ttl_expirations = 0
+        self.errors = 0
+        self.evictions = 0
+        self._served_age_total = 0.0
+        self._served_age_max = 0.0
+
+    def get(self, connector: GoogleSheetConnector) -> Dict[str, Any]:
+        spreadsheet_id = connector.spreadsheet_id
+        if not spreadsheet_id or self.max_size <= 0:
+            return connector.get_performance_data()
+
+        payload = self._lookup(connector)
+        if payload is not None:
+            return payload
+
+        with self._fill_locks.setdefault(spreadsheet_id, threading.Lock()):
+            # Another request may have refreshed it while we waited
+            payload = self._lookup(connector, count=False)
+            if payload is not None:
+                return payload
+            return self._fill(connector)
+
+    def _lookup(self, connector: GoogleSheetConnector, count: bool = True) -> Optional[Dict[str, Any]]:
+        spreadsheet_id = connector.spreadsheet_id
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(spreadsheet_id)
+            # A layout change (organization config) needs a new parse
+            if entry is None or entry.stale or entry.layout != connector.layout:
+                if count:
+                    self.misses += 1
+                return None
+            if now - entry.checked_at < self.revision_check_seconds:
+                return self._serve(spreadsheet_id, entry, now, count)
+
+        revision = self._get_revision(connector)
+
+        with self._lock:
+            if self._entries.get(spreadsheet_id) is not entry or entry.stale:
+                if count:
+                    self.misses += 1
+                return None
+            if revision is None:
+                # Checked (unsuccessfully): don't retry on every request
+                entry.checked_at = now
+                if now - entry.fetched_at < self.ttl_seconds:
+                    return self._serve(spreadsheet_id, entry, now, count)
+                self.ttl_expirations += 1
+            elif revision == entry.revision:
+                entry.checked_at = now
+                return self._serve(spreadsheet_id, entry, now, count)
+            else:
+                self.revision_changes += 1
+            entry.stale = True
+            if count:
+                self.misses += 1
+            return None
+
+    def _serve(self, spreadsheet_id: str, entry: _Entry, now: float, count: bool) -> Dict[str, Any]:
+        # Called with the lock held
+        self._entries.move_to_end(spreadsheet_id)
+        if not count:
+            return entry.payload
+        self.hits += 1
+        age = now - entry.fetched_at
+        self._served_age_total += age
+        self._served_age_max = max(self._served_age_max, age)
+        return entry.payload
+
+    def _get_revision(self, connector: GoogleSheetConnector) -> Optional[str]:
+        with self._lock:
+            self.revision_checks += 1
+        try:
+            return connector.get_revision()
+        except Exception as e:
+            logger.warning(f"[SheetDataCache] Revision check failed for {connector.spreadsheet_id}: {e}")
+            return None
+
+    def _fill(self, connector: GoogleSheetConnector) -> Dict[str, Any]:
+        spreadsheet_id = connector.spreadsheet_id
+        # Revision first: an edit made during the read is caught by the next check
+        revision = self._get_revision(connector)
+        try:
+            payload = connector.fetch_performance_data()
+        except Exception as e:
+            logger.error(f"[SheetDataCache] Error fetching sheet data: {e}")
+            with self._lock:
+                self.errors += 1
+                entry = self._entries.get(spreadsheet_id)
+                if entry is not None:
+                    # Serve the last good payload rather than an empty one
+                    return entry.payload
+            return connector._empty_payload()
+
+        now = time.monotonic()
+        with self._lock:
+            self._entries[spreadsheet_id] = _Entry(payload, revision, connector.layout, now)
+            self._entries.move_to_end(spreadsheet_id)
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._fill_locks.pop(evicted, None)
+                self.evictions += 1
+
+        if self.webhook_url:
+            self._ensure_watch(connector, now)
+        return payload
+
+    # --- Push notifications ---
+
+    def _ensure_watch(self, connector: GoogleSheetConnector, now: float):
+        spreadsheet_id = connector.spreadsheet_id
+        with self._lock:
+            if self._watched.get(spreadsheet_id, 0) > now:
+                return
+        channel_id = uuid.uuid4().hex
+        try:
+            channel = connector.watch(channel_id, self.webhook_url, self.webhook_token, self.channel_ttl_seconds)
+        except Exception as e:
+            # Revision checks still apply, the push channel is only a shortcut
+            logger.warning(f"[SheetDataCache] Could not watch {spreadsheet_id}: {e}")
+            return
+
+        # Drive may shorten the requested TTL: trust the returned expiration (ms)
+        expiration = channel.get("expiration")
+        ttl = (int(expiration) / 1000 - time.time()) if expiration else self.channel_ttl_seconds
+        expires_at = now + max(ttl, 0)
+        with self._lock:
+            self._channels[channel_id] = (spreadsheet_id, expires_at)
+            self._watched[spreadsheet_id] = expires_at
+            for cid, (_, channel_expires_at) in list(self._channels.items()):
+                if channel_expires_at <= now:
+                    del self._channels[cid]
+
+    def handle_notification(self, channel_id: str, token: str, resource_state: str) -> bool:
+        """
+        Processes a Drive push notification (X-Goog-Channel-ID,
+        X-Goog-Channel-Token, X-Goog-Resource-State headers).
+        Returns False when the token does not match (always, without a
+        configured token).
+        """
+        if not self.webhook_token or not hmac.compare_digest(token or "", self.webhook_token):
+            return False
+        if resource_state == "sync":
+            # Sent once when the channel is created, not a change
+            return True
+        with self._lock:
+            channel = self._channels.get(channel_id)
+            if channel is None:
+                return True
+            spreadsheet_id, _ = channel
+            if resource_state in ("remove", "trash"):
+                self._channels.pop(channel_id, None)
+                self._watched.pop(spreadsheet_id, None)
+            entry = self._entries.get(spreadsheet_id)
+            if entry is not None and not entry.stale:
+                entry.stale = True
+                self.push_invalidations += 1
+        return True
+
+    def invalidate(self, spreadsheet_id: Optional[str]):
+        if not spreadsheet_id:
+            return
+        with self._lock:
+            self._entries.pop(spreadsheet_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._channels.clear()
+            self._watched.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            lookups = self.hits + self.misses
+            ages = [now - e.fetched_at for e in self._entries.values()]
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "revision_check_seconds": self.revision_check_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "revision_checks": self.revision_checks,
+                "revision_changes": self.revision_changes,
+                "push_invalidations": self.push_invalidations,
+                "ttl_expirations": self.ttl_expirations,
+                "errors": self.errors,
+                "evictions": self.evictions,
+                "watched_spreadsheets": len(self._watched),
+                # Age of the data when served / currently held
+                "staleness": {
+                    "served_avg_seconds": round(self._served_age_total / self.hits, 3) if self.hits else 0.0,
+                    "served_max_seconds": round(self._served_age_max, 3),
+                    "oldest_entry_seconds": round(max(ages), 3) if ages else 0.0
+                }
+            }
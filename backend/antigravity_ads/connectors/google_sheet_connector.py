@@ -1,14 +1,32 @@
 import os
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
+from urllib.parse import quote
+import httpx
 from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from .sales_connector import SalesConnector
+from .google_clients import google_clients
+from .sheet_layout import SheetLayout, TEMPLATE_LAYOUTS, DEFAULT_LAYOUT_VERSION
 
 logger = logging.getLogger(__name__)
 
-# Scopes needed for reading spreadsheets
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+# Scopes needed for reading spreadsheets (and their Drive revision metadata)
+SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets.readonly',
+    'https://www.googleapis.com/auth/drive.metadata.readonly'
+]
+
+# API roots (overridable to point at a local stand-in server)
+SHEETS_API_URL = os.getenv("GOOGLE_SHEETS_API_URL", "https://sheets.googleapis.com")
+DRIVE_API_URL = os.getenv("GOOGLE_DRIVE_API_URL", "https://www.googleapis.com/drive/v3")
+
+# Ranges read from a sheet with the default template layout
+PERFORMANCE_RANGE, RESOURCES_RANGE = TEMPLATE_LAYOUTS[DEFAULT_LAYOUT_VERSION].ranges()
+
+# Field mask: only the cell values, no range/majorDimension metadata
+VALUES_FIELD_MASK = "valueRanges/values"
 
 
 class GoogleSheetConnector(SalesConnector):
@@ -16,135 +34,186 @@ class GoogleSheetConnector(SalesConnector):
     Fetches performance data from a Google Sheet using a Service Account.
     Each client gets their own unique spreadsheet (copied from template).
     The service account has access to all client sheets it creates.
+
+    Where the data sits is described by the organization's SheetLayout
+    (config "layout"). All ranges are read with a single values.batchGet call. Use
+    get_performance_data_async (or get_performance_data_many) to read
+    several spreadsheets concurrently.
     """
 
     def __init__(self, config: Dict[str, Any]):
         self.spreadsheet_id = config.get("spreadsheet_id")
         self.range_name = config.get("range_name", "Sheet1!A2:C")
+        self.api_url = config.get("api_url", SHEETS_API_URL).rstrip("/")
+        self.drive_api_url = config.get("drive_api_url", DRIVE_API_URL).rstrip("/")
+        self.layout = SheetLayout.from_config(config.get("layout"))
+        self.ranges = self.layout.ranges()
 
         # Service account path - relative to backend root
         base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         self.service_account_path = config.get("service_account_path", os.path.join(base_path, "service_account.json"))
 
-        self._service = None
+    # Credentials and services come from the process-wide registry: a new
+    # connector per request costs no key parsing, discovery build or token fetch.
+
+    def _get_credentials(self) -> Credentials:
+        return google_clients.get_credentials(self.service_account_path, SCOPES)
 
     def _get_service(self):
-        """Get or create Google Sheets API service using service account."""
-        if self._service:
-            return self._service
+        """Google Sheets API service for the calling thread (shared credentials)."""
+        return google_clients.get_service('sheets', 'v4', self.service_account_path, SCOPES, api_url=self.api_url)
+
+    def _get_values(self):
+        """spreadsheets().values() resource for the calling thread."""
+        return google_clients.get_resource('sheets', 'v4', self.service_account_path, SCOPES,
+                                           "spreadsheets.values", api_url=self.api_url)
 
-        if not os.path.exists(self.service_account_path):
-            raise FileNotFoundError(
-                f"Service account file not found at {self.service_account_path}. "
-                "Please download it from Google Cloud Console > IAM > Service Accounts."
-            )
+    def _get_drive_files(self):
+        return google_clients.get_resource('drive', 'v3', self.service_account_path, SCOPES,
+                                           "files", api_url=self.drive_api_url)
 
-        creds = Credentials.from_service_account_file(self.service_account_path, scopes=SCOPES)
-        self._service = build('sheets', 'v4', credentials=creds)
-        return self._service
+    def _get_access_token(self) -> str:
+        """OAuth access token for direct REST calls (shared, refreshed near expiry)."""
+        return google_clients.get_access_token(self.service_account_path, SCOPES)
+
+    @staticmethod
+    def _empty_payload() -> Dict[str, Any]:
+        return {
+            "campaigns": {},
+            "global_cap": None,
+            "global_cap_weekly": None
+        }
 
     def get_performance_data(self) -> Dict[str, Any]:
         """
         Reads the sheet and converts it to the standard format.
         Supports transposed structure (Campaigns in columns) and Global Cap.
         """
+        try:
+            return self.fetch_performance_data()
+        except Exception as e:
+            logger.error(f"[GoogleSheetConnector] Error fetching sheet data: {e}")
+            return self._empty_payload()
+
+    def fetch_performance_data(self) -> Dict[str, Any]:
+        """Same as get_performance_data, but raises when the sheet cannot be read."""
         logger.info(f"[GoogleSheetConnector] Reading data from Sheet ID: {self.spreadsheet_id}")
 
         if not self.spreadsheet_id:
             logger.warning("[GoogleSheetConnector] No spreadsheet_id configured, returning empty data")
-            return {"campaigns": {}, "global_cap": None, "global_cap_weekly": None}
+            return self._empty_payload()
 
-        service = self._get_service()
-        sheet = service.spreadsheets()
+        values = self._get_values()
 
-        data = {
-            "campaigns": {},
-            "global_cap": None,
-            "global_cap_weekly": None
-        }
-
-        # 1. Fetch Tab 1: Performance (Transposed)
-        # Row 0 = Headers/Campaign Names
-        # Row 7 = CVR Actual
-        # Row 8 = CVR Objective
         try:
-            result = sheet.values().get(
+            result = values.batchGet(
                 spreadsheetId=self.spreadsheet_id,
-                range="Feuille 1!A1:Z10"
+                ranges=self.ranges,
+                fields=VALUES_FIELD_MASK
             ).execute()
-            rows = result.get('values', [])
-
-            if len(rows) >= 9:
-                campaign_names = rows[0]  # Row 0
-                cvr_actuals = rows[7]     # Row 7
-                cvr_objs = rows[8]        # Row 8
-
-                # Start from index 2 based on template structure ['W1', '', 'Campaign 1...', ...]
-                for i in range(2, len(campaign_names)):
-                    if i >= len(cvr_actuals) or i >= len(cvr_objs):
-                        break
-
-                    c_name = campaign_names[i].strip()
-                    if not c_name:
-                        continue
-
-                    try:
-                        actual_val = self._parse_percentage(cvr_actuals[i])
-                        obj_val = self._parse_percentage(cvr_objs[i])
-
-                        # Generate ID from name (slug)
-                        c_id = c_name.lower().replace(" ", "_")
-
-                        data["campaigns"][c_id] = {
-                            "name": c_name,
-                            "actual": actual_val,
-                            "objective": obj_val,
-                            "metric_name": "CVR"
-                        }
-                    except (ValueError, IndexError):
-                        continue
-
-            logger.info(f"[GoogleSheetConnector] Found {len(data['campaigns'])} campaigns")
-
-        except Exception as e:
-            logger.error(f"[GoogleSheetConnector] Error fetching Performance Tab: {e}")
-
-        # 2. Fetch Tab 2: Resources Sales (Global Cap)
-        # Row 4: ['Nombre de leads...', '280', '1400']
+            value_ranges = [vr.get('values', []) for vr in result.get('valueRanges', [])]
+        except HttpError as e:
+            if e.resp.status != 400:
+                raise
+            # batchGet fails as a whole when one range is invalid (e.g. a
+            # renamed tab): read the ranges one by one so the others still load
+            logger.warning(f"[GoogleSheetConnector] batchGet failed ({e}), reading ranges separately")
+            value_ranges = [self._get_range(values, range_name) for range_name in self.ranges]
+
+        return self.parse_value_ranges(value_ranges)
+
+    def get_revision(self) -> str:
+        """
+        Drive revision of the spreadsheet: one small metadata call, much
+        cheaper than reading the values. Changes on every edit.
+        """
+        metadata = self._get_drive_files().get(
+            fileId=self.spreadsheet_id,
+            fields="version,modifiedTime",
+            supportsAllDrives=True
+        ).execute()
+        return metadata.get("version") or metadata.get("modifiedTime")
+
+    def watch(self, channel_id: str, address: str, token: str, ttl_seconds: int) -> Dict[str, Any]:
+        """
+        Subscribes `address` (an HTTPS webhook) to Drive push notifications
+        for this spreadsheet. Returns the channel (id, resourceId, expiration).
+        """
+        return self._get_drive_files().watch(
+            fileId=self.spreadsheet_id,
+            supportsAllDrives=True,
+            body={
+                "id": channel_id,
+                "type": "web_hook",
+                "address": address,
+                "token": token,
+                "params": {"ttl": str(ttl_seconds)}
+            }
+        ).execute()
+
+    def _get_range(self, values, range_name: str) -> List[list]:
         try:
-            result_res = sheet.values().get(
+            result = values.get(
                 spreadsheetId=self.spreadsheet_id,
-                range="Ressources Sales!A1:C10"
+                range=range_name,
+                fields="values"
             ).execute()
-            rows_res = result_res.get('values', [])
-
-            if len(rows_res) > 4:
-                row_cap = rows_res[4]
-                if len(row_cap) > 1:
-                    try:
-                        # Daily cap (column B)
-                        cap_val = float(row_cap[1].replace(',', '').replace(' ', ''))
-                        data["global_cap"] = cap_val
+            return result.get('values', [])
+        except Exception as e:
+            logger.error(f"[GoogleSheetConnector] Error fetching {range_name}: {e}")
+            return []
 
-                        # Weekly cap (column C)
-                        if len(row_cap) > 2:
-                            week_cap_val = float(row_cap[2].replace(',', '').replace(' ', ''))
-                            data["global_cap_weekly"] = week_cap_val
+    async def get_performance_data_async(self, client: httpx.AsyncClient) -> Dict[str, Any]:
+        """Same as get_performance_data, over the Sheets REST API with an async HTTP client."""
+        logger.info(f"[GoogleSheetConnector] Reading data from Sheet ID: {self.spreadsheet_id}")
 
-                        logger.info(f"[GoogleSheetConnector] Global cap: {data['global_cap']} daily, {data['global_cap_weekly']} weekly")
+        if not self.spreadsheet_id:
+            logger.warning("[GoogleSheetConnector] No spreadsheet_id configured, returning empty data")
+            return self._empty_payload()
 
-                    except ValueError:
-                        logger.warning("[GoogleSheetConnector] Could not parse global cap value")
+        # Token refresh is a blocking HTTP call, done at most once per hour per process
+        token = await asyncio.to_thread(self._get_access_token)
+        headers = {"Authorization": f"Bearer {token}"}
 
+        try:
+            url = f"{self.api_url}/v4/spreadsheets/{self.spreadsheet_id}/values:batchGet"
+            params = [("ranges", r) for r in self.ranges] + [("fields", VALUES_FIELD_MASK)]
+
+            response = await client.get(url, params=params, headers=headers)
+            if response.status_code == 400:
+                logger.warning("[GoogleSheetConnector] batchGet failed, reading ranges separately")
+                value_ranges = await asyncio.gather(*[
+                    self._get_range_async(client, headers, range_name) for range_name in self.ranges
+                ])
+            else:
+                response.raise_for_status()
+                value_ranges = [vr.get('values', []) for vr in response.json().get('valueRanges', [])]
         except Exception as e:
-            logger.error(f"[GoogleSheetConnector] Error fetching Resources Tab: {e}")
+            logger.error(f"[GoogleSheetConnector] Error fetching sheet data: {e}")
+            return self._empty_payload()
 
+        return self.parse_value_ranges(value_ranges)
+
+    async def _get_range_async(self, client: httpx.AsyncClient, headers: dict, range_name: str) -> List[list]:
+        try:
+            url = f"{self.api_url}/v4/spreadsheets/{self.spreadsheet_id}/values/{quote(range_name)}"
+            response = await client.get(url, params={"fields": "values"}, headers=headers)
+            response.raise_for_status()
+            return response.json().get('values', [])
+        except Exception as e:
+            logger.error(f"[GoogleSheetConnector] Error fetching {range_name}: {e}")
+            return []
+
+    def parse_value_ranges(self, value_ranges: List[List[list]]) -> Dict[str, Any]:
+        """Builds the payload from the values of self.ranges (same order)."""
+        data = self.layout.parse(value_ranges)
+        logger.info(f"[GoogleSheetConnector] Found {len(data['campaigns'])} campaigns")
+        if data["global_cap"] is not None:
+            logger.info(f"[GoogleSheetConnector] Global cap: {data['global_cap']} daily, {data['global_cap_weekly']} weekly")
         return data
 
-    @staticmethod
-    def _parse_percentage(val: str) -> float:
-        """Parse percentage strings like '5%' or '6,30%' to float."""
-        if not val:
-            return 0.0
-        val = val.replace('%', '').replace(',', '.').strip()
-        return float(val) if val else 0.0
+
+async def get_performance_data_many(connectors: List[GoogleSheetConnector], timeout: float = 10.0) -> List[Dict[str, Any]]:
+    """Reads several spreadsheets concurrently (one batchGet each), results in input order."""
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        return await asyncio.gather(*[c.get_performance_data_async(client) for c in connectors])
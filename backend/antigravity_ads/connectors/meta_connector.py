@@ -1,88 +1,243 @@
 
+import os
+import queue
+import hashlib
+import datetime
 import logging
-from typing import Dict, Any
-from facebook_business.api import FacebookAdsApi
-from facebook_business.adobjects.adaccount import AdAccount
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Sequence
+from facebook_business.api import FacebookAdsApi, FacebookSession
 from facebook_business.adobjects.campaign import Campaign
-from .ad_connector import AdPlatformConnector
+from .ad_connector import AdPlatformConnector, budget_result
+from .meta_throttle import MetaThrottle, ThrottledAdsApi, meta_throttle
 
 logger = logging.getLogger(__name__)
 
+# Graph API base URL (overridable to point at a local stand-in server)
+META_GRAPH_API_URL = os.getenv("META_GRAPH_API_URL") or FacebookSession.GRAPH
+# Campaigns per Graph API page (the SDK default is 25, this used to be 50)
+META_PAGE_SIZE = int(os.getenv("META_PAGE_SIZE", "500"))
+# Ad accounts of one organization fetched at the same time
+META_ACCOUNT_CONCURRENCY = int(os.getenv("META_ACCOUNT_CONCURRENCY", "4"))
+
+# Only what the optimizer uses
+CAMPAIGN_FIELDS = (
+    Campaign.Field.id,
+    Campaign.Field.name,
+    Campaign.Field.daily_budget,
+    Campaign.Field.status,
+)
+# For the campaign mirror: when a campaign changed, and whether it still runs
+SYNC_FIELDS = CAMPAIGN_FIELDS + (Campaign.Field.updated_time, Campaign.Field.effective_status)
+# The campaigns edge leaves deleted and archived campaigns out unless asked for them
+ALL_EFFECTIVE_STATUSES = ("ACTIVE", "PAUSED", "DELETED", "ARCHIVED", "IN_PROCESS", "WITH_ISSUES")
+
+# Operations per Graph API batch request (the API maximum)
+META_BATCH_SIZE = 50
+# Batch requests in flight at once during update_budgets
+META_BATCH_CONCURRENCY = int(os.getenv("META_BATCH_CONCURRENCY", "4"))
+# Batch operations the API did not run (null response, e.g. timeouts) are resent this many times
+BATCH_RETRIES = 2
+
+_DONE = object()
+
+def to_cents(budget: float) -> int:
+    # Rounded: int(0.29 * 100) would be 28
+    return int(round(budget * 100))
+
+def parse_ad_account_ids(config: Dict[str, Any]) -> List[str]:
+    """`ad_account_ids` (list) or `ad_account_id` (one id or comma separated), as act_<id>."""
+    ids = config.get("ad_account_ids") or config.get("ad_account_id") or []
+    if isinstance(ids, str):
+        ids = ids.split(",")
+    accounts = []
+    for account_id in (str(i).strip() for i in ids):
+        if not account_id:
+            continue
+        if not account_id.startswith("act_"):
+            account_id = f"act_{account_id}"
+        if account_id not in accounts:
+            accounts.append(account_id)
+    return accounts
+
 class MetaAdsConnector(AdPlatformConnector):
     """
     Real integration with Meta (Facebook) Ads Marketing API.
     Supports a 'Dry Run' mode to simulate writes without spending money.
     """
+
+    supports_incremental_sync = True
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], throttle: Optional[MetaThrottle] = None):
         super().__init__("meta", config)
         self.access_token = config.get("access_token")
-        self.ad_account_id = config.get("ad_account_id")
+        # Calls are scheduled fairly across tenants: one per access token unless given
+        self.tenant = config.get("tenant") or hashlib.sha256(str(self.access_token).encode()).hexdigest()[:12]
+        self.throttle = throttle or meta_throttle
+        self.ad_account_ids = parse_ad_account_ids(config)
+        self.ad_account_id = self.ad_account_ids[0] if self.ad_account_ids else None
         self.app_id = config.get("app_id")
         self.app_secret = config.get("app_secret")
+        self.graph_api_url = config.get("graph_api_url") or META_GRAPH_API_URL
+        self.page_size = int(config.get("page_size") or META_PAGE_SIZE)
+        self.account_concurrency = int(config.get("account_concurrency") or META_ACCOUNT_CONCURRENCY)
+        self.batch_concurrency = int(config.get("batch_concurrency") or META_BATCH_CONCURRENCY)
+        self._thread_apis = threading.local()
         self.dry_run = config.get("dry_run", True) # SAFETY DEFAULT
         
         self.api = None
         if self.access_token and self.ad_account_id:
             try:
-                self.api = FacebookAdsApi.init(self.app_id, self.app_secret, self.access_token)
-                logger.info(f"Meta Ads System Initialized for Account {self.ad_account_id} (Dry Run: {self.dry_run})")
+                self.api = self._new_api()
+                logger.info(f"Meta Ads System Initialized for Accounts {', '.join(self.ad_account_ids)} (Dry Run: {self.dry_run})")
             except Exception as e:
                 logger.error(f"Failed to init Meta API: {e}")
 
-    def get_campaigns(self) -> Dict[str, Any]:
+    def _new_api(self) -> FacebookAdsApi:
+        # Not FacebookAdsApi.init: that sets a process-wide default API,
+        # which concurrent requests for other tenants would overwrite
+        session = FacebookSession(self.app_id, self.app_secret, self.access_token)
+        session.GRAPH = self.graph_api_url
+        return ThrottledAdsApi(session, self.throttle, self.tenant, self.ad_account_id)
+
+    def _thread_api(self) -> FacebookAdsApi:
+        # One API (requests session) per worker thread, reused across batches
+        api = getattr(self._thread_apis, "api", None)
+        if api is None:
+            api = self._thread_apis.api = self._new_api()
+        return api
+
+    @staticmethod
+    def _to_campaign(raw: Dict[str, Any], account_id: str) -> Dict[str, Any]:
+        # daily_budget is in the account currency's cents (1000 = 10.00);
+        # campaigns with a lifetime or ad set budget have none
+        return {
+            "name": raw.get(Campaign.Field.name),
+            "daily_budget": int(raw.get(Campaign.Field.daily_budget) or 0) / 100.0,
+            "status": raw.get(Campaign.Field.status),
+            "platform_id": raw[Campaign.Field.id], # Keep track of real ID
+            "ad_account_id": account_id,
+            **{f: raw[f] for f in (Campaign.Field.updated_time, Campaign.Field.effective_status) if f in raw},
+        }
+
+    def _iter_account_pages(
+        self,
+        api: FacebookAdsApi,
+        account_id: str,
+        fields: Sequence[str],
+        page_size: int,
+        filters: Dict[str, Any],
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Pages of campaigns of one ad account, following the `after` cursor."""
+        params = {"fields": ",".join(fields), "limit": page_size, **filters}
+        while True:
+            body = api.call("GET", (account_id, "campaigns"), params=params).json()
+            yield [self._to_campaign(raw, account_id) for raw in body.get("data", [])]
+            paging = body.get("paging") or {}
+            after = (paging.get("cursors") or {}).get("after")
+            # No `next` link: this was the last page
+            if not paging.get("next") or not after:
+                return
+            params["after"] = after
+
+    def iter_campaigns(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        page_size: Optional[int] = None,
+        statuses: Optional[Sequence[str]] = ("ACTIVE",),
+        updated_since: Optional[datetime.datetime] = None,
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Fetches active campaigns from Meta.
+        Streams the campaigns of every ad account, page by page as they arrive.
+        Accounts are fetched concurrently (up to `account_concurrency`); a
+        failing account raises the Graph API error instead of cutting the
+        result short. Closing the generator early stops the fetch.
         """
         if not self.api:
             logger.warning("Meta API not initialized. Missing credentials.")
-            return {}
+            return
 
-        logger.info(f"Fetching campaigns from Meta Account {self.ad_account_id}...")
-        
-        try:
-            account = AdAccount(self.ad_account_id)
-            # Fetch Campaigns with insights or budget info
-            # Fields: name, id, daily_budget, status
-            fields = [
-                Campaign.Field.name,
-                Campaign.Field.id,
-                Campaign.Field.daily_budget,
-                Campaign.Field.status,
-                Campaign.Field.objective
+        fields = list(fields or CAMPAIGN_FIELDS)
+        if Campaign.Field.id not in fields:
+            fields.insert(0, Campaign.Field.id)
+        page_size = page_size or self.page_size
+        filters: Dict[str, Any] = {}
+        if statuses:
+            filters["effective_status"] = list(statuses)
+        if updated_since is not None:
+            # Only what changed since the last sync
+            filters["filtering"] = [
+                {"field": "updated_time", "operator": "GREATER_THAN", "value": int(updated_since.timestamp())}
             ]
-            params = {
-                'effective_status': ['ACTIVE'],
-                'limit': 50
-            }
-            
-            remote_campaigns = account.get_campaigns(fields=fields, params=params)
-            
-            results = {}
-            for cmp in remote_campaigns:
-                # Meta returns budget in cents (usually), check currency. 
-                # Assuming Account Currency matches user expectation (e.g. EUR/USD)
-                # daily_budget is in 'cents' (e.g. 1000 = 10.00)
-                
-                budget_cents = int(cmp.get(Campaign.Field.daily_budget, 0))
-                budget_human = budget_cents / 100.0
-                
-                c_id = cmp[Campaign.Field.id]
-                c_name = cmp[Campaign.Field.name]
-                
-                results[c_id] = {
-                    "name": c_name,
-                    "daily_budget": budget_human,
-                    "status": cmp[Campaign.Field.status],
-                    "platform_id": c_id # Keep track of real ID
-                }
-                
-            return results
-            
-        except Exception as e:
-            logger.error(f"Error fetching Meta campaigns: {e}")
+
+        if len(self.ad_account_ids) == 1 or self.account_concurrency <= 1:
+            for account_id in self.ad_account_ids:
+                for page in self._iter_account_pages(self.api, account_id, fields, page_size, filters):
+                    yield from page
+            return
+
+        # Bounded: fetching pauses while the consumer is behind
+        pages: queue.Queue = queue.Queue(maxsize=2 * self.account_concurrency)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch_account(account_id: str):
+            if stop.is_set():
+                return
+            try:
+                # requests sessions are not shared between threads
+                api = self._new_api()
+                for page in self._iter_account_pages(api, account_id, fields, page_size, filters):
+                    if not put(page):
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                put(_DONE)
+
+        workers = min(self.account_concurrency, len(self.ad_account_ids))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="meta-accounts") as pool:
+            for account_id in self.ad_account_ids:
+                pool.submit(fetch_account, account_id)
+            try:
+                remaining = len(self.ad_account_ids)
+                while remaining:
+                    item = pages.get()
+                    if item is _DONE:
+                        remaining -= 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        yield from item
+            finally:
+                stop.set()
+
+    def iter_campaign_changes(self, since: Optional[datetime.datetime] = None) -> Iterator[Dict[str, Any]]:
+        if since is None:
+            return self.iter_campaigns(fields=SYNC_FIELDS)
+        return self.iter_campaigns(fields=SYNC_FIELDS, statuses=ALL_EFFECTIVE_STATUSES, updated_since=since)
+
+    def get_campaigns(self) -> Dict[str, Any]:
+        """
+        Fetches active campaigns from Meta, keyed by campaign id.
+        Raises on Graph API errors (a partial list would look complete).
+        """
+        if not self.api:
+            logger.warning("Meta API not initialized. Missing credentials.")
             return {}
 
+        logger.info(f"Fetching campaigns from Meta Accounts {', '.join(self.ad_account_ids)}...")
+        return {campaign["platform_id"]: campaign for campaign in self.iter_campaigns()}
+
     def update_budget(self, campaign_id: str, new_budget: float) -> bool:
         """
         Updates the daily budget for a specific campaign.
@@ -92,7 +247,7 @@ class MetaAdsConnector(AdPlatformConnector):
             return False
             
         # Safety Check: Convert human budget back to cents
-        new_budget_cents = int(new_budget * 100)
+        new_budget_cents = to_cents(new_budget)
         
         logger.info(f"REQUEST: Update Campaign {campaign_id} to {new_budget} (currency units)")
         
@@ -101,7 +256,7 @@ class MetaAdsConnector(AdPlatformConnector):
             return True # Pretend it worked
             
         try:
-            campaign = Campaign(campaign_id)
+            campaign = Campaign(campaign_id, api=self.api)
             campaign.api_update(params={
                 Campaign.Field.daily_budget: new_budget_cents
             })
@@ -110,3 +265,70 @@ class MetaAdsConnector(AdPlatformConnector):
         except Exception as e:
             logger.error(f"FAILED to update campaign {campaign_id}: {e}")
             return False
+
+    def update_budgets(self, changes: Dict[str, float]) -> Dict[str, Dict[str, Any]]:
+        """
+        Updates the daily budget of many campaigns through Graph API batch
+        requests: 50 operations per request, up to `batch_concurrency`
+        requests in flight. Returns a result per campaign; one rejected
+        campaign does not fail the others. If DRY_RUN is True, only logs.
+        """
+        if not changes:
+            return {}
+        if not self.api:
+            return {c: budget_result(b, False, self.dry_run, "Meta API not initialized") for c, b in changes.items()}
+
+        if self.dry_run:
+            for campaign_id, new_budget in changes.items():
+                logger.info(f"[DRY RUN] Would set Campaign {campaign_id} daily_budget={to_cents(new_budget)}")
+            return {c: budget_result(b, True, dry_run=True) for c, b in changes.items()}
+
+        items = list(changes.items())
+        chunks = [items[i:i + META_BATCH_SIZE] for i in range(0, len(items), META_BATCH_SIZE)]
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.batch_concurrency, len(chunks)), thread_name_prefix="meta-batch") as pool:
+            for chunk_results in pool.map(self._update_budget_batch, chunks):
+                results.update(chunk_results)
+
+        failed = sum(not r["success"] for r in results.values())
+        logger.info(f"Updated {len(results) - failed}/{len(results)} campaign budgets in {len(chunks)} batch requests")
+        return results
+
+    def _update_budget_batch(self, chunk: List[tuple]) -> Dict[str, Dict[str, Any]]:
+        """One Graph batch request (plus resends of the operations it did not run)."""
+        results = {}
+
+        def on_success(campaign_id, new_budget):
+            return lambda response: results.__setitem__(campaign_id, budget_result(new_budget, True))
+
+        def on_failure(campaign_id, new_budget):
+            def record(response):
+                error = response.error()
+                logger.error(f"FAILED to update campaign {campaign_id}: {error.api_error_message()}")
+                results[campaign_id] = budget_result(new_budget, False, error=error.api_error_message())
+            return record
+
+        batch = self._thread_api().new_batch()
+        for campaign_id, new_budget in chunk:
+            batch.add(
+                "POST", (str(campaign_id),),
+                params={Campaign.Field.daily_budget: to_cents(new_budget)},
+                success=on_success(campaign_id, new_budget),
+                failure=on_failure(campaign_id, new_budget),
+            )
+
+        error = "Not run by the Graph API batch"
+        try:
+            for _ in range(1 + BATCH_RETRIES):
+                batch = batch.execute()
+                if batch is None:
+                    break
+        except Exception as e:
+            # The batch request itself failed (token, rate limit, network)
+            logger.error(f"FAILED batch of {len(chunk)} budget updates: {e}")
+            error = getattr(e, "api_error_message", lambda: None)() or str(e)
+
+        for campaign_id, new_budget in chunk:
+            if campaign_id not in results:
+                results[campaign_id] = budget_result(new_budget, False, error=error)
+        return results
@@ -0,0 +1,332 @@
+"""
+Rate-limit-aware throttling of Meta Marketing API calls.
+
+Meta reports how much of its rate limits an ad account has used in the
+response headers (X-Ad-Account-Usage, X-Business-Use-Case-Usage) and
+answers with throttling errors once a limit is hit. The throttle, shared by
+every connector in the process:
+
+- paces calls per ad account (a token bucket at META_ACCOUNT_CALLS_PER_MINUTE)
+  and slows that pace down once the reported usage passes
+  META_USAGE_SLOWDOWN_PCT, instead of running into the limit;
+- holds an account back until the reported reset time when its usage is
+  at 100%, and backs off exponentially with jitter on throttling errors
+  (then retries, up to META_MAX_RETRIES);
+- never holds a call back longer than META_MAX_WAIT_SECONDS: a call whose
+  account is blocked for longer raises MetaThrottledError rather than
+  tying up the shared worker thread until the reset;
+- admits at most META_MAX_CONCURRENT_CALLS calls at once, taking waiting
+  calls round-robin across tenants so one organization with many accounts
+  cannot starve the others.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Mapping, Optional
+
+from facebook_business.api import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+
+logger = logging.getLogger(__name__)
+
+# Rate limiting error codes (application, user, ad account and business use case limits)
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, *range(80000, 80015)}
+# "Too many calls to this ad account", sent with code 17 or 80004
+THROTTLE_ERROR_SUBCODES = {2446079, 1487742}
+
+
+class MetaThrottledError(Exception):
+    """The ad account is rate limited for longer than the throttle waits."""
+
+    def __init__(self, account_id: str, retry_after: float):
+        super().__init__(f"Meta ad account {account_id} is rate limited for another {retry_after:.0f}s")
+        self.account_id = account_id
+        self.retry_after = retry_after
+
+
+def is_throttle_error(error: Exception) -> bool:
+    return isinstance(error, FacebookRequestError) and (
+        error.api_error_code() in THROTTLE_ERROR_CODES or error.api_error_subcode() in THROTTLE_ERROR_SUBCODES
+    )
+
+
+def parse_usage(headers: Mapping[str, str]) -> tuple:
+    """(usage %, seconds until the limit resets) reported by the usage headers (None when absent)."""
+    usage, reset = None, 0.0
+    account = headers.get("x-ad-account-usage") or headers.get("X-Ad-Account-Usage")
+    if account:
+        try:
+            data = json.loads(account)
+            usage = float(data.get("acc_id_util_pct", 0))
+            reset = float(data.get("reset_time_duration", 0))
+        except (ValueError, TypeError, AttributeError):
+            pass
+    business = headers.get("x-business-use-case-usage") or headers.get("X-Business-Use-Case-Usage")
+    if business:
+        try:
+            for entries in json.loads(business).values():
+                for entry in entries:
+                    pct = max(float(entry.get(k, 0)) for k in ("call_count", "total_cputime", "total_time"))
+                    usage = max(usage or 0.0, pct)
+                    # In minutes
+                    reset = max(reset, float(entry.get("estimated_time_to_regain_access", 0)) * 60)
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return usage, reset
+
+
+class AccountLimiter:
+    """Pacing of one ad account: a token bucket whose rate follows the reported usage."""
+
+    def __init__(self, per_minute: float, slowdown_pct: float, burst: float):
+        self.base_rate = per_minute / 60.0
+        self.slowdown_pct = slowdown_pct
+        self.capacity = burst
+        self.usage = 0.0
+        self.blocked_until = 0.0
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        if self.usage < self.slowdown_pct:
+            return self.base_rate
+        # Linearly down to 5% of the pace as the usage approaches 100%
+        headroom = max(0.0, 100.0 - self.usage) / max(1.0, 100.0 - self.slowdown_pct)
+        return self.base_rate * max(0.05, headroom)
+
+    def reserve(self) -> float:
+        """Takes a token; returns how long to wait before making the call."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate)
+            return max(wait, self.blocked_until - now)
+
+    def observe(self, usage: Optional[float], reset_seconds: float):
+        with self._lock:
+            if usage is not None:
+                self.usage = usage
+            if usage is not None and usage >= 100:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + max(reset_seconds, 1.0))
+
+    def cancel(self):
+        """Returns the token of a reserve() whose call was not made."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def back_off(self, delay: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+
+class FairScheduler:
+    """At most `slots` calls at once; waiting calls are admitted round-robin across tenants."""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._free = slots
+        self._waiting: "OrderedDict[str, deque]" = OrderedDict()
+        self._cond = threading.Condition()
+
+    def acquire(self, tenant: str):
+        with self._cond:
+            if self._free > 0 and not self._waiting:
+                self._free -= 1
+                return
+            ticket = object()
+            self._waiting.setdefault(tenant, deque()).append(ticket)
+            while not (self._free > 0 and self._next() is ticket):
+                self._cond.wait()
+            self._free -= 1
+            queue = self._waiting[tenant]
+            queue.popleft()
+            if queue:
+                self._waiting.move_to_end(tenant)  # its next call waits for the other tenants
+            else:
+                del self._waiting[tenant]
+            self._cond.notify_all()
+
+    def _next(self):
+        tenant = next(iter(self._waiting))
+        return self._waiting[tenant][0]
+
+    def release(self):
+        with self._cond:
+            self._free += 1
+            self._cond.notify_all()
+
+    def waiting(self) -> int:
+        with self._cond:
+            return sum(len(q) for q in self._waiting.values())
+
+
+class MetaThrottle:
+    def __init__(
+        self,
+        account_calls_per_minute: float = 600.0,
+        slowdown_pct: float = 75.0,
+        max_concurrent_calls: int = 8,
+        max_retries: int = 3,
+        backoff_base: float = 2.0,
+        backoff_max: float = 120.0,
+        max_wait: float = 60.0,
+        enabled: bool = True,
+    ):
+        self.account_calls_per_minute = account_calls_per_minute
+        self.slowdown_pct = slowdown_pct
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self.scheduler = FairScheduler(max_concurrent_calls)
+        self._accounts: Dict[str, AccountLimiter] = {}
+        self._lock = threading.Lock()
+        self.stats_counters = {"calls": 0, "throttled": 0, "retries": 0, "waits": 0, "rejected": 0}
+        self.waited_seconds = 0.0
+        self.calls_per_tenant: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "MetaThrottle":
+        return cls(
+            account_calls_per_minute=float(os.getenv("META_ACCOUNT_CALLS_PER_MINUTE", "600")),
+            slowdown_pct=float(os.getenv("META_USAGE_SLOWDOWN_PCT", "75")),
+            max_concurrent_calls=int(os.getenv("META_MAX_CONCURRENT_CALLS", "8")),
+            max_retries=int(os.getenv("META_MAX_RETRIES", "3")),
+            backoff_base=float(os.getenv("META_BACKOFF_BASE_SECONDS", "2")),
+            backoff_max=float(os.getenv("META_BACKOFF_MAX_SECONDS", "120")),
+            max_wait=float(os.getenv("META_MAX_WAIT_SECONDS", "60")),
+            enabled=os.getenv("META_THROTTLE_ENABLED", "true").lower() == "true",
+        )
+
+    def account(self, account_id: str) -> AccountLimiter:
+        with self._lock:
+            limiter = self._accounts.get(account_id)
+            if limiter is None:
+                burst = max(1.0, self.account_calls_per_minute / 12)
+                limiter = self._accounts[account_id] = AccountLimiter(
+                    self.account_calls_per_minute, self.slowdown_pct, burst
+                )
+            return limiter
+
+    @contextmanager
+    def slot(self, account_id: str, tenant: str):
+        """
+        Waits for the account's pace, then for a call slot (fair across
+        tenants). Raises MetaThrottledError instead when the account is held
+        back for longer than max_wait.
+        """
+        limiter = self.account(account_id)
+        wait = limiter.reserve()
+        if wait > self.max_wait:
+            limiter.cancel()
+            with self._lock:
+                self.stats_counters["rejected"] += 1
+            raise MetaThrottledError(account_id, wait)
+        if wait > 0:
+            with self._lock:
+                self.stats_counters["waits"] += 1
+                self.waited_seconds += wait
+            time.sleep(wait)
+        self.scheduler.acquire(tenant)
+        try:
+            with self._lock:
+                self.stats_counters["calls"] += 1
+                self.calls_per_tenant[tenant] = self.calls_per_tenant.get(tenant, 0) + 1
+            yield limiter
+        finally:
+            self.scheduler.release()
+
+    def backoff_delay(self, attempt: int, reset_seconds: float = 0.0) -> float:
+        # Full jitter, but never before the reset time Meta announced; capped at backoff_max
+        # (a longer reset blocks the account, and slot() rejects its calls until then)
+        jitter = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return min(self.backoff_max, max(reset_seconds, jitter))
+
+    def call(self, account_id: str, tenant: str, send):
+        """
+        Runs `send()` (one Graph API request returning a FacebookResponse)
+        under the throttle, recording the usage headers and retrying
+        throttling errors after a jittered backoff.
+        """
+        if not self.enabled:
+            return send()
+        attempt = 0
+        while True:
+            with self.slot(account_id, tenant) as limiter:
+                try:
+                    response = send()
+                except FacebookRequestError as e:
+                    usage, reset = parse_usage(e.http_headers() or {})
+                    limiter.observe(usage, reset)
+                    if not is_throttle_error(e):
+                        raise
+                    with self._lock:
+                        self.stats_counters["throttled"] += 1
+                    if attempt >= self.max_retries:
+                        raise
+                    if reset > self.max_wait:
+                        # Held back until the reset: later calls fail fast in slot()
+                        limiter.back_off(reset)
+                        raise MetaThrottledError(account_id, reset) from e
+                    delay = self.backoff_delay(attempt, reset)
+                    limiter.back_off(delay)
+                    logger.warning(f"Meta throttled {account_id} (code {e.api_error_code()}): retrying in {delay:.1f}s")
+                    attempt += 1
+                    with self._lock:
+                        self.stats_counters["retries"] += 1
+                    continue
+                limiter.observe(*parse_usage(response.headers() or {}))
+                return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            accounts = {
+                account_id: {
+                    "usage_pct": round(limiter.usage, 1),
+                    "calls_per_minute": round(limiter.rate * 60, 1),
+                    "blocked_seconds": round(max(0.0, limiter.blocked_until - time.monotonic()), 1),
+                }
+                for account_id, limiter in self._accounts.items()
+            }
+            return {
+                "enabled": self.enabled,
+                **self.stats_counters,
+                "waited_seconds": round(self.waited_seconds, 1),
+                "queued_calls": self.scheduler.waiting(),
+                "accounts": accounts,
+            }
+
+
+class ThrottledAdsApi(FacebookAdsApi):
+    """FacebookAdsApi whose calls go through a MetaThrottle (batch requests included)."""
+
+    def __init__(self, session, throttle: MetaThrottle, tenant: str, account_id: Optional[str] = None):
+        super().__init__(session)
+        self.throttle = throttle
+        self.tenant = tenant
+        # Calls that are not on an act_<id> path (campaign updates, batches) count against this account
+        self.account_id = account_id
+
+    def call(self, method, path, params=None, headers=None, files=None, url_override=None, api_version=None):
+        account_id = self.account_id
+        if not isinstance(path, str) and path and str(path[0]).startswith("act_"):
+            account_id = str(path[0])
+        send = lambda: super(ThrottledAdsApi, self).call(
+            method, path, params=params, headers=headers, files=files,
+            url_override=url_override, api_version=api_version
+        )
+        return self.throttle.call(account_id or "unknown", self.tenant, send)
+
+
+# Shared by every MetaAdsConnector of the process
+meta_throttle = MetaThrottle.from_env()
@@ -0,0 +1,187 @@
+import math
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ConfigDict, model_validator
+
+
+def column_letter(index: int) -> str:
+    """0 -> A, 25 -> Z, 26 -> AA."""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+# Separators users type in numbers: spaces, and the non-breaking / narrow
+# no-break spaces French locales use for thousands ('1\u202f400')
+_SPACES = (" ", "\u00a0", "\u202f", "\t")
+# Joins cells into one string so the cleanup runs as a few C-level replaces
+_CELL_SEPARATOR = "\x00"
+
+
+def to_numbers(cells: Sequence, decimal: str = ".", empty_as_zero: bool = False) -> np.ndarray:
+    """
+    Vectorized cell parsing: '6,30 %' -> 6.3 (decimal=','), '1 400' or
+    '1,400' -> 1400.0 (decimal='.'). Spaces and '%' are ignored.
+    Unparseable cells become NaN; empty ones too, unless `empty_as_zero`.
+    """
+    text = _CELL_SEPARATOR.join(map(str, cells)).replace("%", "")
+    for space in _SPACES:
+        text = text.replace(space, "")
+    text = text.replace(",", ".") if decimal == "," else text.replace(",", "")
+
+    parts = np.array(text.split(_CELL_SEPARATOR), dtype=object)
+    empty = parts == ""
+    try:
+        # Fast path: every cell is a number (or empty)
+        numbers = np.where(empty, "nan", parts).astype(np.float64)
+    except ValueError:
+        numbers = pd.to_numeric(parts, errors="coerce").astype(np.float64)
+    if empty_as_zero:
+        numbers[empty] = 0.0
+    return numbers
+
+
+def _slugs(names: Sequence[str]):
+    """Stripped names and their ids ('Campaign 1' -> 'campaign_1')."""
+    stripped = [name.strip() for name in map(str, names)]
+    ids = _CELL_SEPARATOR.join(stripped).lower().replace(" ", "_").split(_CELL_SEPARATOR)
+    return stripped, ids
+
+
+class SheetLayout(BaseModel):
+    """
+    Where the data sits in a client spreadsheet, for one template version.
+    Rows and columns are 0-based (row 0 / column 0 = cell A1).
+
+    Organizations store their layout as {"version": ..., **overrides}
+    (Organization.sheet_layout); see SheetLayout.from_config.
+    """
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    version: str = "v1"
+
+    # Performance tab: one campaign per column, metrics in rows
+    performance_tab: str = "Feuille 1"
+    name_row: int = 0
+    actual_row: int = 7
+    objective_row: int = 8
+    first_campaign_column: int = 2
+    # None: every filled column (no A1:Z10-style truncation)
+    last_campaign_column: Optional[int] = None
+    metric_name: str = "CVR"
+    # Decimal separator of the percentages ('6,30%')
+    percent_decimal: str = ","
+
+    # Resources tab: daily / weekly lead caps on one row
+    resources_tab: str = "Ressources Sales"
+    cap_row: int = 4
+    daily_cap_column: int = 1
+    weekly_cap_column: Optional[int] = 2
+    # Decimal separator of the caps (the other one is a thousands separator)
+    number_decimal: str = "."
+
+    @model_validator(mode="after")
+    def _check(self):
+        if self.percent_decimal not in (".", ",") or self.number_decimal not in (".", ","):
+            raise ValueError("decimal separators must be '.' or ','")
+        if self.last_campaign_column is not None and self.last_campaign_column < self.first_campaign_column:
+            raise ValueError("last_campaign_column is before first_campaign_column")
+        return self
+
+    @classmethod
+    def from_config(cls, data: Optional[Dict[str, Any]]) -> "SheetLayout":
+        """Template layout for data["version"] (default v1) with the other keys as overrides."""
+        data = dict(data or {})
+        version = data.get("version", DEFAULT_LAYOUT_VERSION)
+        if version not in TEMPLATE_LAYOUTS:
+            raise ValueError(f"Unknown sheet layout version: {version}")
+        return cls.model_validate({**TEMPLATE_LAYOUTS[version].model_dump(), **data})
+
+    # --- Ranges ---
+
+    def ranges(self) -> List[str]:
+        """A1 ranges to read, in the order parse() expects them."""
+        last_row = max(self.name_row, self.actual_row, self.objective_row) + 1
+        if self.last_campaign_column is None:
+            performance = f"{self.performance_tab}!1:{last_row}"
+        else:
+            performance = f"{self.performance_tab}!A1:{column_letter(self.last_campaign_column)}{last_row}"
+
+        last_cap_column = max(self.daily_cap_column, self.weekly_cap_column or 0)
+        resources = f"{self.resources_tab}!A1:{column_letter(last_cap_column)}{self.cap_row + 1}"
+        return [performance, resources]
+
+    # --- Parsing ---
+
+    def parse(self, value_ranges: List[List[list]]) -> Dict[str, Any]:
+        """Payload (campaigns, global_cap, global_cap_weekly) from the values of ranges()."""
+        rows = value_ranges[0] if len(value_ranges) > 0 else []
+        rows_res = value_ranges[1] if len(value_ranges) > 1 else []
+        daily, weekly = self.parse_caps(rows_res)
+        return {
+            "campaigns": self.parse_campaigns(rows),
+            "global_cap": daily,
+            "global_cap_weekly": weekly
+        }
+
+    def parse_campaigns(self, rows: List[list]) -> Dict[str, Dict[str, Any]]:
+        if len(rows) <= max(self.name_row, self.actual_row, self.objective_row):
+            return {}
+
+        names, actuals, objectives = rows[self.name_row], rows[self.actual_row], rows[self.objective_row]
+        # Trailing empty cells are omitted by the API: a campaign needs all three
+        end = min(len(names), len(actuals), len(objectives))
+        if self.last_campaign_column is not None:
+            end = min(end, self.last_campaign_column + 1)
+        start = self.first_campaign_column
+        if end <= start:
+            return {}
+
+        stripped, ids = _slugs(names[start:end])
+        actual = to_numbers(actuals[start:end], self.percent_decimal, empty_as_zero=True)
+        objective = to_numbers(objectives[start:end], self.percent_decimal, empty_as_zero=True)
+
+        # Columns without a name or with an unparseable value are skipped
+        keep = (np.array(stripped, dtype=object) != "") & ~np.isnan(actual) & ~np.isnan(objective)
+        indexes = np.flatnonzero(keep).tolist()
+        actual, objective = actual.tolist(), objective.tolist()
+
+        # A later column with the same name wins
+        metric_name = self.metric_name
+        return {
+            ids[i]: {"name": stripped[i], "actual": actual[i], "objective": objective[i], "metric_name": metric_name}
+            for i in indexes
+        }
+
+    def parse_caps(self, rows_res: List[list]):
+        """(daily, weekly) caps; None when missing or unparseable."""
+        if len(rows_res) <= self.cap_row:
+            return None, None
+        row = rows_res[self.cap_row]
+        if len(row) <= self.daily_cap_column:
+            return None, None
+
+        columns = [self.daily_cap_column]
+        if self.weekly_cap_column is not None and len(row) > self.weekly_cap_column:
+            columns.append(self.weekly_cap_column)
+        values = to_numbers([row[c] for c in columns], self.number_decimal).tolist()
+
+        daily = values[0]
+        if math.isnan(daily):
+            return None, None
+        weekly = values[1] if len(values) > 1 and not math.isnan(values[1]) else None
+        return daily, weekly
+
+
+DEFAULT_LAYOUT_VERSION = "v1"
+
+# Built-in template layouts, by version. Add a version when the master
+# template changes; organizations keep the one their copy was made from.
+TEMPLATE_LAYOUTS: Dict[str, SheetLayout] = {
+    "v1": SheetLayout(),
+}
@@ -0,0 +1,86 @@
+from typing import Dict, Any, Optional, Union
+import numpy as np
+
+# Budget units per lead when the sales data has no cost per lead
+DEFAULT_COST_PER_LEAD = 20.0
+
+ArrayLike = Union[float, np.ndarray, list]
+
+def daily_lead_cap(global_cap: Optional[float], global_cap_weekly: Optional[float] = None) -> Optional[float]:
+    """Leads per day allowed by the daily and weekly caps (None when there is no cap)."""
+    caps = []
+    if global_cap:
+        caps.append(float(global_cap))
+    if global_cap_weekly:
+        caps.append(float(global_cap_weekly) / 7.0)
+    return min(caps) if caps else None
+
+def allocate_budgets(
+    desired: ArrayLike,
+    lead_cap: Optional[float],
+    score: ArrayLike = 1.0,
+    cost_per_lead: ArrayLike = DEFAULT_COST_PER_LEAD,
+    min_budget: ArrayLike = 0.0,
+    max_budget: ArrayLike = np.inf,
+    fixed_leads: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Splits a global lead cap across campaigns, best performers first.
+
+    Every campaign wants its `desired` budget (bounded by `min_budget` /
+    `max_budget`); a budget B brings B / `cost_per_lead` leads. When all the
+    wanted leads fit under `lead_cap` (minus `fixed_leads`, the leads of
+    campaigns that are not being allocated), everyone gets what they want.
+    Otherwise every campaign keeps its minimum, and the leads left are
+    handed out by decreasing `score` (e.g. the CVR ratio; cheaper leads
+    first on ties), the last campaign served getting a partial budget:
+    the greedy solution of the linear program max sum(score * leads), in
+    O(n log n).
+
+    Returns:
+        {"budgets": float64 array, "leads": leads allocated, "lead_cap":
+        leads available, "capped": whether the cap cut any budget,
+        "feasible": False when the minimums alone exceed the cap}
+    """
+    desired = np.asarray(desired, dtype=np.float64)
+    n = desired.shape[0]
+    score = np.broadcast_to(np.asarray(score, dtype=np.float64), (n,))
+    cost_per_lead = np.broadcast_to(np.asarray(cost_per_lead, dtype=np.float64), (n,))
+    low = np.broadcast_to(np.asarray(min_budget, dtype=np.float64), (n,))
+    high = np.maximum(np.broadcast_to(np.asarray(max_budget, dtype=np.float64), (n,)), low)
+    wanted = np.clip(desired, low, high)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Campaigns without a usable cost per lead count as free
+        per_budget = np.where(cost_per_lead > 0, 1.0 / cost_per_lead, 0.0)
+    wanted_leads = float(wanted @ per_budget)
+    if lead_cap is None:
+        return {"budgets": wanted, "leads": wanted_leads, "lead_cap": None, "capped": False, "feasible": True}
+
+    available = max(0.0, float(lead_cap) - fixed_leads)
+    if wanted_leads <= available:
+        return {"budgets": wanted, "leads": wanted_leads, "lead_cap": available, "capped": False, "feasible": True}
+
+    floor = np.minimum(low, wanted)
+    floor_leads = float(floor @ per_budget)
+    if floor_leads >= available:
+        return {"budgets": floor, "leads": floor_leads, "lead_cap": available, "capped": True,
+                "feasible": floor_leads <= available}
+
+    # Fill by decreasing score, then increasing cost per lead
+    order = np.lexsort((cost_per_lead, -np.nan_to_num(score, nan=-np.inf)))
+    room = (wanted - floor)[order] * per_budget[order]
+    filled = np.cumsum(room)
+    remaining = available - floor_leads
+    full = int(np.searchsorted(filled, remaining, side="right"))
+
+    budgets = floor.copy()
+    budgets[order[:full]] = wanted[order[:full]]
+    if full < n:
+        # Partial budget for the campaign where the leads run out
+        last = order[full]
+        left = remaining - (filled[full - 1] if full else 0.0)
+        budgets[last] = floor[last] + left / per_budget[last]
+    # Free campaigns cost no leads
+    budgets[per_budget == 0] = wanted[per_budget == 0]
+    return {"budgets": budgets, "leads": float(budgets @ per_budget), "lead_cap": available, "capped": True, "feasible": True}
@@ -0,0 +1,118 @@
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+from .allocation import daily_lead_cap, DEFAULT_COST_PER_LEAD
+from .rules import BudgetOptimizer, action_names
+
+def plan_campaigns(config: Dict[str, Any], sales_payload: Dict[str, Any], ad_payload: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Optional[str]]]:
+    """
+    Budget recommendations for an organization: sales rows matched to their
+    ad campaign (by name, then by id), adjusted by BudgetOptimizer under the
+    global lead cap. Pure function of its arguments (runs in worker processes).
+
+    Returns:
+        (rows as /api/campaigns returns them, key of each row's campaign in
+        ad_payload["campaigns"] or None when it has none)
+    """
+    optimizer = BudgetOptimizer(config)
+    ad_campaigns = ad_payload["campaigns"]
+
+    # Handle Polymorphism
+    if "campaigns" in sales_payload:
+        sales_data = sales_payload["campaigns"]
+        lead_cap = daily_lead_cap(sales_payload.get("global_cap"), sales_payload.get("global_cap_weekly"))
+    else:
+        sales_data = sales_payload
+        lead_cap = None
+
+    # Merge Data
+    ad_campaigns_by_name = {}
+    for key, data in ad_campaigns.items():
+        norm_name = data.get("name", "").lower().strip()
+        if norm_name:
+            ad_campaigns_by_name[norm_name] = key
+
+    merged = []
+    for cid in set(sales_data.keys()):
+        s_data = sales_data.get(cid, {"actual": 0, "objective": 0})
+        s_name = s_data.get("name", "").strip()
+
+        key = ad_campaigns_by_name.get(s_name.lower())
+        if key is None and cid in ad_campaigns:
+            key = cid
+
+        if key is not None:
+            a_data = ad_campaigns[key]
+        else:
+            a_data = {
+                "name": s_name if s_name else f"Campaign {cid}",
+                "daily_budget": 0.0,
+                "status": "NOT_FOUND",
+                "platform_id": None
+            }
+        merged.append((cid, s_data, a_data, key))
+
+    actual = [s_data.get("actual", 0.0) for _, s_data, _, _ in merged]
+    objective = [s_data.get("objective", 1.0) for _, s_data, _, _ in merged]
+    spend = [a_data.get("daily_budget", 0.0) for _, _, a_data, _ in merged]
+    platform = [a_data.get("platform") for _, _, a_data, _ in merged]
+
+    # Global Capacity Logic: the lead cap is split across campaigns, best CVR first
+    constraints = {"global": 1.0, "bounds": 1.0}
+    if lead_cap:
+        matched = {key for _, _, _, key in merged}
+        # Ad campaigns without sales data keep their budget, and their leads
+        cost_per_lead = float(optimizer.rules.get("cost_per_lead", DEFAULT_COST_PER_LEAD))
+        fixed_leads = sum(
+            a_data.get("daily_budget", 50) / cost_per_lead
+            for key, a_data in ad_campaigns.items() if key not in matched
+        )
+        constraints = optimizer.global_cap_constraints(
+            actual, objective, spend, lead_cap,
+            cost_per_lead=[s_data.get("cost_per_lead", np.nan) for _, s_data, _, _ in merged],
+            campaign_ids=[cid for cid, _, _, _ in merged],
+            fixed_leads=fixed_leads,
+            platform=platform,
+        )
+
+    # One vectorized pass over every campaign
+    adjustments = optimizer.calculate_adjustments(
+        actual, objective, constraints["global"], with_reasons=True, spend=spend, platform=platform,
+        budget_bounds=constraints["bounds"],
+    )
+    actions = action_names(adjustments["action"]).tolist()
+    multipliers = adjustments["multiplier"].tolist()
+
+    rows, keys = [], []
+    for (cid, s_data, a_data, key), action, multiplier, reason in zip(merged, actions, multipliers, adjustments["reason"]):
+        decision = {"action": action, "multiplier": multiplier, "reason": reason}
+
+        # Attach Platform ID
+        if a_data.get("platform_id"):
+            decision["platform_id"] = a_data["platform_id"]
+
+        rows.append({
+            "id": cid,
+            "name": a_data.get("name"),
+            "status": a_data.get("status", "ACTIVE"),
+            "metrics": {
+                "actual": s_data["actual"],
+                "objective": s_data["objective"],
+                "name": s_data.get("metric_name", "Currency")
+            },
+            "budget_recommendation": decision,
+            "current_budget": a_data.get("daily_budget", 0),
+            "platform": a_data.get("platform")
+        })
+        keys.append(key)
+    return rows, keys
+
+def budget_changes(rows: List[Dict[str, Any]], keys: List[Optional[str]]) -> Dict[str, float]:
+    """{ad campaign key: new daily budget} of the rows whose recommendation is not MAINTAIN."""
+    changes = {}
+    for row, key in zip(rows, keys):
+        decision = row["budget_recommendation"]
+        if key is None or decision["action"] == "MAINTAIN" or not row["current_budget"]:
+            continue
+        changes[key] = round(row["current_budget"] * decision["multiplier"], 2)
+    return changes
@@ -0,0 +1,282 @@
+"""
+Declarative budget rules.
+
+budget_rules["rules"] lists rules; the highest priority rule whose
+conditions all hold decides a campaign's performance multiplier (rules of
+equal priority: the first one listed wins; no rule: the budget stays):
+
+    budget_rules:
+      rules:
+        - name: Weekend push
+          priority: 20
+          when:
+            cvr_ratio: {gte: 1.2}        # actual / objective
+            spend: {lt: 300}             # current daily budget
+            day_of_week: [sat, sun]      # or 0 (monday) .. 6 (sunday)
+            platform: [meta]
+          then: {increase: 0.2}          # or decrease / multiplier / maintain
+        - name: Low Performance
+          priority: 10
+          when: {cvr_ratio: {lte: 0.9}}
+          then: {decrease: 0.1}
+
+Rules are validated and compiled once into a RulePlan (cached by the rules'
+hash, so organizations sharing a configuration share the plan), which
+evaluates a whole campaign batch with one vectorized pass per rule.
+"""
+import datetime
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# Compiled plans kept in memory (least recently used dropped first)
+PLAN_CACHE_SIZE = 256
+
+
+class Range(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    gt: Optional[float] = None
+    gte: Optional[float] = None
+    lt: Optional[float] = None
+    lte: Optional[float] = None
+
+    @model_validator(mode="after")
+    def _check(self):
+        if all(v is None for v in (self.gt, self.gte, self.lt, self.lte)):
+            raise ValueError("a range needs at least one of gt, gte, lt, lte")
+        return self
+
+
+class Conditions(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    cvr_ratio: Optional[Range] = None
+    spend: Optional[Range] = None
+    day_of_week: Optional[Tuple[int, ...]] = None
+    platform: Optional[Tuple[str, ...]] = None
+
+    @field_validator("day_of_week", mode="before")
+    @classmethod
+    def _days(cls, value):
+        if value is None:
+            return None
+        days = []
+        for day in ([value] if isinstance(value, (str, int)) else value):
+            if isinstance(day, str):
+                if day.strip().lower()[:3] not in DAYS:
+                    raise ValueError(f"unknown day: {day}")
+                day = DAYS.index(day.strip().lower()[:3])
+            if not 0 <= int(day) <= 6:
+                raise ValueError(f"day_of_week must be 0 (monday) to 6 (sunday), got {day}")
+            days.append(int(day))
+        return tuple(sorted(set(days)))
+
+    @field_validator("platform", mode="before")
+    @classmethod
+    def _platforms(cls, value):
+        if value is None:
+            return None
+        return tuple(p.strip().lower() for p in ([value] if isinstance(value, str) else value))
+
+
+class Action(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    increase: Optional[float] = Field(default=None, ge=0)
+    decrease: Optional[float] = Field(default=None, ge=0, le=1)
+    multiplier: Optional[float] = Field(default=None, ge=0)
+    maintain: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def _check(self):
+        if sum(v is not None for v in (self.increase, self.decrease, self.multiplier, self.maintain)) != 1:
+            raise ValueError("an action is exactly one of increase, decrease, multiplier, maintain")
+        return self
+
+    @property
+    def value(self) -> float:
+        if self.increase is not None:
+            return 1.0 + self.increase
+        if self.decrease is not None:
+            return 1.0 - self.decrease
+        if self.multiplier is not None:
+            return self.multiplier
+        return 1.0
+
+
+class Rule(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    name: str
+    priority: int = 0
+    when: Conditions = Conditions()
+    then: Action
+
+
+class RulePlan:
+    """Rules compiled for evaluation over arrays, highest priority first."""
+
+    def __init__(self, rules: Sequence[Rule]):
+        # sorted() is stable: equal priorities keep the configured order
+        self.rules = sorted(rules, key=lambda rule: -rule.priority)
+        self.names = [rule.name for rule in self.rules]
+        self.multipliers = np.array([rule.then.value for rule in self.rules], dtype=np.float64)
+        self._checks = [self._compile(rule.when) for rule in self.rules]
+        self._uses_platform = any(rule.when.platform is not None for rule in self.rules)
+
+    @classmethod
+    def from_config(cls, rules: Optional[List[Dict[str, Any]]]) -> "RulePlan":
+        """Validates rule definitions (ValueError with the offending rule otherwise)."""
+        if not isinstance(rules, list):
+            raise ValueError("budget_rules.rules must be a list of rules")
+        parsed = []
+        for index, rule in enumerate(rules):
+            try:
+                parsed.append(Rule.model_validate(rule))
+            except ValidationError as e:
+                name = rule.get("name") if isinstance(rule, dict) else None
+                problems = "; ".join(
+                    f"{'.'.join(map(str, error['loc'])) or 'rule'}: {error['msg']}" for error in e.errors()
+                )
+                raise ValueError(f"rule {index + 1}{f' ({name})' if name else ''}: {problems}") from None
+        return cls(parsed)
+
+    @staticmethod
+    def _compile(conditions: Conditions) -> list:
+        """[(column, test)]: test(values) -> boolean array."""
+        checks = []
+        for column in ("cvr_ratio", "spend"):
+            bounds = getattr(conditions, column)
+            if bounds is None:
+                continue
+            for op, limit in (
+                (np.greater, bounds.gt), (np.greater_equal, bounds.gte),
+                (np.less, bounds.lt), (np.less_equal, bounds.lte),
+            ):
+                if limit is not None:
+                    checks.append((column, lambda values, op=op, limit=limit: op(values, limit)))
+        if conditions.day_of_week is not None:
+            days = np.array(conditions.day_of_week)
+            checks.append(("day_of_week", lambda values: np.isin(values, days)))
+        if conditions.platform is not None:
+            platforms = list(conditions.platform)
+            # values: (codes, distinct platforms) from evaluate, tested once per platform
+            checks.append(("platform", lambda values: np.isin(values[1], platforms)[values[0]]))
+        return checks
+
+    def evaluate(self, columns: Dict[str, np.ndarray], size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (performance multipliers, index of the deciding rule or -1) for
+        `size` campaigns. `columns` holds arrays (or scalars, for every
+        campaign) for cvr_ratio, spend, day_of_week and platform; NaN
+        values fail every numeric condition.
+        """
+        if self._uses_platform:
+            columns = dict(columns)
+            platform = columns.get("platform")
+            if platform is None or np.ndim(platform) == 0:
+                platform = np.full(size, platform, dtype=object)
+            # Missing platforms get code -1, i.e. the extra None at the end
+            codes, distinct = pd.factorize(platform)
+            columns["platform"] = (codes, np.append(distinct.astype(object), None))
+        multipliers = np.ones(size, dtype=np.float64)
+        decided = np.full(size, -1, dtype=np.int32)
+        open_ = np.ones(size, dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for index, checks in enumerate(self._checks):
+                match = open_.copy()
+                for column, test in checks:
+                    match &= test(columns[column])
+                    if not match.any():
+                        break
+                else:
+                    multipliers[match] = self.multipliers[index]
+                    decided[match] = index
+                    open_ &= ~match
+                    if not open_.any():
+                        break
+        return multipliers, decided
+
+
+class CampaignLimit(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    min_budget: Optional[float] = Field(default=None, ge=0)
+    max_budget: Optional[float] = Field(default=None, ge=0)
+
+
+class BudgetRules(BaseModel):
+    """The numeric settings of budget_rules BudgetOptimizer reads (other keys are left alone)."""
+    model_config = ConfigDict(frozen=True, extra="allow")
+
+    increase_threshold: Optional[float] = None
+    decrease_threshold: Optional[float] = None
+    increase_percentage: Optional[float] = Field(default=None, ge=0)
+    decrease_percentage: Optional[float] = Field(default=None, ge=0, le=1)
+    cost_per_lead: Optional[float] = Field(default=None, gt=0)
+    min_budget: Optional[float] = Field(default=None, ge=0)
+    max_budget: Optional[float] = Field(default=None, ge=0)
+    campaign_limits: Optional[Dict[str, CampaignLimit]] = None
+
+    @model_validator(mode="after")
+    def _check(self):
+        if self.min_budget is not None and self.max_budget is not None and self.min_budget > self.max_budget:
+            raise ValueError("min_budget is above max_budget")
+        return self
+
+
+def validate_budget_rules(budget_rules: Optional[Dict[str, Any]]):
+    """Checks a budget_rules configuration before it is saved (ValueError naming the offending key)."""
+    if not budget_rules:
+        return
+    if not isinstance(budget_rules, dict):
+        raise ValueError("budget_rules must be an object")
+    try:
+        BudgetRules.model_validate(budget_rules)
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(map(str, error['loc'])) or 'budget_rules'}: {error['msg']}" for error in e.errors()
+        )) from None
+    if budget_rules.get("rules") is not None:
+        compile_rules(budget_rules["rules"])
+
+
+_cache: "OrderedDict[str, RulePlan]" = OrderedDict()
+_cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def rules_key(rules: Any) -> str:
+    return hashlib.sha256(json.dumps(rules, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def compile_rules(rules: Optional[List[Dict[str, Any]]]) -> Optional[RulePlan]:
+    """Compiled plan of a rules list (None for none), shared by identical configurations."""
+    if rules is None:
+        return None
+    key = rules_key(rules)
+    with _cache_lock:
+        plan = _cache.get(key)
+        if plan is not None:
+            _cache.move_to_end(key)
+            cache_stats["hits"] += 1
+            return plan
+    plan = RulePlan.from_config(rules)
+    with _cache_lock:
+        cache_stats["misses"] += 1
+        _cache[key] = plan
+        if len(_cache) > PLAN_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return plan
+
+
+def weekday_today() -> int:
+    return datetime.date.today().weekday()
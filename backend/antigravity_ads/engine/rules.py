@@ -1,4 +1,29 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Sequence, Union
+import numpy as np
+
+from .allocation import allocate_budgets, DEFAULT_COST_PER_LEAD
+from .rule_plan import compile_rules, weekday_today
+
+# Action codes of calculate_adjustments (ACTIONS[code + 1] is the action name)
+DECREASE, MAINTAIN, INCREASE = -1, 0, 1
+ACTIONS = np.array(["DECREASE", "MAINTAIN", "INCREASE"])
+
+def action_names(codes: np.ndarray) -> np.ndarray:
+    return ACTIONS[np.asarray(codes) + 1]
+
+def _round_multipliers(values: np.ndarray) -> np.ndarray:
+    """float(f"{x:.2f}") of every value, like calculate_adjustment (np.round rounds differently)."""
+    unique, inverse = np.unique(values, return_inverse=True)
+    return np.array([float(f"{x:.2f}") for x in unique.tolist()], dtype=np.float64)[inverse.reshape(values.shape)]
+
+def _limit_reasons(parts: list, constraint: float, bounds: float):
+    """Appends why a budget was limited: min / max budget, then the global lead cap."""
+    if bounds > 1.0:
+        parts.append("Min Budget Limit")
+    elif bounds < 1.0:
+        parts.append("Max Budget Limit")
+    if constraint < 1.0:
+        parts.append(f"Global Cap Limit ({constraint:.0%})")
 
 class BudgetOptimizer:
     """Core logic engine for calculating budget adjustments."""
@@ -6,6 +31,8 @@ class BudgetOptimizer:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.rules = config.get("budget_rules", {})
+        # Declarative rules (see rule_plan), compiled once per distinct rule set
+        self.plan = compile_rules(self.rules.get("rules"))
 
     def calculate_adjustment(self, performance_data: Dict[str, float], global_constraint: float = 1.0) -> Dict[str, Any]:
         """
@@ -20,6 +47,16 @@ class BudgetOptimizer:
         """
         actual = performance_data.get("actual", 0.0)
         objective = performance_data.get("objective", 1.0)
+        if self.plan is not None:
+            batch = self.calculate_adjustments(
+                [actual], [objective], global_constraint, with_reasons=True,
+                spend=[performance_data.get("spend", np.nan)], platform=[performance_data.get("platform")],
+            )
+            return {
+                "action": str(action_names(batch["action"])[0]),
+                "multiplier": float(batch["multiplier"][0]),
+                "reason": batch["reason"][0],
+            }
         
         # 1. Performance-based Adjustment (CVR)
         perf_multiplier = 1.0
@@ -62,3 +99,204 @@ class BudgetOptimizer:
             "multiplier": float(f"{final_multiplier:.2f}"),
             "reason": " + ".join(reason_parts)
         }
+
+    def calculate_adjustments(
+        self,
+        actual,
+        objective=None,
+        global_constraint: Union[float, np.ndarray] = 1.0,
+        with_reasons: bool = False,
+        spend=None,
+        platform=None,
+        weekday: Optional[int] = None,
+        budget_bounds: Union[float, np.ndarray] = 1.0,
+    ) -> Dict[str, Optional[Any]]:
+        """
+        calculate_adjustment for many campaigns at once, with the same results.
+
+        Args:
+            actual: actual values (array-like), or a DataFrame with "actual"
+                and "objective" columns when `objective` is None.
+            objective: objective values (array-like), same length.
+            global_constraint: one multiplier for all campaigns, or one per campaign.
+            with_reasons: also build the reason strings (slow part, off by default).
+            spend, platform, weekday: what declarative rules can test (current
+                daily budgets, platform names, 0 = monday, default today).
+            budget_bounds: per-campaign multiplier bringing the budget within
+                min_budget / max_budget (see global_cap_constraints).
+
+        Returns:
+            {"multiplier": float64 array, "action": int8 array of DECREASE /
+            MAINTAIN / INCREASE codes, "reason": list of str or None}
+        """
+        if objective is None:
+            actual, objective = actual["actual"], actual["objective"]
+        actual = np.asarray(actual, dtype=np.float64)
+        objective = np.asarray(objective, dtype=np.float64)
+        constraint = np.asarray(global_constraint, dtype=np.float64)
+        bounds = np.asarray(budget_bounds, dtype=np.float64)
+        if self.plan is not None:
+            return self._apply_plan(actual, objective, constraint, bounds, with_reasons, spend, platform, weekday)
+
+        increase_thresh = self.rules.get("increase_threshold", 1.10)
+        decrease_thresh = self.rules.get("decrease_threshold", 0.90)
+        increase = 1.0 + self.rules.get("increase_percentage", 0.10)
+        decrease = 1.0 - self.rules.get("decrease_percentage", 0.10)
+
+        # 1. Performance-based Adjustment (CVR), only where there is an objective
+        has_objective = objective > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(has_objective, actual / np.where(has_objective, objective, 1.0), np.nan)
+        high = has_objective & (ratio >= increase_thresh)
+        low = has_objective & ~high & (ratio <= decrease_thresh)
+        perf = np.select([high, low], [increase, decrease], 1.0)
+
+        # 2. Budget bounds and Global Capacity Adjustment
+        factor = constraint * bounds
+        final = perf * factor
+        if factor.ndim == 0:
+            # At most 3 distinct multipliers: round them once
+            g = float(factor)
+            stable, up, down = (float(f"{p * g:.2f}") for p in (1.0, increase, decrease))
+            multiplier = np.select([high, low], [up, down], stable)
+        else:
+            multiplier = _round_multipliers(final)
+
+        action = np.zeros(final.shape, dtype=np.int8)
+        action[final > 1.02] = INCREASE
+        action[final < 0.98] = DECREASE
+
+        reasons = None
+        if with_reasons:
+            constraints = np.broadcast_to(constraint, final.shape).tolist()
+            all_bounds = np.broadcast_to(bounds, final.shape).tolist()
+            reasons = []
+            for r, h, l, o, g, b in zip(ratio.tolist(), high.tolist(), low.tolist(), has_objective.tolist(), constraints, all_bounds):
+                parts = []
+                if h:
+                    parts.append(f"High Performance (CVR {r:.0%})")
+                elif l:
+                    parts.append(f"Low Performance (CVR {r:.0%})")
+                elif o:
+                    parts.append("Stable Performance")
+                _limit_reasons(parts, g, b)
+                reasons.append(" + ".join(parts))
+
+        return {"multiplier": multiplier, "action": action, "reason": reasons}
+
+    def _apply_plan(self, actual, objective, constraint, bounds, with_reasons, spend, platform, weekday) -> Dict[str, Optional[Any]]:
+        """calculate_adjustments with the declarative rules deciding the performance multiplier."""
+        n = actual.shape[0]
+        has_objective = objective > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(has_objective, actual / np.where(has_objective, objective, 1.0), np.nan)
+        columns = {
+            "cvr_ratio": ratio,
+            "spend": np.nan if spend is None else np.asarray(spend, dtype=np.float64),
+            "platform": None if platform is None else np.asarray(platform, dtype=object),
+            "day_of_week": weekday_today() if weekday is None else weekday,
+        }
+        perf, decided = self.plan.evaluate(columns, n)
+
+        factor = constraint * bounds
+        final = perf * factor
+        if factor.ndim == 0:
+            # One multiplier per rule (and one for no rule): round those
+            g = float(factor)
+            table = np.array([float(f"{m * g:.2f}") for m in [1.0, *self.plan.multipliers.tolist()]])
+            multiplier = table[decided + 1]
+        else:
+            multiplier = _round_multipliers(final)
+
+        action = np.zeros(n, dtype=np.int8)
+        action[final > 1.02] = INCREASE
+        action[final < 0.98] = DECREASE
+
+        reasons = None
+        if with_reasons:
+            names = self.plan.names
+            constraints = np.broadcast_to(constraint, final.shape).tolist()
+            all_bounds = np.broadcast_to(bounds, final.shape).tolist()
+            reasons = []
+            for r, d, o, g, b in zip(ratio.tolist(), decided.tolist(), has_objective.tolist(), constraints, all_bounds):
+                parts = []
+                if d >= 0:
+                    parts.append(f"{names[d]} (CVR {r:.0%})" if o else names[d])
+                elif o:
+                    parts.append("Stable Performance")
+                _limit_reasons(parts, g, b)
+                reasons.append(" + ".join(parts))
+
+        return {"multiplier": multiplier, "action": action, "reason": reasons}
+
+    def global_cap_constraints(
+        self,
+        actual,
+        objective,
+        current_budget,
+        lead_cap: Optional[float],
+        cost_per_lead=None,
+        campaign_ids: Optional[Sequence[str]] = None,
+        fixed_leads: float = 0.0,
+        platform=None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Per-campaign global_constraint and budget_bounds for
+        calculate_adjustments: the budgets the performance rules want are
+        brought within min_budget / max_budget ("bounds": bounded budget
+        over wanted budget), then fitted under `lead_cap` (leads per day)
+        by allocate_budgets, best CVR ratio first ("global": allocated
+        budget over bounded budget).
+
+        min_budget never raises a budget the rules want to decrease: such a
+        campaign is kept at its current budget at most.
+
+        Rules used: cost_per_lead (default 20 budget units per lead, unless
+        `cost_per_lead` gives one per campaign), min_budget (default 1) /
+        max_budget and campaign_limits ({campaign id: {"min_budget",
+        "max_budget"}}).
+        """
+        actual = np.asarray(actual, dtype=np.float64)
+        objective = np.asarray(objective, dtype=np.float64)
+        current_budget = np.asarray(current_budget, dtype=np.float64)
+        n = current_budget.shape[0]
+        if lead_cap is None or n == 0:
+            return {"global": np.ones(n), "bounds": np.ones(n)}
+
+        desired = current_budget * self.calculate_adjustments(
+            actual, objective, spend=current_budget, platform=platform
+        )["multiplier"]
+        default_cpl = float(self.rules.get("cost_per_lead", DEFAULT_COST_PER_LEAD))
+        if cost_per_lead is None:
+            cpl = np.full(n, default_cpl)
+        else:
+            cpl = np.asarray(cost_per_lead, dtype=np.float64)
+            cpl = np.where(np.isfinite(cpl) & (cpl > 0), cpl, default_cpl)
+
+        # Never cut down to nothing: platforms reject a zero daily budget
+        min_budget = np.full(n, float(self.rules.get("min_budget", 1.0)))
+        max_budget = np.full(n, float(self.rules.get("max_budget", np.inf)))
+        limits = self.rules.get("campaign_limits") or {}
+        if limits and campaign_ids is not None:
+            for i, campaign_id in enumerate(campaign_ids):
+                limit = limits.get(campaign_id)
+                if limit:
+                    min_budget[i] = float(limit.get("min_budget", min_budget[i]))
+                    max_budget[i] = float(limit.get("max_budget", max_budget[i]))
+        # Campaigns without a budget on the ad platform are left as they are
+        missing = current_budget <= 0
+        min_budget[missing], max_budget[missing] = 0.0, 0.0
+        # A decrease stays a decrease (or at worst no change)
+        decreasing = desired < current_budget
+        min_budget[decreasing] = np.minimum(min_budget[decreasing], current_budget[decreasing])
+        max_budget = np.maximum(max_budget, min_budget)
+        bounded = np.clip(desired, min_budget, max_budget)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = np.where(objective > 0, actual / np.where(objective > 0, objective, 1.0), 0.0)
+        allocation = allocate_budgets(bounded, lead_cap, score, cpl, min_budget, max_budget, fixed_leads)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {
+                "global": np.where(bounded > 0, allocation["budgets"] / bounded, 1.0),
+                "bounds": np.where(desired > 0, bounded / desired, 1.0),
+            }
@@ -47,6 +47,7 @@ def main():
     
     # For MVP, we assume a simple 1:1 mapping between Sales Campaigns and Ad Campaigns by ID
     # In real world, this might need a mapping table
+    changes = {}
     for campaign_id, s_data in sales_data.items():
         if campaign_id not in campaigns:
             logger.warning(f"Sales data found for {campaign_id} but no matching ad campaign.")
@@ -64,7 +65,16 @@ def main():
             if config.get("dry_run", True):
                 logger.info(f"[DRY RUN] Would update budget from {current_campaign['daily_budget']} to {new_budget:.2f}")
             else:
-                ad_connector.update_budget(campaign_id, new_budget)
+                changes[campaign_id] = new_budget
+
+    # 4. Apply all budget changes in one bulk call
+    if changes:
+        logger.info(f"Applying {len(changes)} budget changes...")
+        results = ad_connector.update_budgets(changes)
+        failed = {c: r for c, r in results.items() if not r["success"]}
+        for campaign_id, result in failed.items():
+            logger.error(f"Budget update failed for {campaign_id}: {result['error']}")
+        logger.info(f"Applied {len(results) - len(failed)}/{len(changes)} budget changes")
 
     logger.info("Automation run complete.")
 
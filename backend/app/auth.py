@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Union
 from jose import JWTError, jwt
+import asyncio
 import bcrypt
 import os
 
@@ -9,6 +11,17 @@ SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 24 hours
 
+# bcrypt work factor for new hashes. Stored hashes with another cost are
+# transparently rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# bcrypt is CPU-bound (~100-300 ms per call) and releases the GIL. Calls go
+# through their own bounded pool so they never block the event loop and a
+# burst of logins cannot occupy every thread of FastAPI's shared threadpool.
+# 0 disables the pool (hash on the calling thread).
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+_password_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt") if PASSWORD_HASH_WORKERS > 0 else None
+
 def verify_password(plain_password, hashed_password):
     # Ensure bytes
     if isinstance(plain_password, str):
@@ -20,7 +33,28 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     if isinstance(password, str):
         password = password.encode('utf-8')
-    return bcrypt.hashpw(password, bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when a bcrypt hash was made with a cost other than BCRYPT_ROUNDS."""
+    # Format: $2b$12$<salt+hash>
+    parts = hashed_password.split("$")
+    if len(parts) != 4 or not parts[2].isdigit():
+        return False
+    return int(parts[2]) != BCRYPT_ROUNDS
+
+async def _run_in_password_pool(func, *args):
+    if _password_pool is None:
+        return func(*args)
+    return await asyncio.wrap_future(_password_pool.submit(func, *args))
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """verify_password on the bcrypt pool (at most PASSWORD_HASH_WORKERS run at once)."""
+    return await _run_in_password_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    """get_password_hash on the bcrypt pool (at most PASSWORD_HASH_WORKERS run at once)."""
+    return await _run_in_password_pool(get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -0,0 +1,404 @@
+"""
+Local mirror of the organizations' ad campaigns.
+
+Listing every active campaign from the ad platforms on each dashboard
+request is slow and spends API quota. Instead, a background sync keeps the
+active campaigns of every organization and platform in the
+`campaign_mirror` table, and API reads are an indexed query on it:
+
+- incremental sync every CAMPAIGN_MIRROR_SYNC_SECONDS: only the campaigns
+  updated since the last sync (Meta `filtering` on updated_time, going back
+  CAMPAIGN_MIRROR_OVERLAP_SECONDS to absorb clock skew); campaigns that
+  stopped running leave the mirror;
+- full reconciliation every CAMPAIGN_MIRROR_FULL_SYNC_SECONDS (and on the
+  first sync, when the platform's ad accounts change or when the platform
+  cannot list changes): the active set is reloaded and rows that were not
+  seen again are dropped (deleted campaigns never show up as changes);
+- a read for an organization that was never synced syncs it inline first;
+- the sync lag (time since the last successful sync) is returned per
+  platform with the data and summarized in stats().
+
+On PostgreSQL only one API worker runs a sync cycle at a time (advisory lock).
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func
+
+from app.database import engine
+from app.models import MirroredCampaign, CampaignSyncState
+from antigravity_ads.connectors.ad_connector import AdPlatformConnector
+
+# Arbitrary key for pg_try_advisory_lock, so only one worker syncs
+SYNC_LOCK_ID = 72_650_003
+# Rows per INSERT ... ON CONFLICT statement
+UPSERT_CHUNK = 1000
+
+ACTIVE = "ACTIVE"
+OK = "ok"
+STALE = "stale"  # served from the mirror, but the last sync failed
+ERROR = "error"  # never synced
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def as_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # SQLite gives naive datetimes back
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+def parse_platform_time(value: Any) -> Optional[datetime.datetime]:
+    """Graph API time ("2024-01-01T00:00:00+0000") as an aware datetime."""
+    if not value:
+        return None
+    if isinstance(value, datetime.datetime):
+        return as_utc(value)
+    try:
+        return datetime.datetime.strptime(str(value), "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        return None
+
+def accounts_key(platform_config: dict) -> str:
+    """Fingerprint of what decides which campaigns a platform returns."""
+    relevant = {k: platform_config.get(k) for k in ("ad_account_id", "ad_account_ids", "access_token")}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+class CampaignMirror:
+    def __init__(
+        self,
+        load_targets: Callable[[], List[Tuple[int, dict]]],
+        enabled_platforms: Callable[[dict], Dict[str, dict]],
+        build_connector: Callable[[str, dict], AdPlatformConnector],
+        enabled: bool = False,
+        interval_seconds: float = 300.0,
+        full_sync_seconds: float = 6 * 3600.0,
+        overlap_seconds: float = 120.0,
+        concurrency: int = 2,
+    ):
+        """
+        `load_targets()` lists (organization id, config) to keep in sync,
+        `enabled_platforms(config)` the {platform: platform config} to mirror
+        and `build_connector(platform, platform config)` makes the connector.
+        """
+        self.load_targets = load_targets
+        self.enabled_platforms = enabled_platforms
+        self.build_connector = build_connector
+        self.enabled = enabled
+        self.interval_seconds = interval_seconds
+        self.full_sync = datetime.timedelta(seconds=full_sync_seconds)
+        self.overlap = datetime.timedelta(seconds=overlap_seconds)
+        self.concurrency = concurrency
+
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        # One sync at a time per (organization, platform): the loop and a cold read may race
+        self._platform_locks: Dict[Tuple[int, str], threading.Lock] = {}
+        self.stats_counters = {
+            "syncs": 0,
+            "full_syncs": 0,
+            "incremental_syncs": 0,
+            "sync_errors": 0,
+            "upserted": 0,
+            "removed": 0,
+            "reads": 0,
+            "cold_reads": 0,
+            "cycles": 0,
+        }
+        self._sync_seconds: deque = deque(maxlen=200)
+        self._last_cycle_seconds: Optional[float] = None
+
+    # --- Sync ---
+
+    def _platform_lock(self, organization_id: int, platform: str) -> threading.Lock:
+        with self._lock:
+            return self._platform_locks.setdefault((organization_id, platform), threading.Lock())
+
+    def _upsert(self, rows: List[dict]) -> int:
+        if not rows:
+            return 0
+        with Session(engine) as session:
+            insert = pg_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+            statement = insert(MirroredCampaign.__table__)
+            statement = statement.on_conflict_do_update(
+                index_elements=["organization_id", "platform", "campaign_id"],
+                set_={c: statement.excluded[c] for c in rows[0] if c not in ("organization_id", "platform", "campaign_id")},
+            )
+            # executemany: sent as multi-row INSERTs, compiled once
+            session.execute(statement, rows)
+            session.commit()
+        return len(rows)
+
+    def _remove(self, organization_id: int, platform: str, campaign_ids: List[str] = None,
+                synced_before: Optional[datetime.datetime] = None) -> int:
+        condition = [MirroredCampaign.organization_id == organization_id, MirroredCampaign.platform == platform]
+        if campaign_ids is not None:
+            if not campaign_ids:
+                return 0
+            condition.append(MirroredCampaign.campaign_id.in_(campaign_ids))
+        if synced_before is not None:
+            condition.append(MirroredCampaign.synced_at < synced_before)
+        with Session(engine) as session:
+            removed = session.execute(delete(MirroredCampaign).where(*condition)).rowcount
+            session.commit()
+        return removed
+
+    def _apply(self, organization_id: int, platform: str, campaigns: Iterable[dict],
+               synced_at: datetime.datetime) -> Tuple[int, List[str], Optional[datetime.datetime]]:
+        """Upserts the running campaigns. Returns (upserted, ids that stopped running, latest updated_time)."""
+        rows, stopped, upserted, watermark = [], [], 0, None
+        for campaign in campaigns:
+            updated = parse_platform_time(campaign.get("updated_time"))
+            if updated is not None and (watermark is None or updated > watermark):
+                watermark = updated
+            campaign_id = str(campaign["platform_id"])
+            if campaign.get("effective_status", ACTIVE) != ACTIVE:
+                stopped.append(campaign_id)
+                continue
+            rows.append({
+                "organization_id": organization_id,
+                "platform": platform,
+                "campaign_id": campaign_id,
+                "ad_account_id": campaign.get("ad_account_id"),
+                "name": campaign.get("name"),
+                "daily_budget": float(campaign.get("daily_budget") or 0.0),
+                "status": campaign.get("status"),
+                "updated_time": updated,
+                "synced_at": synced_at,
+            })
+            if len(rows) >= UPSERT_CHUNK:
+                upserted += self._upsert(rows)
+                rows = []
+        upserted += self._upsert(rows)
+        return upserted, stopped, watermark
+
+    def sync_platform(self, organization_id: int, platform: str, platform_config: dict, full: bool = False) -> Dict[str, Any]:
+        """Brings one organization's platform up to date. Never raises: errors are recorded on the sync state."""
+        key = accounts_key(platform_config)
+        with self._platform_lock(organization_id, platform):
+            start = time.perf_counter()
+            now = utcnow()
+            with Session(engine) as session:
+                state = session.exec(
+                    select(CampaignSyncState.accounts_key, CampaignSyncState.high_watermark,
+                           CampaignSyncState.last_sync_at, CampaignSyncState.last_full_sync_at)
+                    .where(CampaignSyncState.organization_id == organization_id, CampaignSyncState.platform == platform)
+                ).first()
+            old_key, high_watermark, last_sync_at, last_full_sync_at = (
+                (state[0], as_utc(state[1]), as_utc(state[2]), as_utc(state[3])) if state else (None, None, None, None)
+            )
+
+            try:
+                connector = self.build_connector(platform, platform_config)
+                full = (
+                    full or old_key != key or last_full_sync_at is None
+                    or not connector.supports_incremental_sync
+                    or now - last_full_sync_at >= self.full_sync
+                )
+                since = None if full else (high_watermark or last_sync_at) - self.overlap
+                upserted, stopped, watermark = self._apply(
+                    organization_id, platform, connector.iter_campaign_changes(since), now
+                )
+                if full:
+                    # Everything still running was just upserted: the rest is gone
+                    removed = self._remove(organization_id, platform, synced_before=now)
+                else:
+                    removed = self._remove(organization_id, platform, campaign_ids=stopped)
+            except Exception as e:
+                print(f"Campaign mirror: sync of {platform} for organization {organization_id} failed: {e}")
+                self._save_state(organization_id, platform, {"accounts_key": old_key or key, "last_error": str(e)[:500]})
+                with self._lock:
+                    self.stats_counters["sync_errors"] += 1
+                return {"status": ERROR, "error": str(e)}
+
+            if not full and high_watermark is not None and (watermark is None or watermark < high_watermark):
+                watermark = high_watermark
+            values = {"accounts_key": key, "high_watermark": watermark, "last_sync_at": now, "last_error": None}
+            if full:
+                values["last_full_sync_at"] = now
+            self._save_state(organization_id, platform, values)
+
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.stats_counters["syncs"] += 1
+                self.stats_counters["full_syncs" if full else "incremental_syncs"] += 1
+                self.stats_counters["upserted"] += upserted
+                self.stats_counters["removed"] += removed
+                self._sync_seconds.append(seconds)
+            return {"status": OK, "full": full, "upserted": upserted, "removed": removed, "seconds": round(seconds, 3)}
+
+    def _save_state(self, organization_id: int, platform: str, values: dict):
+        with Session(engine) as session:
+            state = session.exec(
+                select(CampaignSyncState)
+                .where(CampaignSyncState.organization_id == organization_id, CampaignSyncState.platform == platform)
+            ).first()
+            if state is None:
+                state = CampaignSyncState(organization_id=organization_id, platform=platform, accounts_key=values["accounts_key"])
+            for name, value in values.items():
+                setattr(state, name, value)
+            session.add(state)
+            session.commit()
+
+    def sync_organization(self, organization_id: int, config: dict, full: bool = False) -> Dict[str, Dict[str, Any]]:
+        return {
+            platform: self.sync_platform(organization_id, platform, platform_config, full)
+            for platform, platform_config in self.enabled_platforms(config).items()
+        }
+
+    def sync_all(self) -> int:
+        """One sync cycle over every target. Returns the platforms synced (0 when another worker holds the lock)."""
+        with engine.connect() as lock_connection:
+            postgres = lock_connection.dialect.name == "postgresql"
+            if postgres and not lock_connection.execute(
+                text("SELECT pg_try_advisory_lock(:id)"), {"id": SYNC_LOCK_ID}
+            ).scalar():
+                return 0  # another worker is syncing
+            try:
+                start = time.perf_counter()
+                jobs = [
+                    (organization_id, platform, platform_config)
+                    for organization_id, config in self.load_targets()
+                    for platform, platform_config in self.enabled_platforms(config).items()
+                ]
+                with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="campaign-mirror") as pool:
+                    list(pool.map(lambda job: self.sync_platform(*job), jobs))
+                with self._lock:
+                    self.stats_counters["cycles"] += 1
+                    self._last_cycle_seconds = time.perf_counter() - start
+                return len(jobs)
+            finally:
+                if postgres:
+                    lock_connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": SYNC_LOCK_ID})
+
+    # --- Reads ---
+
+    def read(self, organization_id: int, config: dict) -> Optional[Dict[str, Any]]:
+        """
+        Ad payload ({"campaigns", "platforms"}, like fetch_ad_campaigns) from
+        the mirror; None when the organization has no platform to mirror.
+        """
+        platforms = self.enabled_platforms(config)
+        if not platforms:
+            return None
+        with self._lock:
+            self.stats_counters["reads"] += 1
+
+        states = self._states(organization_id, platforms)
+        cold = [p for p, platform_config in platforms.items()
+                if p not in states or states[p]["accounts_key"] != accounts_key(platform_config)]
+        if cold:
+            with self._lock:
+                self.stats_counters["cold_reads"] += 1
+            for platform in cold:
+                self.sync_platform(organization_id, platform, platforms[platform])
+            states = self._states(organization_id, platforms)
+
+        with Session(engine) as session:
+            rows = session.exec(
+                select(MirroredCampaign.platform, MirroredCampaign.campaign_id, MirroredCampaign.name,
+                       MirroredCampaign.daily_budget, MirroredCampaign.status, MirroredCampaign.ad_account_id)
+                .where(MirroredCampaign.organization_id == organization_id, MirroredCampaign.platform.in_(list(platforms)))
+            ).all()
+
+        campaigns, counts = {}, dict.fromkeys(platforms, 0)
+        for platform, campaign_id, name, daily_budget, status, ad_account_id in rows:
+            # Ids are only unique per platform
+            key = campaign_id if campaign_id not in campaigns else f"{platform}:{campaign_id}"
+            campaigns[key] = {
+                "name": name, "daily_budget": daily_budget, "status": status,
+                "platform_id": campaign_id, "ad_account_id": ad_account_id, "platform": platform,
+            }
+            counts[platform] += 1
+
+        now = utcnow()
+        status = {}
+        for platform in platforms:
+            state = states.get(platform) or {}
+            last_sync_at = state.get("last_sync_at")
+            status[platform] = {
+                "status": ERROR if last_sync_at is None else (STALE if state.get("last_error") else OK),
+                "campaigns": counts[platform],
+                "sync_lag_seconds": round((now - last_sync_at).total_seconds(), 1) if last_sync_at else None,
+            }
+            if state.get("last_error"):
+                status[platform]["error"] = state["last_error"]
+        return {"campaigns": campaigns, "platforms": status}
+
+    def _states(self, organization_id: int, platforms: Dict[str, dict]) -> Dict[str, dict]:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(CampaignSyncState.platform, CampaignSyncState.accounts_key,
+                       CampaignSyncState.last_sync_at, CampaignSyncState.last_error)
+                .where(CampaignSyncState.organization_id == organization_id,
+                       CampaignSyncState.platform.in_(list(platforms)))
+            ).all()
+        return {
+            platform: {"accounts_key": key, "last_sync_at": as_utc(last_sync_at), "last_error": last_error}
+            for platform, key, last_sync_at, last_error in rows
+        }
+
+    # --- Background loop ---
+
+    def start(self):
+        if self._task is not None or not self.enabled:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sync_all)
+            except Exception as e:
+                print(f"Campaign mirror sync cycle failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    # --- Metrics ---
+
+    def stats(self) -> Dict[str, Any]:
+        now = utcnow()
+        with Session(engine) as session:
+            states = session.exec(select(CampaignSyncState.last_sync_at, CampaignSyncState.last_error)).all()
+            rows = session.exec(select(func.count(MirroredCampaign.id))).one()
+        lags = [(now - as_utc(last_sync_at)).total_seconds() for last_sync_at, _ in states if last_sync_at]
+        with self._lock:
+            counters = dict(self.stats_counters)
+            sync_seconds = list(self._sync_seconds)
+            last_cycle = self._last_cycle_seconds
+        return {
+            "enabled": self.enabled,
+            **counters,
+            "mirrored_campaigns": rows,
+            "platforms_synced": len(lags),
+            "platforms_failing": sum(1 for _, error in states if error),
+            "sync_lag_seconds": {
+                "p50": round(statistics.median(lags), 1) if lags else None,
+                "max": round(max(lags), 1) if lags else None,
+            },
+            "sync_duration": {
+                "p50_ms": round(statistics.median(sync_seconds) * 1000, 1) if sync_seconds else 0.0,
+                "max_ms": round(max(sync_seconds) * 1000, 1) if sync_seconds else 0.0,
+            },
+            "last_cycle_seconds": round(last_cycle, 2) if last_cycle is not None else None,
+        }
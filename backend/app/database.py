@@ -1,26 +1,85 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.concurrency import run_in_threadpool
+from app.sql_metrics import sql_metrics
 import os
 
+# Statement logging to stdout (slow, for local debugging only)
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+# Per-request query count / SQL time, exposed via /api/admin/sql-metrics
+SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "false").lower() == "true"
+# API requests use an async engine (asyncpg / aiosqlite) instead of the threadpool
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() == "true"
+
+# Connection pool (Postgres only, SQLite uses SQLAlchemy's defaults)
+pool_kwargs = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+}
+
 database_url = os.getenv("DATABASE_URL")
 if not database_url:
     sqlite_file_name = "database.db"
     database_url = f"sqlite:///{sqlite_file_name}"
+    async_database_url = f"sqlite+aiosqlite:///{sqlite_file_name}"
     connect_args = {"check_same_thread": False}
-    engine = create_engine(database_url, echo=True, connect_args=connect_args)
+    engine = create_engine(database_url, echo=SQL_ECHO, connect_args=connect_args)
+    engine_kwargs = {}
 else:
     # Postgres
-    # Ensure usage of psycopg2 driver explicitly
+    # Ensure usage of psycopg2 driver explicitly (asyncpg for the async engine)
     if database_url.startswith("postgres://"):
         database_url = database_url.replace("postgres://", "postgresql://", 1)
-    
+
+    async_database_url = database_url
     if database_url.startswith("postgresql://"):
         database_url = database_url.replace("postgresql://", "postgresql+psycopg2://", 1)
-        
-    engine = create_engine(database_url, echo=True)
+        async_database_url = async_database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+    engine_kwargs = pool_kwargs
+    engine = create_engine(database_url, echo=SQL_ECHO, **engine_kwargs)
+
+async_engine = None
+if DATABASE_ASYNC:
+    async_engine = create_async_engine(async_database_url, echo=SQL_ECHO, **engine_kwargs)
+
+if SQL_INSTRUMENTATION:
+    sql_metrics.instrument(engine)
+    if async_engine is not None:
+        sql_metrics.instrument(async_engine.sync_engine)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+class Database:
+    """
+    Runs DB work written against the sync Session API in either engine mode.
+
+    `await db.run(fn, *args)` calls `fn(session, *args)`:
+    - sync mode: on FastAPI's threadpool, with a regular Session;
+    - async mode: via AsyncSession.run_sync, on the event loop (asyncpg /
+      aiosqlite), so lazy loads and commits inside `fn` need no thread.
+
+    `fn` must not return ORM objects that are used after the call (return
+    values or snapshots instead), and must not block on threading primitives.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn, *args, **kwargs):
+        if isinstance(self.session, AsyncSession):
+            return await self.session.run_sync(fn, *args, **kwargs)
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+async def get_db():
+    if async_engine is not None:
+        async with AsyncSession(async_engine) as session:
+            yield Database(session)
+    else:
+        with Session(engine) as session:
+            yield Database(session)
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from app.models import User
+
+# --- Snapshots (immutable copies of the DB rows a request needs) ---
+
+class IntegrationSnapshot(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    provider: str
+    is_enabled: bool = False
+    credentials: Dict[str, Any] = {}
+
+class OrganizationSnapshot(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: int
+    name: str
+    google_sheet_id: Optional[str] = None
+    drive_folder_id: Optional[str] = None
+    plan: str = "free"
+    stripe_customer_id: Optional[str] = None
+    sheet_layout: Optional[Dict[str, Any]] = None
+    bot_settings: Optional[Dict[str, Any]] = None
+    integrations: List[IntegrationSnapshot] = []
+
+class UserIdentity(BaseModel):
+    """
+    Read-only view of a User with its Organization and Integrations.
+    Exposes the same attributes as the ORM objects so read-only helpers
+    (e.g. load_config_from_db) accept both.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    role: str = "user"
+    is_active: bool = True
+    is_superuser: bool = False
+    organization_id: Optional[int] = None
+    organization: Optional[OrganizationSnapshot] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserIdentity":
+        org = user.organization
+        org_snapshot = None
+        if org:
+            org_snapshot = OrganizationSnapshot(
+                id=org.id,
+                name=org.name,
+                google_sheet_id=org.google_sheet_id,
+                drive_folder_id=org.drive_folder_id,
+                plan=org.plan,
+                stripe_customer_id=org.stripe_customer_id,
+                sheet_layout=dict(org.sheet_layout) if org.sheet_layout else None,
+                bot_settings=dict(org.bot_settings) if org.bot_settings else None,
+                integrations=[
+                    IntegrationSnapshot(
+                        provider=i.provider,
+                        is_enabled=i.is_enabled,
+                        credentials=dict(i.credentials or {})
+                    )
+                    for i in org.integrations
+                ]
+            )
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            role=user.role,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            organization_id=user.organization_id,
+            organization=org_snapshot
+        )
+
+# --- Cache ---
+
+class IdentityCache:
+    """
+    Bounded in-process cache of UserIdentity snapshots keyed by email.
+    Entries expire after `ttl_seconds`; once `max_size` is reached the least
+    recently used entry is evicted. Endpoints that modify a user or its
+    organization must call `invalidate` / `invalidate_organization`.
+
+    A snapshot loaded while its user or organization was invalidated is
+    stale: read `generation()` before loading and pass it to `put`, which
+    then skips it.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; generation of the last one per ("user", email) / ("org", id)
+        self._generation = 0
+        self._invalidated: "OrderedDict[tuple, int]" = OrderedDict()
+        # Generation of the newest invalidation forgotten from _invalidated
+        self._forgotten = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_puts = 0
+
+    def get(self, email: str) -> Optional[UserIdentity]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            identity, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[email]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return identity
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def _is_stale(self, identity: UserIdentity, generation: int) -> bool:
+        return (
+            generation < self._forgotten
+            or self._invalidated.get(("user", identity.email), 0) > generation
+            or self._invalidated.get(("org", identity.organization_id), 0) > generation
+        )
+
+    def _record_invalidation(self, key: tuple):
+        self._generation += 1
+        self._invalidated[key] = self._generation
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > max(self.max_size, 1):
+            _, forgotten = self._invalidated.popitem(last=False)
+            self._forgotten = max(self._forgotten, forgotten)
+
+    def put(self, identity: UserIdentity, generation: Optional[int] = None):
+        """Caches a snapshot; `generation` is generation() read before loading it."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and self._is_stale(identity, generation):
+                self.stale_puts += 1
+                return
+            self._entries[identity.email] = (identity, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(identity.email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+            self._record_invalidation(("user", email))
+
+    def invalidate_organization(self, organization_id: Optional[int]):
+        """Drops every cached user of an organization (org fields are shared)."""
+        if organization_id is None:
+            return
+        with self._lock:
+            self._record_invalidation(("org", organization_id))
+            stale = [
+                email for email, (identity, _) in self._entries.items()
+                if identity.organization_id == organization_id
+            ]
+            for email in stale:
+                del self._entries[email]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "stale_puts": self.stale_puts,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
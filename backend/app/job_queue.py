@@ -0,0 +1,254 @@
+"""
+Durable queue of optimization jobs (optimization_job table).
+
+POST /api/optimize used to fetch, plan and apply while the request waited.
+It now submits a job and returns its id; a separate worker process
+(app.optimization_worker) runs it and the client polls
+GET /api/optimize/jobs/{job_id} for the status and result.
+
+- submit: a client-chosen idempotency key makes resubmitting the same
+  request return the same job (unique per organization).
+- claim: one UPDATE over the oldest due jobs. On PostgreSQL the candidates
+  are selected FOR UPDATE SKIP LOCKED, so concurrent workers never wait on
+  or take each other's jobs; on SQLite the statement is serialized by the
+  database lock, which gives the same guarantee.
+- a claimed job is leased to its worker for OPTIMIZATION_JOB_LEASE_SECONDS,
+  renewed by the worker while the job runs; a job whose worker died is
+  claimed again once the lease expires.
+- a failed attempt is retried with exponential backoff
+  (OPTIMIZATION_JOB_RETRY_SECONDS, doubled per attempt) up to max_attempts;
+  PermanentJobError fails the job at once.
+"""
+import datetime
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, func
+
+from app.database import engine
+from app.models import OptimizationJob
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+# Shared by the API (submit) and the workers (claim / retry)
+OPTIMIZATION_JOB_LEASE_SECONDS = float(os.getenv("OPTIMIZATION_JOB_LEASE_SECONDS", "600"))
+OPTIMIZATION_JOB_RETRY_SECONDS = float(os.getenv("OPTIMIZATION_JOB_RETRY_SECONDS", "30"))
+OPTIMIZATION_JOB_MAX_ATTEMPTS = int(os.getenv("OPTIMIZATION_JOB_MAX_ATTEMPTS", "3"))
+OPTIMIZATION_JOB_RETENTION_SECONDS = float(os.getenv("OPTIMIZATION_JOB_RETENTION_SECONDS", str(7 * 86400)))
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+class PermanentJobError(Exception):
+    """A failure retrying cannot fix (e.g. the organization is gone)."""
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker may have claimed it: stop working on it."""
+
+class OptimizationJobQueue:
+    def __init__(
+        self,
+        lease_seconds: float = OPTIMIZATION_JOB_LEASE_SECONDS,
+        retry_seconds: float = OPTIMIZATION_JOB_RETRY_SECONDS,
+        max_attempts: int = OPTIMIZATION_JOB_MAX_ATTEMPTS,
+        retention_seconds: float = OPTIMIZATION_JOB_RETENTION_SECONDS,
+    ):
+        self.lease = datetime.timedelta(seconds=lease_seconds)
+        self.retry_seconds = retry_seconds
+        self.max_attempts = max_attempts
+        self.retention = datetime.timedelta(seconds=retention_seconds)
+
+        # Activity of this process (the table holds the global counts)
+        self.stats_counters = {
+            "submitted": 0,
+            "deduplicated": 0,
+            "claimed": 0,
+            "succeeded": 0,
+            "retried": 0,
+            "failed": 0,
+            "lost_leases": 0,
+        }
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.stats_counters[name] += n
+
+    # --- API side ---
+
+    def submit(self, organization_id: int, dry_run: bool = True, idempotency_key: Optional[str] = None) -> OptimizationJob:
+        """Queues a job, or returns the organization's job with the same idempotency key."""
+        with Session(engine) as session:
+            if idempotency_key is not None:
+                existing = self._by_key(session, organization_id, idempotency_key)
+                if existing is not None:
+                    self._count("deduplicated")
+                    return existing
+            job = OptimizationJob(
+                organization_id=organization_id,
+                idempotency_key=idempotency_key,
+                dry_run=dry_run,
+                max_attempts=self.max_attempts,
+            )
+            session.add(job)
+            try:
+                session.commit()
+            except IntegrityError:
+                # The same key submitted concurrently: the other request won
+                session.rollback()
+                self._count("deduplicated")
+                return self._by_key(session, organization_id, idempotency_key)
+            session.refresh(job)
+        self._count("submitted")
+        return job
+
+    @staticmethod
+    def _by_key(session: Session, organization_id: int, idempotency_key: str) -> Optional[OptimizationJob]:
+        return session.exec(
+            select(OptimizationJob).where(
+                OptimizationJob.organization_id == organization_id,
+                OptimizationJob.idempotency_key == idempotency_key,
+            )
+        ).first()
+
+    def get(self, job_id: int) -> Optional[OptimizationJob]:
+        with Session(engine) as session:
+            return session.get(OptimizationJob, job_id)
+
+    # --- Worker side ---
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[OptimizationJob]:
+        """Leases up to `limit` due jobs to `worker_id` (oldest first)."""
+        now = utcnow()
+        with Session(engine, expire_on_commit=False) as session:
+            # Leases that expired on their last attempt: the worker died every time
+            session.execute(
+                update(OptimizationJob)
+                .where(
+                    OptimizationJob.status == RUNNING,
+                    OptimizationJob.locked_until < now,
+                    OptimizationJob.attempts >= OptimizationJob.max_attempts,
+                )
+                .values(status=FAILED, finished_at=now, locked_by=None, locked_until=None,
+                        error="Worker lost (lease expired)")
+            )
+            due = (
+                select(OptimizationJob.id)
+                .where(or_(
+                    and_(OptimizationJob.status == QUEUED, OptimizationJob.run_after <= now),
+                    and_(OptimizationJob.status == RUNNING, OptimizationJob.locked_until < now),
+                ))
+                .order_by(OptimizationJob.run_after, OptimizationJob.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            jobs = session.execute(
+                update(OptimizationJob)
+                .where(OptimizationJob.id.in_(due.scalar_subquery()))
+                .values(
+                    status=RUNNING,
+                    locked_by=worker_id,
+                    locked_until=now + self.lease,
+                    attempts=OptimizationJob.attempts + 1,
+                    started_at=now,
+                )
+                .returning(OptimizationJob)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            session.commit()
+        self._count("claimed", len(jobs))
+        return sorted(jobs, key=lambda job: (job.run_after, job.id))
+
+    def renew(self, job: OptimizationJob, worker_id: str) -> bool:
+        """Extends the lease of a running job; False when `worker_id` no longer holds it."""
+        with Session(engine) as session:
+            updated = session.execute(
+                update(OptimizationJob)
+                .where(
+                    OptimizationJob.id == job.id,
+                    OptimizationJob.status == RUNNING,
+                    OptimizationJob.locked_by == worker_id,
+                )
+                .values(locked_until=utcnow() + self.lease)
+            ).rowcount
+            session.commit()
+        if not updated:
+            self._count("lost_leases")
+        return bool(updated)
+
+    def _finish(self, job: OptimizationJob, worker_id: str, **values) -> bool:
+        """Updates a job still leased to `worker_id`; False when the lease was lost to another worker."""
+        with Session(engine) as session:
+            updated = session.execute(
+                update(OptimizationJob)
+                .where(
+                    OptimizationJob.id == job.id,
+                    OptimizationJob.status == RUNNING,
+                    OptimizationJob.locked_by == worker_id,
+                )
+                .values(locked_by=None, locked_until=None, **values)
+            ).rowcount
+            session.commit()
+        if not updated:
+            self._count("lost_leases")
+        return bool(updated)
+
+    def complete(self, job: OptimizationJob, worker_id: str, result: Dict[str, Any]) -> bool:
+        if self._finish(job, worker_id, status=SUCCEEDED, finished_at=utcnow(), result=result, error=None):
+            self._count("succeeded")
+            return True
+        return False
+
+    def fail(self, job: OptimizationJob, worker_id: str, error: str, retry: bool = True) -> bool:
+        """Requeues the job with backoff, or fails it after its last attempt (or when `retry` is False)."""
+        now = utcnow()
+        if retry and job.attempts < job.max_attempts:
+            delay = datetime.timedelta(seconds=self.retry_seconds * 2 ** (job.attempts - 1))
+            if self._finish(job, worker_id, status=QUEUED, run_after=now + delay, error=error):
+                self._count("retried")
+                return True
+            return False
+        if self._finish(job, worker_id, status=FAILED, finished_at=now, error=error):
+            self._count("failed")
+            return True
+        return False
+
+    def purge(self) -> int:
+        """Deletes the jobs finished more than OPTIMIZATION_JOB_RETENTION_SECONDS ago."""
+        with Session(engine) as session:
+            deleted = session.execute(
+                delete(OptimizationJob).where(
+                    OptimizationJob.status.in_(FINISHED_STATES),
+                    OptimizationJob.finished_at < utcnow() - self.retention,
+                )
+            ).rowcount
+            session.commit()
+        return deleted
+
+    # --- Metrics ---
+
+    def stats(self) -> Dict[str, Any]:
+        with Session(engine) as session:
+            by_status = dict(session.exec(
+                select(OptimizationJob.status, func.count()).group_by(OptimizationJob.status)
+            ).all())
+            oldest = session.exec(
+                select(func.min(OptimizationJob.created_at)).where(OptimizationJob.status == QUEUED)
+            ).one()
+        if oldest is not None and oldest.tzinfo is None:
+            oldest = oldest.replace(tzinfo=datetime.timezone.utc)  # SQLite
+        with self._lock:
+            counters = dict(self.stats_counters)
+        return {
+            "jobs": {state: by_status.get(state, 0) for state in (QUEUED, RUNNING, SUCCEEDED, FAILED)},
+            "oldest_queued_seconds": round((utcnow() - oldest).total_seconds(), 1) if oldest else 0.0,
+            **counters,
+        }
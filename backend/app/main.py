@@ -1,6 +1,6 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, EmailStr
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 import sys
 import os
 import stripe
@@ -18,11 +18,11 @@ stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "")
 # Add the parent directory to sys.path to import antigravity_ads
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from antigravity_ads.connectors.sales_connector import MockSalesConnector
-from antigravity_ads.connectors.google_sheet_connector import GoogleSheetConnector
-from antigravity_ads.connectors.ad_connector import MockAdConnector
+from antigravity_ads.connectors.sheet_layout import SheetLayout
+from antigravity_ads.connectors.meta_throttle import meta_throttle
 from antigravity_ads.connectors.google_drive_service import GoogleDriveService
-from antigravity_ads.engine.rules import BudgetOptimizer
+from antigravity_ads.engine.planner import plan_campaigns
+from antigravity_ads.engine.rule_plan import validate_budget_rules
 import yaml
 
 app = FastAPI(title="Antigravity Ads API")
@@ -39,24 +39,59 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Ad-Platforms", "X-Campaign-Sync-Lag"],
 )
 
-@app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
-
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Response, Header, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlmodel import Session, select
-from app.database import create_db_and_tables, get_session, engine
-from app.models import User, Token, Organization
-from app.auth import verify_password, create_access_token, get_password_hash
+from sqlmodel import Session, select, func
+from app.database import get_session, get_db, Database, engine
+from app.migrate_db import check_schema
+from app.models import User, Token, Organization, Integration, OptimizationJob
+from app.prefetch import PrefetchScheduler
+from app.sheet_jobs import SheetJob, SheetProvisioningJobs, COMPLETED, CLAIMING
+from app.template_pool import TemplatePool
+from app.campaign_mirror import CampaignMirror
+from app.tenant_config import (
+    BotSettings, load_config_from_org, auto_scaling_enabled, enabled_ad_platforms, build_ad_connector, get_ad_connector,
+    sheet_cache, fetch_sales_payload
+)
+from app.optimization_scheduler import OptimizationScheduler
+from app.job_queue import OptimizationJobQueue, SUCCEEDED
+from app.auth import (
+    create_access_token, verify_password_async, get_password_hash_async,
+    password_needs_rehash
+)
 from datetime import timedelta
 
+# --- SQL Instrumentation ---
+
+from fastapi import Request
+from app.database import SQL_INSTRUMENTATION
+from app.sql_metrics import sql_metrics
+
+# Adds X-SQL-* timing headers to every response (debug only)
+SQL_DEBUG_HEADERS = os.getenv("SQL_DEBUG_HEADERS", "false").lower() == "true"
+
+if SQL_INSTRUMENTATION:
+    @app.middleware("http")
+    async def sql_metrics_middleware(request: Request, call_next):
+        stats = sql_metrics.start_request()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        sql_metrics.finish_request(route.path if route else request.url.path, stats)
+        if SQL_DEBUG_HEADERS:
+            response.headers.update(sql_metrics.response_headers(stats))
+        return response
+
 # --- Auth & Dependencies ---
 
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from supabase import create_client, Client
+from app.token_verifier import SupabaseTokenVerifier
+from app.identity_cache import IdentityCache, UserIdentity
+from app.provisioning import get_or_provision_user, provision_guard
+from sqlalchemy.orm import selectinload
 import os
 
 security = HTTPBearer()
@@ -67,15 +102,37 @@ security = HTTPBearer()
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY", "")
 
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+# "local": verify JWTs in-process (falls back to Supabase for unknown keys)
+# "remote": always call supabase.auth.get_user
+SUPABASE_AUTH_MODE = os.getenv("SUPABASE_AUTH_MODE", "local")
+
+_supabase_client: Optional[Client] = None
+
 def get_supabase_client() -> Client:
+    global _supabase_client
     if not SUPABASE_URL or not SUPABASE_KEY:
         # Fallback for build time or if not configured yet
         return None
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    if _supabase_client is None:
+        _supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase_client
+
+token_verifier = SupabaseTokenVerifier(
+    SUPABASE_URL,
+    jwt_secret=SUPABASE_JWT_SECRET,
+    mode=SUPABASE_AUTH_MODE,
+    client_factory=get_supabase_client,
+    jwks_refresh_seconds=float(os.getenv("SUPABASE_JWKS_REFRESH_SECONDS", "600")),
+)
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), session: Session = Depends(get_session)):
+identity_cache = IdentityCache(
+    max_size=int(os.getenv("IDENTITY_CACHE_MAX_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60")),
+)
+
+def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     token = credentials.credentials
-    supabase = get_supabase_client()
     
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -83,67 +140,76 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    if not supabase:
+    if not SUPABASE_URL:
         # If Supabase is not configured, deny access
         print("Supabase credentials missing in backend")
         raise credentials_exception
 
     try:
-        # Verify Token with Supabase
-        user_response = supabase.auth.get_user(token)
-        
-        if not user_response or not user_response.user:
+        # Verify Token (locally when possible, with Supabase otherwise)
+        claims = token_verifier.verify(token)
+        if not claims.get("email"):
             raise credentials_exception
-            
-        sb_user = user_response.user
-        email = sb_user.email
+        return claims
         
     except Exception as e:
         print(f"Auth Error: {e}")
         raise credentials_exception
-        
+
+def sync_local_user(session: Session, claims: dict, *options) -> User:
+    email = claims["email"]
+    user_metadata = claims.get("user_metadata") or {}
+
     # Sync User with Local DB
     # We use the email to find/create the user in our Postgres DB
     # so we can link data (Organizations, Campaigns, etc.)
-    statement = select(User).where(User.email == email)
-    user = session.exec(statement).first()
-    
-    if not user:
-        # Auto-create user in local DB if they exist in Supabase but not here
-        # This simplifies the flow (no separate register endpoint needed for backend)
-        
-        # Check if we should auto-join an organization or create one?
-        # For now, create a default organization based on metadata if available
-        company_name = sb_user.user_metadata.get("company_name", "My Organization")
-        full_name = sb_user.user_metadata.get("full_name", email.split("@")[0])
-        
-        # Create Org
-        org = Organization(name=company_name)
-        session.add(org)
-        session.commit()
-        session.refresh(org)
-        
-        # Create User
-        user = User(
-            email=email,
-            hashed_password="supabase_managed", # Dummy
-            full_name=full_name,
-            organization_id=org.id,
-            is_superuser=False,
-            role="user"
-        )
-        session.add(user)
-        session.commit()
-        session.refresh(user)
-        
+    # Users that exist in Supabase but not here are auto-created, with a
+    # default organization based on metadata if available
+    user, _ = get_or_provision_user(
+        session,
+        email=email,
+        full_name=user_metadata.get("full_name", email.split("@")[0]),
+        company_name=user_metadata.get("company_name", "My Organization"),
+        options=options
+    )
     return user
 
+def get_current_user(claims: dict = Depends(get_token_claims), session: Session = Depends(get_session)) -> User:
+    """Authenticated user as a live ORM object. Use for endpoints that modify the user or its organization."""
+    return sync_local_user(session, claims)
+
+def load_identity(session: Session, claims: dict, provision: bool) -> Optional[UserIdentity]:
+    options = (selectinload(User.organization).selectinload(Organization.integrations),)
+    if provision:
+        user = sync_local_user(session, claims, *options)
+    else:
+        user = session.exec(select(User).where(User.email == claims["email"]).options(*options)).first()
+        if not user:
+            return None
+    return UserIdentity.from_user(user)
+
+async def get_current_identity(claims: dict = Depends(get_token_claims), db: Database = Depends(get_db)) -> UserIdentity:
+    """Authenticated user as a cached read-only snapshot (no DB hit while cached)."""
+    identity = identity_cache.get(claims["email"])
+    if identity is None:
+        # Read before loading: an invalidation during the load makes the snapshot stale
+        generation = identity_cache.generation()
+        identity = await db.run(load_identity, claims, False)
+        if identity is None:
+            # First login: concurrent requests for this email provision once
+            async with provision_guard(claims["email"]):
+                identity = await db.run(load_identity, claims, True)
+        identity_cache.put(identity, generation)
+    return identity
+
 # --- Data Models ---
 
 class GoogleSheetsConfig(BaseModel):
     spreadsheet_id: str
     range_name: str
     drive_folder_id: Optional[str] = None
+    # SheetLayout: {"version": "v1", **overrides}; omitted = unchanged, {} = default
+    layout: Optional[Dict[str, Any]] = None
 
 class AdPlatformConfig(BaseModel):
     enabled: bool
@@ -184,12 +250,6 @@ class CRMProviders(BaseModel):
     salesforce: Optional[CRMConfig] = None
     pipedrive: Optional[CRMConfig] = None
 
-class BotSettings(BaseModel):
-    global_budget_cap: int = 5000
-    target_roas: float = 2.5
-    optimization_frequency: str = "daily"
-    auto_scaling_enabled: bool = True
-
 class BillingConfig(BaseModel):
     current_plan: str = "free"
     status: str = "inactive"
@@ -205,85 +265,169 @@ class ConfigModel(BaseModel):
 
 # --- Configuration & Helpers (DB Based) ---
 
-def load_config_from_db(user: User):
+def load_config_from_db(user: Union[User, UserIdentity]):
     """
     Constructs the config dictionary from the User's Organization in DB.
     Fallback to settings.yaml is removed/deprecated for SaaS mode.
     """
     if not user.organization:
         return {}
-    
-    org = user.organization
-    
-    # 1. Base Config Structure
-    config = {
-        "sales_source_type": "google_sheets" if org.google_sheet_id else "mock",
-        "google_sheets": {
-            "spreadsheet_id": org.google_sheet_id or "",
-            "range_name": "Feuille 1!A2:C",
-            "drive_folder_id": org.drive_folder_id
-        },
-        "ad_platforms": {
-            "meta": {"enabled": False}, # Defaults, to be expanded with Integration Table
-            "google": {"enabled": False},
-            "snap": {"enabled": False}
-        },
-        "billing": {
-            "current_plan": org.plan or "free",
-            "status": "active"
-        }
-    }
-    
-    # Check Integrations Table (Not fully implemented in UI yet, but structure is ready)
-    if org.integrations:
-        for integration in org.integrations:
-            if integration.provider in config["ad_platforms"]:
-                config["ad_platforms"][integration.provider] = {
-                    "enabled": integration.is_enabled,
-                    **integration.credentials
-                }
-                
-    return config
-
-def get_connectors(config):
-    sales_source_type = config.get("sales_source_type", "mock")
-    if sales_source_type == "google_sheets":
-        sales_connector = GoogleSheetConnector(config.get("google_sheets", {}))
-    else:
-        sales_connector = MockSalesConnector()
-    
-    from antigravity_ads.connectors.meta_connector import MetaAdsConnector
-    
-    # Ad Connector Logic
-    meta_config = config.get("ad_platforms", {}).get("meta", {})
-    if meta_config.get("enabled") and meta_config.get("access_token") and meta_config.get("ad_account_id"):
-         ad_connector = MetaAdsConnector(meta_config)
-    else:
-         ad_connector = MockAdConnector(platform_name="Meta Ads (Mock)", config=config)
-         
-    return sales_connector, ad_connector
+    return load_config_from_org(user.organization)
+
+def fetch_ad_campaigns(config):
+    """
+    Ad payload: {"campaigns": merged campaigns of all platforms, "platforms":
+    status per platform}. Slow or failing platforms are left out and reported;
+    raises only when no platform answered (the prefetcher then keeps the
+    previous snapshot).
+    """
+    campaigns, platforms = get_ad_connector(config).fetch()
+    return {"campaigns": campaigns, "platforms": platforms}
+
+def fetch_ad_campaigns_or_empty(config):
+    try:
+        return fetch_ad_campaigns(config)
+    except Exception as e:
+        print(f"Error fetching ad campaigns: {e}")
+        return {"campaigns": {}, "platforms": {}}
+
+# --- Background Prefetch ---
+
+def list_prefetch_targets(session: Optional[Session] = None):
+    """(organization id, config) of every organization with a sheet or an ad integration."""
+    if session is None:
+        with Session(engine) as session:
+            return list_prefetch_targets(session)
+    orgs = session.exec(
+        select(Organization)
+        .where(Organization.google_sheet_id.is_not(None) | Organization.integrations.any(Integration.is_enabled == True))
+        .options(selectinload(Organization.integrations))
+    ).all()
+    return [(org.id, load_config_from_org(org)) for org in orgs]
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+
+# Campaigns of every organization synced into the campaign_mirror table;
+# /api/campaigns then reads them from there instead of the platforms
+campaign_mirror = CampaignMirror(
+    load_targets=list_prefetch_targets,
+    enabled_platforms=enabled_ad_platforms,
+    build_connector=build_ad_connector,
+    enabled=os.getenv("CAMPAIGN_MIRROR_ENABLED", "false").lower() == "true",
+    interval_seconds=float(os.getenv("CAMPAIGN_MIRROR_SYNC_SECONDS", "300")),
+    full_sync_seconds=float(os.getenv("CAMPAIGN_MIRROR_FULL_SYNC_SECONDS", "21600")),
+    overlap_seconds=float(os.getenv("CAMPAIGN_MIRROR_OVERLAP_SECONDS", "120")),
+    concurrency=int(os.getenv("CAMPAIGN_MIRROR_CONCURRENCY", "2")),
+)
+
+# Every organization optimized (fetch -> plan -> apply budgets) at its
+# optimization_frequency; planning runs on a process pool
+optimization_scheduler = OptimizationScheduler(
+    load_targets=list_prefetch_targets,
+    fetch_sales=fetch_sales_payload,
+    ad_connector=get_ad_connector,
+    enabled=os.getenv("OPTIMIZATION_SCHEDULER_ENABLED", "false").lower() == "true",
+    check_seconds=float(os.getenv("OPTIMIZATION_CHECK_SECONDS", "60")),
+    io_concurrency=int(os.getenv("OPTIMIZATION_IO_CONCURRENCY", "16")),
+    processes=int(os.getenv("OPTIMIZATION_PROCESSES", "2")),
+    dry_run=os.getenv("OPTIMIZATION_DRY_RUN", "true").lower() == "true",
+    stale_run_seconds=float(os.getenv("OPTIMIZATION_STALE_RUN_SECONDS", "3600")),
+    run_retention_seconds=float(os.getenv("OPTIMIZATION_RUN_RETENTION_SECONDS", str(30 * 86400))),
+)
+
+prefetcher = PrefetchScheduler(
+    load_targets=list_prefetch_targets,
+    fetch_sales=fetch_sales_payload,
+    fetch_ads=None if campaign_mirror.enabled else fetch_ad_campaigns,
+    concurrency=int(os.getenv("PREFETCH_CONCURRENCY", "4")),
+    quotas_per_minute={
+        "google_sheets": float(os.getenv("PREFETCH_SHEETS_PER_MINUTE", "30")),
+        "meta": float(os.getenv("PREFETCH_META_PER_MINUTE", "30")),
+    },
+    jitter=float(os.getenv("PREFETCH_JITTER", "0.1")),
+    active_interval=float(os.getenv("PREFETCH_ACTIVE_INTERVAL_SECONDS", "120")),
+    active_window=float(os.getenv("PREFETCH_ACTIVE_WINDOW_SECONDS", "900")),
+)
+
+def get_prefetched_data(current_user: UserIdentity, config: dict, with_ads: bool = True):
+    """(sales payload, ad payload) from the prefetched snapshot, fetched inline when cold."""
+    org_id = current_user.organization_id
+    if not PREFETCH_ENABLED or org_id is None:
+        return fetch_sales_payload(config), (fetch_ad_campaigns_or_empty(config) if with_ads else None)
+
+    prefetcher.record_activity(org_id, config)
+    snapshot = prefetcher.get(org_id, config)
+    if snapshot is not None and (snapshot.ad_payload is not None or not with_ads):
+        return snapshot.sales_payload, snapshot.ad_payload
+
+    sales_payload = fetch_sales_payload(config)
+    ad_payload = fetch_ad_campaigns_or_empty(config) if with_ads else None
+    if with_ads:
+        prefetcher.put(org_id, config, sales_payload, ad_payload)
+    return sales_payload, ad_payload
+
+def get_tenant_data(current_user: UserIdentity, config: dict, with_ads: bool = True):
+    """(sales payload, ad payload), the ads read from the campaign mirror when it is enabled."""
+    org_id = current_user.organization_id
+    if not campaign_mirror.enabled or org_id is None or not with_ads:
+        return get_prefetched_data(current_user, config, with_ads)
+
+    sales_payload, _ = get_prefetched_data(current_user, config, with_ads=False)
+    ad_payload = campaign_mirror.read(org_id, config)
+    if ad_payload is None:
+        # No platform to mirror: the mock campaigns
+        ad_payload = fetch_ad_campaigns_or_empty(config)
+    return sales_payload, ad_payload
 
 # --- Endpoints ---
 
 @app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
+async def on_startup():
+    # Schema changes go through app.migrate_db; only check the version here
+    check_schema()
+    if PREFETCH_ENABLED:
+        prefetcher.start()
+    template_pool.start()
+    campaign_mirror.start()
+    optimization_scheduler.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await prefetcher.stop()
+    await template_pool.stop()
+    await campaign_mirror.stop()
+    await optimization_scheduler.stop()
+    sheet_jobs.shutdown()
+
+def get_password_hash_for(session: Session, email: str) -> Optional[str]:
+    user = session.exec(select(User).where(User.email == email)).first()
+    return user.hashed_password if user else None
+
+def set_password_hash_for(session: Session, email: str, hashed_password: str):
+    user = session.exec(select(User).where(User.email == email)).one()
+    user.hashed_password = hashed_password
+    session.add(user)
+    session.commit()
 
 @app.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
-    statement = select(User).where(User.email == form_data.username)
-    user = session.exec(statement).first()
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Database = Depends(get_db)):
+    hashed_password = await db.run(get_password_hash_for, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not hashed_password or not await verify_password_async(form_data.password, hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade the stored hash if BCRYPT_ROUNDS changed since it was created
+    if password_needs_rehash(hashed_password):
+        new_hash = await get_password_hash_async(form_data.password)
+        await db.run(set_password_hash_for, form_data.username, new_hash)
+    
     access_token_expires = timedelta(minutes=60 * 24)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": form_data.username}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -293,44 +437,37 @@ class UserRegister(BaseModel):
     full_name: str
     company_name: str
 
+def provision_registered_user(session: Session, user_in: UserRegister, hashed_password: str) -> bool:
+    _, created = get_or_provision_user(
+        session,
+        email=user_in.email,
+        full_name=user_in.full_name,
+        company_name=user_in.company_name,
+        hashed_password=hashed_password
+    )
+    return created
+
 @app.post("/register", response_model=Token)
-def register_user(user_in: UserRegister, session: Session = Depends(get_session)):
-    # 1. Check if user exists
-    existing_user = session.exec(select(User).where(User.email == user_in.email)).first()
-    if existing_user:
+async def register_user(user_in: UserRegister, db: Database = Depends(get_db)):
+    # 1. Create User + Organization (Free Tier) in one transaction
+    hashed_password = await get_password_hash_async(user_in.password)
+    async with provision_guard(user_in.email):
+        created = await db.run(provision_registered_user, user_in, hashed_password)
+    if not created:
         raise HTTPException(
             status_code=400,
             detail="User with this email already exists"
         )
     
-    # 2. Create Organization (Free Tier)
-    org = Organization(name=user_in.company_name)
-    session.add(org)
-    session.commit()
-    session.refresh(org)
-    
-    # 3. Create User
-    new_user = User(
-        email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
-        full_name=user_in.full_name,
-        organization_id=org.id,
-        is_superuser=False,
-        role="user"
-    )
-    session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
-    
-    # 4. Generate Token
+    # 2. Generate Token
     access_token_expires = timedelta(minutes=60 * 24)
     access_token = create_access_token(
-        data={"sub": new_user.email}, expires_delta=access_token_expires
+        data={"sub": user_in.email}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/api/me")
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: UserIdentity = Depends(get_current_identity)):
     config = load_config_from_db(current_user)
     plan = config.get("billing", {}).get("current_plan", "free")
     
@@ -342,113 +479,115 @@ def read_users_me(current_user: User = Depends(get_current_user)):
     }
 
 @app.get("/api/config")
-def get_config(current_user: User = Depends(get_current_user)):
+async def get_config(current_user: UserIdentity = Depends(get_current_identity)):
     return load_config_from_db(current_user)
 
+def update_organization(session: Session, organization_id: int, **fields):
+    org = session.get(Organization, organization_id)
+    for name, value in fields.items():
+        setattr(org, name, value)
+    session.add(org)
+    session.commit()
+
 @app.post("/api/config")
-def update_config(new_config: ConfigModel, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+async def update_config(new_config: ConfigModel, current_user: UserIdentity = Depends(get_current_identity), db: Database = Depends(get_db)):
     # Update Organization in DB
     if not current_user.organization:
         raise HTTPException(status_code=400, detail="User has no organization")
     
-    org = current_user.organization
-    
     # Update Sheet Config
-    org.google_sheet_id = new_config.google_sheets.spreadsheet_id
-    org.drive_folder_id = new_config.google_sheets.drive_folder_id
-    
-    session.add(org)
-    session.commit()
-    session.refresh(org)
+    sheet_config = {
+        "google_sheet_id": new_config.google_sheets.spreadsheet_id,
+        "drive_folder_id": new_config.google_sheets.drive_folder_id
+    }
+    layout = new_config.google_sheets.layout
+    if layout is not None:
+        try:
+            SheetLayout.from_config(layout)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid sheet layout: {e}")
+        sheet_config["sheet_layout"] = layout or None
+    if new_config.bot_settings is not None:
+        try:
+            validate_budget_rules(new_config.bot_settings.budget_rules)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid budget rules: {e}")
+        sheet_config["bot_settings"] = new_config.bot_settings.model_dump()
+
+    await db.run(update_organization, current_user.organization_id, **sheet_config)
+    identity_cache.invalidate_organization(current_user.organization_id)
     
-    return {"status": "updated", "config": load_config_from_db(current_user)}
+    org = current_user.organization.model_copy(update=sheet_config)
+    return {"status": "updated", "config": load_config_from_db(current_user.model_copy(update={"organization": org}))}
+
+def ad_platforms_header(platforms: dict) -> str:
+    """X-Ad-Platforms value, e.g. "meta=ok, google=timeout"."""
+    return ", ".join(f"{name}={status['status']}" for name, status in platforms.items())
 
 @app.get("/api/campaigns")
-def get_campaigns(current_user: User = Depends(get_current_user)):
+def get_campaigns(response: Response = None, current_user: UserIdentity = Depends(get_current_identity)):
     config = load_config_from_db(current_user)
-    sales_connector, ad_connector = get_connectors(config)
-    optimizer = BudgetOptimizer(config)
     
-    # 1. Fetch Data
-    sales_payload = sales_connector.get_performance_data()
+    # 1. Fetch Data (prefetched in the background when enabled)
+    sales_payload, ad_payload = get_tenant_data(current_user, config)
+    # Platforms that timed out or failed are missing from the ad campaigns
+    if response is not None:
+        response.headers["X-Ad-Platforms"] = ad_platforms_header(ad_payload["platforms"])
+        # Served from the campaign mirror: age of the oldest platform sync, in seconds
+        lags = [p["sync_lag_seconds"] for p in ad_payload["platforms"].values() if p.get("sync_lag_seconds") is not None]
+        if lags:
+            response.headers["X-Campaign-Sync-Lag"] = str(max(lags))
     
-    # Handle Polymorphism
-    if "campaigns" in sales_payload:
-        sales_data = sales_payload["campaigns"]
-        global_cap = sales_payload.get("global_cap")
-    else:
-        sales_data = sales_payload
-        global_cap = None
-        
-    ad_campaigns = ad_connector.get_campaigns()
-    
-    results = []
-    
-    # Global Capacity Logic
-    total_leads_current = 0
-    if global_cap:
-        for cid, a_data in ad_campaigns.items():
-            budget = a_data.get("daily_budget", 50)
-            total_leads_current += (budget / 20.0) 
-            
-        global_scaling_factor = 1.0
-        if total_leads_current > 0 and global_cap > 0:
-            if total_leads_current > global_cap:
-                global_scaling_factor = global_cap / total_leads_current
-    else:
-        global_scaling_factor = 1.0
+    # 2. Merge + Optimize
+    rows, _ = plan_campaigns(config, sales_payload, ad_payload)
+    return rows
 
-    # Merge Data
-    all_campaign_ids = set(sales_data.keys())
-    
-    ad_campaigns_by_name = {}
-    for cid, data in ad_campaigns.items():
-        norm_name = data.get("name", "").lower().strip()
-        if norm_name:
-            ad_campaigns_by_name[norm_name] = data
-
-    for cid in all_campaign_ids:
-        s_data = sales_data.get(cid, {"actual": 0, "objective": 0})
-        s_name = s_data.get("name", "").strip()
-        s_name_norm = s_name.lower()
-        
-        a_data = ad_campaigns_by_name.get(s_name_norm)
-        
-        if not a_data:
-             a_data = ad_campaigns.get(cid)
-
-        if not a_data:
-            a_data = {
-                "name": s_name if s_name else f"Campaign {cid}", 
-                "daily_budget": 0.0, 
-                "status": "NOT_FOUND",
-                "platform_id": None
-            }
-        
-        decision = optimizer.calculate_adjustment(s_data, global_scaling_factor)
-        
-        # Attach Platform ID
-        if a_data.get("platform_id"):
-             decision["platform_id"] = a_data["platform_id"]
-
-        results.append({
-            "id": cid,
-            "name": a_data.get("name"),
-            "status": a_data.get("status", "ACTIVE"),
-            "metrics": {
-                "actual": s_data["actual"],
-                "objective": s_data["objective"],
-                "name": s_data.get("metric_name", "Currency")
-            },
-            "budget_recommendation": decision,
-            "current_budget": a_data.get("daily_budget", 0)
-        })
-        
-    return results
+# Jobs run by the optimization worker process (python -m app.optimization_worker)
+optimization_jobs = OptimizationJobQueue()
 
-@app.post("/api/optimize")
-def run_optimization(dry_run: bool = True, current_user: User = Depends(get_current_user)):
-    return get_campaigns(current_user=current_user)
+def optimization_job_response(job: OptimizationJob) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/optimize/jobs/{job.id}",
+        "dry_run": job.dry_run,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result": job.result if job.status == SUCCEEDED else None,
+        "error": job.error
+    }
+
+@app.post("/api/optimize", status_code=status.HTTP_202_ACCEPTED)
+def run_optimization(
+    dry_run: bool = True,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    current_user: UserIdentity = Depends(get_current_identity)
+):
+    """
+    Queue an optimization of the organization's budgets (only planned when
+    dry_run, applied otherwise). Poll the returned status_url until the job
+    is "succeeded" (result: the campaigns and budget changes) or "failed".
+    Resending a request with the same Idempotency-Key header returns the same job.
+    Applying requires auto scaling to be enabled in the bot settings.
+    """
+    if not current_user.organization:
+        raise HTTPException(status_code=400, detail="No Organization found")
+    if not dry_run and not auto_scaling_enabled(load_config_from_db(current_user)):
+        raise HTTPException(status_code=409, detail="Auto scaling is disabled for this organization: only dry runs are allowed")
+
+    job = optimization_jobs.submit(current_user.organization_id, dry_run, idempotency_key)
+    if job.dry_run != dry_run:
+        raise HTTPException(status_code=409, detail="Idempotency-Key already used for a request with another dry_run")
+    return optimization_job_response(job)
+
+@app.get("/api/optimize/jobs/{job_id}")
+def get_optimization_job(job_id: int, current_user: UserIdentity = Depends(get_current_identity)):
+    job = optimization_jobs.get(job_id)
+    if job is None or job.organization_id != current_user.organization_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return optimization_job_response(job)
 
 # --- Stripe Checkout ---
 
@@ -458,13 +597,12 @@ class CheckoutRequest(BaseModel):
     cancel_url: str
 
 @app.get("/api/global-status")
-def get_global_status(current_user: User = Depends(get_current_user)):
+def get_global_status(current_user: UserIdentity = Depends(get_current_identity)):
     """Returns the Volume performance targets."""
     config = load_config_from_db(current_user)
-    sales_connector, _ = get_connectors(config)
     
     # 1. Fetch Sales Payload
-    sales_payload = sales_connector.get_performance_data()
+    sales_payload, _ = get_tenant_data(current_user, config, with_ads=False)
     
     # Defaults
     if "campaigns" in sales_payload:
@@ -502,6 +640,7 @@ def create_checkout_session(request: CheckoutRequest, current_user: User = Depen
             session.add(org)
             session.commit()
             session.refresh(org)
+            identity_cache.invalidate_organization(org.id)
 
         checkout_session = stripe.checkout.Session.create(
             customer=customer_id,
@@ -519,7 +658,7 @@ def create_checkout_session(request: CheckoutRequest, current_user: User = Depen
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/billing/invoices")
-def get_invoices(current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+def get_invoices(current_user: UserIdentity = Depends(get_current_identity)):
     """Fetch invoice history from Stripe"""
     if not stripe.api_key:
         return []
@@ -554,7 +693,7 @@ def get_invoices(current_user: User = Depends(get_current_user), session: Sessio
         return []
 
 @app.post("/api/billing/activate")
-def activate_billing(plan: str = "starter", current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+async def activate_billing(plan: str = "starter", current_user: UserIdentity = Depends(get_current_identity), db: Database = Depends(get_db)):
     """Activate billing for the current user's organization."""
     if not current_user.organization:
         raise HTTPException(status_code=400, detail="User has no organization")
@@ -569,11 +708,8 @@ def activate_billing(plan: str = "starter", current_user: User = Depends(get_cur
     # But here, let's just update the backend to EXPECT the column to exist 
     # and we will fix the model in the next step.
     
-    org = current_user.organization
-    org.plan = plan
-    session.add(org)
-    session.commit()
-    session.refresh(org)
+    await db.run(update_organization, current_user.organization_id, plan=plan)
+    identity_cache.invalidate_organization(current_user.organization_id)
     
     return {"status": "activated", "plan": plan}
 
@@ -583,57 +719,90 @@ class CreateSheetRequest(BaseModel):
     client_name: str
     client_email: Optional[str] = None
 
-@app.post("/api/sheets/create")
-def create_client_sheet(request: CreateSheetRequest, current_user: User = Depends(get_current_user), session: Session = Depends(get_session)):
+def get_service_account_path() -> str:
+    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, "service_account.json")
+
+def provision_sheet(job: SheetJob, on_progress) -> dict:
+    # Folder read when the job runs: the user might have set it in config meanwhile
+    with Session(engine) as session:
+        org = session.get(Organization, job.organization_id)
+        folder_id = org.drive_folder_id if org else None
+
+    if template_pool.enabled:
+        on_progress(CLAIMING)
+        result = template_pool.claim(job.organization_id, job.client_name, job.client_email, folder_id)
+        if result is not None:
+            return result
+
+    drive_service = GoogleDriveService(credentials_path=get_service_account_path())
+    return drive_service.copy_template(
+        client_name=job.client_name,
+        client_email=job.client_email,
+        folder_id=folder_id,
+        on_progress=on_progress
+    )
+
+# Pre-copied template spreadsheets, so onboarding skips the copy
+template_pool = TemplatePool(
+    drive_service=lambda: GoogleDriveService(credentials_path=get_service_account_path()),
+    target_size=int(os.getenv("TEMPLATE_POOL_SIZE", "0")),
+    folder_id=os.getenv("TEMPLATE_POOL_FOLDER_ID") or None,
+    refill_batch=int(os.getenv("TEMPLATE_POOL_REFILL_BATCH", "5")),
+    check_seconds=float(os.getenv("TEMPLATE_POOL_CHECK_SECONDS", "60")),
+)
+
+def save_provisioned_sheet(job: SheetJob, result: dict):
+    # Auto-update Organization config with new spreadsheet ID
+    # folder_id remains unchanged
+    with Session(engine) as session:
+        update_organization(session, job.organization_id, google_sheet_id=result["spreadsheet_id"])
+    identity_cache.invalidate_organization(job.organization_id)
+
+sheet_jobs = SheetProvisioningJobs(
+    provision=provision_sheet,
+    on_complete=save_provisioned_sheet,
+    max_workers=int(os.getenv("SHEET_JOBS_WORKERS", "2")),
+    retention_seconds=float(os.getenv("SHEET_JOBS_RETENTION_SECONDS", "3600")),
+)
+
+def sheet_job_response(job: SheetJob) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/sheets/jobs/{job.id}",
+        "spreadsheet_id": job.spreadsheet_id if job.status == COMPLETED else None,
+        "spreadsheet_url": job.spreadsheet_url if job.status == COMPLETED else None,
+        "title": job.title,
+        "error": job.error
+    }
+
+@app.post("/api/sheets/create", status_code=status.HTTP_202_ACCEPTED)
+def create_client_sheet(request: CreateSheetRequest, current_user: UserIdentity = Depends(get_current_identity)):
     """
     Create a new Google Sheet from the template for a client.
+    Runs in the background: poll the returned status_url until the job is
+    "completed" (the organization then uses the new spreadsheet) or "failed".
     """
-    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    service_account_path = os.path.join(base_path, "service_account.json")
+    if not current_user.organization:
+        raise HTTPException(status_code=400, detail="No Organization found")
 
-    try:
-        # Load config from DB to get folder ID
-        # Note: Before sheet creation, the user might have set folder_id in config
-        org = current_user.organization
-        if not org:
-             raise HTTPException(status_code=400, detail="No Organization found")
-             
-        folder_id = org.drive_folder_id
-        
-        drive_service = GoogleDriveService(credentials_path=service_account_path)
-        result = drive_service.copy_template(
-            client_name=request.client_name,
-            client_email=request.client_email,
-            folder_id=folder_id
-        )
+    job = sheet_jobs.submit(current_user.organization_id, request.client_name, request.client_email)
+    return sheet_job_response(job)
 
-        # Auto-update Organization config with new spreadsheet ID
-        org.google_sheet_id = result["spreadsheet_id"]
-        # folder_id remains unchanged
-        
-        session.add(org)
-        session.commit()
-        session.refresh(org)
-
-        return {
-            "status": "created",
-            "spreadsheet_id": result["spreadsheet_id"],
-            "spreadsheet_url": result["spreadsheet_url"],
-            "title": result["title"]
-        }
-
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create spreadsheet: {str(e)}")
+@app.get("/api/sheets/jobs/{job_id}")
+def get_sheet_job(job_id: str, current_user: UserIdentity = Depends(get_current_identity)):
+    job = sheet_jobs.get(job_id)
+    if job is None or job.organization_id != current_user.organization_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return sheet_job_response(job)
 
 @app.get("/api/sheets/service-account")
-def get_service_account_email(current_user: User = Depends(get_current_user)):
+def get_service_account_email(current_user: UserIdentity = Depends(get_current_identity)):
     """
     Returns the service account email so the user can share the sheet with it.
     """
-    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    service_account_path = os.path.join(base_path, "service_account.json")
+    service_account_path = get_service_account_path()
 
     if not os.path.exists(service_account_path):
         return {"email": None}
@@ -646,9 +815,24 @@ def get_service_account_email(current_user: User = Depends(get_current_user)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/webhooks/google-drive")
+async def google_drive_notification(request: Request):
+    """
+    Drive push notifications for watched client sheets (see SheetDataCache).
+    Google sends the change in headers only; the body is empty.
+    """
+    accepted = sheet_cache.handle_notification(
+        channel_id=request.headers.get("X-Goog-Channel-ID", ""),
+        token=request.headers.get("X-Goog-Channel-Token", ""),
+        resource_state=request.headers.get("X-Goog-Resource-State", "")
+    )
+    if not accepted:
+        raise HTTPException(status_code=403, detail="Invalid channel token")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 # --- Admin Endpoints ---
 
-def require_admin(current_user: User = Depends(get_current_user)):
+async def require_admin(current_user: UserIdentity = Depends(get_current_identity)):
     """Dependency that requires admin/superuser access."""
     if not current_user.is_superuser:
         raise HTTPException(
@@ -657,55 +841,72 @@ def require_admin(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
-@app.get("/api/admin/stats")
-def get_admin_stats(current_user: User = Depends(require_admin), session: Session = Depends(get_session)):
-    """Get admin dashboard statistics."""
-    from sqlmodel import func
-
-    # Count organizations
-    org_count = session.exec(select(func.count(Organization.id))).one()
+# Monthly price per plan, used for MRR
+PLAN_PRICES = {
+    "free": 0,
+    "starter": 39,
+    "growth": 149,
+    "super": 299
+}
+
+def compute_admin_stats(session: Session) -> dict:
+    # Count organizations and calculate MRR based on plans (one GROUP BY plan)
+    plan_counts = session.exec(
+        select(Organization.plan, func.count(Organization.id)).group_by(Organization.plan)
+    ).all()
+    org_count = sum(count for _, count in plan_counts)
+    mrr = sum(PLAN_PRICES.get(plan, 0) * count for plan, count in plan_counts)
 
     # Count active users
     user_count = session.exec(select(func.count(User.id)).where(User.is_active == True)).one()
 
-    # Calculate MRR based on plans
-    plan_prices = {
-        "free": 0,
-        "starter": 39,
-        "growth": 149,
-        "super": 299
-    }
-
-    orgs = session.exec(select(Organization)).all()
-    mrr = sum(plan_prices.get(org.plan, 0) for org in orgs)
-
     return {
         "total_organizations": org_count,
         "active_users": user_count,
         "mrr": mrr
     }
 
-@app.get("/api/admin/organizations")
-def get_admin_organizations(current_user: User = Depends(require_admin), session: Session = Depends(get_session)):
-    """Get all organizations with their admin users."""
-    orgs = session.exec(select(Organization)).all()
+@app.get("/api/admin/stats")
+async def get_admin_stats(current_user: UserIdentity = Depends(require_admin), db: Database = Depends(get_db)):
+    """Get admin dashboard statistics."""
+    return await db.run(compute_admin_stats)
+
+def list_admin_organizations(session: Session, after_id: int, limit: int) -> list:
+    """One page of organizations (keyset on id) with their admin user and user count."""
+    orgs = session.exec(
+        select(Organization).where(Organization.id > after_id).order_by(Organization.id).limit(limit)
+    ).all()
+    if not orgs:
+        return []
+
+    # Users of the whole page in one query, only the columns we need
+    users_by_org = {}
+    rows = session.exec(
+        select(User.organization_id, User.email, User.is_superuser, User.role)
+        .where(User.organization_id.in_([org.id for org in orgs]))
+        .order_by(User.organization_id, User.id)
+    ).all()
+    for org_id, email, is_superuser, role in rows:
+        users_by_org.setdefault(org_id, []).append((email, is_superuser, role))
 
     result = []
     for org in orgs:
+        users = users_by_org.get(org.id, [])
+
         # Find the admin user for this org (first user or superuser)
-        admin_user = None
-        for user in org.users:
-            if user.is_superuser or user.role == "admin":
-                admin_user = user
+        admin_email = None
+        for email, is_superuser, role in users:
+            if is_superuser or role == "admin":
+                admin_email = email
                 break
-        if not admin_user and org.users:
-            admin_user = org.users[0]
+        if not admin_email and users:
+            admin_email = users[0][0]
 
         result.append({
             "id": org.id,
             "name": org.name,
-            "admin_email": admin_user.email if admin_user else None,
-            "user_count": len(org.users),
+            "admin_email": admin_email,
+            "user_count": len(users),
             "plan": org.plan,
             "google_sheet_id": org.google_sheet_id,
             "drive_folder_id": org.drive_folder_id,
@@ -713,3 +914,73 @@ def get_admin_organizations(current_user: User = Depends(require_admin), session
         })
 
     return result
+
+@app.get("/api/admin/organizations")
+async def get_admin_organizations(
+    response: Response,
+    after_id: int = 0,
+    limit: int = Query(100, ge=1, le=500),
+    current_user: UserIdentity = Depends(require_admin),
+    db: Database = Depends(get_db)
+):
+    """
+    Get organizations with their admin users, ordered by id.
+    Paginated by keyset: pass the X-Next-Cursor header of a page as `after_id`
+    to get the next one (the header is absent on the last page).
+    """
+    result = await db.run(list_admin_organizations, after_id, limit)
+    if len(result) == limit:
+        response.headers["X-Next-Cursor"] = str(result[-1]["id"])
+    return result
+
+@app.get("/api/admin/identity-cache")
+async def get_identity_cache_stats(current_user: UserIdentity = Depends(require_admin)):
+    """Hit/miss counters of the in-process identity cache."""
+    return identity_cache.stats()
+
+@app.get("/api/admin/sheet-cache")
+async def get_sheet_cache_stats(current_user: UserIdentity = Depends(require_admin)):
+    """Hit ratio, revision checks and staleness of the sheet data cache."""
+    return sheet_cache.stats()
+
+@app.get("/api/admin/prefetch")
+async def get_prefetch_stats(current_user: UserIdentity = Depends(require_admin)):
+    """Runs, snapshot hit ratio, start delays and quota waits of the background prefetch."""
+    return prefetcher.stats()
+
+@app.get("/api/admin/sheet-jobs")
+async def get_sheet_job_stats(current_user: UserIdentity = Depends(require_admin)):
+    """Submitted / completed / failed provisioning jobs and their durations."""
+    return sheet_jobs.stats()
+
+@app.get("/api/admin/template-pool")
+def get_template_pool_stats(current_user: UserIdentity = Depends(require_admin)):
+    """Pool depth, claim latency, refill rate and retirements of the pre-copied template pool."""
+    return template_pool.stats()
+
+@app.get("/api/admin/campaign-mirror")
+def get_campaign_mirror_stats(current_user: UserIdentity = Depends(require_admin)):
+    """Sync lag, full / incremental syncs, sync errors and mirrored campaigns of the campaign mirror."""
+    return campaign_mirror.stats()
+
+@app.get("/api/admin/optimization-scheduler")
+def get_optimization_scheduler_stats(current_user: UserIdentity = Depends(require_admin)):
+    """Scheduled, succeeded, failed and skipped runs, applied changes and step durations of the optimization scheduler."""
+    return optimization_scheduler.stats()
+
+@app.get("/api/admin/optimization-jobs")
+def get_optimization_job_stats(current_user: UserIdentity = Depends(require_admin)):
+    """Jobs per status, age of the oldest queued job, and the submissions / deduplications of this API worker."""
+    return optimization_jobs.stats()
+
+@app.get("/api/admin/meta-throttle")
+async def get_meta_throttle_stats(current_user: UserIdentity = Depends(require_admin)):
+    """Per ad account usage and pacing, queued calls and throttling retries of Meta API calls."""
+    return meta_throttle.stats()
+
+@app.get("/api/admin/sql-metrics")
+async def get_sql_metrics(current_user: UserIdentity = Depends(require_admin)):
+    """Per-route query counts, SQL time, N+1 suspects and slowest statements."""
+    if not SQL_INSTRUMENTATION:
+        return {"enabled": False}
+    return {"enabled": True, **sql_metrics.snapshot()}
@@ -1,13 +1,276 @@
-from sqlalchemy import text
+"""
+Versioned schema migrations.
+
+Each migration runs once and is recorded in the `schema_version` table.
+Run them before starting the API (the Docker image does it on boot):
+
+    python -m app.migrate_db
+
+At startup the API only checks that the database is at SCHEMA_VERSION
+(or applies pending migrations itself when AUTO_MIGRATE=true).
+"""
+import datetime
+import os
+from sqlalchemy import (
+    JSON, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, UniqueConstraint,
+    inspect, text,
+)
+from sqlalchemy.engine import Connection
 from app.database import engine
 
-def migrate():
+# Arbitrary key for pg_advisory_lock, so two containers never migrate at once
+MIGRATION_LOCK_ID = 72_650_001
+
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() == "true"
+
+def _is_postgres(connection: Connection) -> bool:
+    return connection.dialect.name == "postgresql"
+
+# --- Migrations ---
+
+def initial_schema(connection: Connection):
+    # The tables of the first release, frozen here rather than taken from
+    # app.models: every later table, column and index comes from its own
+    # migration. Creates missing tables only (existing databases are left
+    # to the following migrations).
+    metadata = MetaData()
+    Table(
+        "organization", metadata,
+        Column("name", String, nullable=False),
+        Column("id", Integer, primary_key=True),
+        Column("google_sheet_id", String),
+        Column("drive_folder_id", String),
+        Column("plan", String, nullable=False),
+        Column("stripe_customer_id", String),
+    )
+    Table(
+        "user", metadata,
+        Column("email", String, nullable=False),
+        Column("full_name", String),
+        Column("is_active", Boolean, nullable=False),
+        Column("is_superuser", Boolean, nullable=False),
+        Column("id", Integer, primary_key=True),
+        Column("hashed_password", String, nullable=False),
+        Column("organization_id", Integer, ForeignKey("organization.id")),
+        Column("role", String, nullable=False),
+        Index("ix_user_email", "email", unique=True),
+    )
+    Table(
+        "integration", metadata,
+        Column("provider", String, nullable=False),
+        Column("is_enabled", Boolean, nullable=False),
+        Column("credentials", JSON),
+        Column("id", Integer, primary_key=True),
+        Column("organization_id", Integer, ForeignKey("organization.id")),
+    )
+    metadata.create_all(connection)
+
+def add_stripe_customer_id(connection: Connection):
+    columns = {c["name"] for c in inspect(connection).get_columns("organization")}
+    if "stripe_customer_id" not in columns:
+        connection.execute(text("ALTER TABLE organization ADD COLUMN stripe_customer_id VARCHAR"))
+
+def _create_index(connection: Connection, name: str, table: str, *columns: str):
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    if _is_postgres(connection):
+        # A failed CONCURRENTLY build leaves an invalid index behind: rebuild it
+        invalid = connection.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+        connection.execute(text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" ({column_list})'))
+    else:
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})'))
+
+def add_foreign_key_indexes(connection: Connection):
+    # Names match the ones SQLModel generates for `index=True` in app.models
+    _create_index(connection, "ix_user_organization_id", "user", "organization_id")
+    _create_index(connection, "ix_integration_organization_id", "integration", "organization_id")
+    _create_index(connection, "ix_integration_provider", "integration", "provider")
+
+def add_sheet_layout(connection: Connection):
+    columns = {c["name"] for c in inspect(connection).get_columns("organization")}
+    if "sheet_layout" not in columns:
+        connection.execute(text("ALTER TABLE organization ADD COLUMN sheet_layout JSON"))
+
+def add_bot_settings(connection: Connection):
+    columns = {c["name"] for c in inspect(connection).get_columns("organization")}
+    if "bot_settings" not in columns:
+        connection.execute(text("ALTER TABLE organization ADD COLUMN bot_settings JSON"))
+
+def _metadata(connection: Connection) -> MetaData:
+    """MetaData holding the existing organization table, which new tables reference."""
+    metadata = MetaData()
+    metadata.reflect(connection, only=["organization"])
+    return metadata
+
+def add_template_copy(connection: Connection):
+    # Frozen like initial_schema: later changes to app.models.TemplateCopy get their own migration
+    metadata = _metadata(connection)
+    template_copy = Table(
+        "template_copy", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("spreadsheet_id", String, nullable=False, unique=True),
+        Column("template_revision", String, nullable=False),
+        Column("status", String, nullable=False, index=True),
+        Column("organization_id", Integer, ForeignKey("organization.id")),
+        Column("created_at", DateTime(timezone=True), nullable=False),
+        Column("claimed_at", DateTime(timezone=True)),
+    )
+    template_copy.create(connection, checkfirst=True)
+
+def add_campaign_mirror(connection: Connection):
+    # Frozen like initial_schema
+    metadata = _metadata(connection)
+    campaign_mirror = Table(
+        "campaign_mirror", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("organization_id", Integer, ForeignKey("organization.id"), nullable=False),
+        Column("platform", String, nullable=False),
+        Column("campaign_id", String, nullable=False),
+        Column("ad_account_id", String),
+        Column("name", String),
+        Column("daily_budget", Float, nullable=False),
+        Column("status", String),
+        Column("updated_time", DateTime(timezone=True)),
+        Column("synced_at", DateTime(timezone=True), nullable=False),
+        UniqueConstraint("organization_id", "platform", "campaign_id", name="uq_campaign_mirror_campaign"),
+    )
+    campaign_sync_state = Table(
+        "campaign_sync_state", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("organization_id", Integer, ForeignKey("organization.id"), nullable=False),
+        Column("platform", String, nullable=False),
+        Column("accounts_key", String, nullable=False),
+        Column("high_watermark", DateTime(timezone=True)),
+        Column("last_sync_at", DateTime(timezone=True)),
+        Column("last_full_sync_at", DateTime(timezone=True)),
+        Column("last_error", String),
+        UniqueConstraint("organization_id", "platform", name="uq_campaign_sync_state_platform"),
+    )
+    campaign_mirror.create(connection, checkfirst=True)
+    campaign_sync_state.create(connection, checkfirst=True)
+
+def add_optimization_run(connection: Connection):
+    # Frozen like initial_schema
+    optimization_run = Table(
+        "optimization_run", _metadata(connection),
+        Column("id", Integer, primary_key=True),
+        Column("organization_id", Integer, ForeignKey("organization.id"), nullable=False, index=True),
+        Column("status", String, nullable=False, index=True),
+        Column("dry_run", Boolean, nullable=False),
+        Column("started_at", DateTime(timezone=True), nullable=False, index=True),
+        Column("finished_at", DateTime(timezone=True)),
+        Column("campaigns", Integer, nullable=False),
+        Column("changes", Integer, nullable=False),
+        Column("applied", Integer, nullable=False),
+        Column("failed", Integer, nullable=False),
+        Column("fetch_seconds", Float),
+        Column("optimize_seconds", Float),
+        Column("apply_seconds", Float),
+        Column("error", String),
+    )
+    optimization_run.create(connection, checkfirst=True)
+
+def add_optimization_job(connection: Connection):
+    # Frozen like initial_schema
+    optimization_job = Table(
+        "optimization_job", _metadata(connection),
+        Column("id", Integer, primary_key=True),
+        Column("organization_id", Integer, ForeignKey("organization.id"), nullable=False, index=True),
+        Column("idempotency_key", String),
+        Column("dry_run", Boolean, nullable=False),
+        Column("status", String, nullable=False),
+        Column("attempts", Integer, nullable=False),
+        Column("max_attempts", Integer, nullable=False),
+        Column("run_after", DateTime(timezone=True), nullable=False),
+        Column("locked_by", String),
+        Column("locked_until", DateTime(timezone=True)),
+        Column("created_at", DateTime(timezone=True), nullable=False),
+        Column("started_at", DateTime(timezone=True)),
+        Column("finished_at", DateTime(timezone=True)),
+        Column("result", JSON),
+        Column("error", String),
+        UniqueConstraint("organization_id", "idempotency_key", name="uq_optimization_job_idempotency_key"),
+        Index("ix_optimization_job_status_run_after", "status", "run_after"),
+    )
+    optimization_job.create(connection, checkfirst=True)
+
+def add_optimization_run_last_run_index(connection: Connection):
+    _create_index(
+        connection, "ix_optimization_run_organization_id_started_at", "optimization_run", "organization_id", "started_at"
+    )
+
+# (version, description, function). Append only, never renumber.
+MIGRATIONS = [
+    (1, "initial schema", initial_schema),
+    (2, "organization.stripe_customer_id", add_stripe_customer_id),
+    (3, "indexes on user.organization_id, integration.organization_id, integration.provider", add_foreign_key_indexes),
+    (4, "organization.sheet_layout", add_sheet_layout),
+    (5, "organization.bot_settings", add_bot_settings),
+    (6, "template_copy table", add_template_copy),
+    (7, "campaign_mirror and campaign_sync_state tables", add_campaign_mirror),
+    (8, "optimization_run table", add_optimization_run),
+    (9, "optimization_job table", add_optimization_job),
+    (10, "index on optimization_run (organization_id, started_at)", add_optimization_run_last_run_index),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# --- Runner ---
+
+def _ensure_version_table(connection: Connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL)"
+    ))
+
+def get_schema_version() -> int:
+    """Version recorded in the database (0 when never migrated)."""
+    if not inspect(engine).has_table("schema_version"):
+        return 0
     with engine.connect() as connection:
+        return connection.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+def migrate():
+    # AUTOCOMMIT: CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if _is_postgres(connection):
+            connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
         try:
-            connection.execute(text("ALTER TABLE organization ADD COLUMN stripe_customer_id VARCHAR"))
-            print("Migration successful: Added stripe_customer_id to organization table")
-        except Exception as e:
-            print(f"Migration failed (maybe column exists): {e}")
+            _ensure_version_table(connection)
+            current = connection.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+            for version, description, func in MIGRATIONS:
+                if version <= current:
+                    continue
+                print(f"Applying migration {version}: {description}")
+                func(connection)
+                connection.execute(
+                    text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                    {"v": version, "d": description, "t": datetime.datetime.utcnow()}
+                )
+            print(f"Database schema at version {SCHEMA_VERSION}")
+        finally:
+            if _is_postgres(connection):
+                connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+def check_schema():
+    """Called at startup: fails fast instead of serving on an outdated schema."""
+    current = get_schema_version()
+    if current == SCHEMA_VERSION:
+        return
+    if current < SCHEMA_VERSION and AUTO_MIGRATE:
+        migrate()
+        return
+    raise RuntimeError(
+        f"Database schema is at version {current}, the code expects {SCHEMA_VERSION}. "
+        "Run `python -m app.migrate_db` first (or set AUTO_MIGRATE=true)."
+    )
 
 if __name__ == "__main__":
     migrate()
@@ -1,4 +1,5 @@
 from typing import Optional, List
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import Field, SQLModel, Relationship, JSON
 from pydantic import EmailStr
 import datetime
@@ -15,7 +16,7 @@ class OrganizationBase(SQLModel):
     name: str
 
 class IntegrationBase(SQLModel):
-    provider: str # "meta", "google", "snap", "tiktok"
+    provider: str = Field(index=True) # "meta", "google", "snap", "tiktok"
     is_enabled: bool = False
     credentials: Optional[dict] = Field(default=None, sa_type=JSON) 
 
@@ -24,7 +25,7 @@ class IntegrationBase(SQLModel):
 class User(UserBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     hashed_password: str
-    organization_id: Optional[int] = Field(default=None, foreign_key="organization.id")
+    organization_id: Optional[int] = Field(default=None, foreign_key="organization.id", index=True)
     role: str = Field(default="user")
 
     organization: Optional["Organization"] = Relationship(back_populates="users")
@@ -41,13 +42,114 @@ class Organization(OrganizationBase, table=True):
     drive_folder_id: Optional[str] = None
     plan: str = Field(default="free")
     stripe_customer_id: Optional[str] = None
+    # Client sheet layout: {"version": "v1", **overrides} (None = default template)
+    sheet_layout: Optional[dict] = Field(default=None, sa_type=JSON)
+    # BotSettings (budget cap, target ROAS, optimization frequency); None = defaults
+    bot_settings: Optional[dict] = Field(default=None, sa_type=JSON)
 
 class Integration(IntegrationBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    organization_id: Optional[int] = Field(default=None, foreign_key="organization.id")
+    organization_id: Optional[int] = Field(default=None, foreign_key="organization.id", index=True)
     
     organization: Optional["Organization"] = Relationship(back_populates="integrations")
 
+class TemplateCopy(SQLModel, table=True):
+    """Pre-copied client template spreadsheet (see app.template_pool)."""
+    __tablename__ = "template_copy"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    spreadsheet_id: str = Field(unique=True)
+    # Drive version of the template when copied
+    template_revision: str
+    status: str = Field(default="available", index=True) # "available", "claimed", "retired"
+    organization_id: Optional[int] = Field(default=None, foreign_key="organization.id")
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    claimed_at: Optional[datetime.datetime] = None
+
+class MirroredCampaign(SQLModel, table=True):
+    """Local copy of an organization's active ad campaigns (see app.campaign_mirror)."""
+    __tablename__ = "campaign_mirror"
+    # Also the index API reads go through (organization_id first)
+    __table_args__ = (UniqueConstraint("organization_id", "platform", "campaign_id", name="uq_campaign_mirror_campaign"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    organization_id: int = Field(foreign_key="organization.id")
+    platform: str # "meta", "google", "snap", "tiktok"
+    campaign_id: str # id on the platform
+    ad_account_id: Optional[str] = None
+    name: Optional[str] = None
+    daily_budget: float = 0.0
+    status: Optional[str] = None
+    # Last change on the platform side
+    updated_time: Optional[datetime.datetime] = None
+    synced_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+class CampaignSyncState(SQLModel, table=True):
+    """Progress of the campaign mirror sync, per organization and platform."""
+    __tablename__ = "campaign_sync_state"
+    __table_args__ = (UniqueConstraint("organization_id", "platform", name="uq_campaign_sync_state_platform"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    organization_id: int = Field(foreign_key="organization.id")
+    platform: str
+    # Fingerprint of the platform's ad accounts / token: a change triggers a full sync
+    accounts_key: str
+    # Latest campaign updated_time seen: the next incremental sync asks for changes after it
+    high_watermark: Optional[datetime.datetime] = None
+    last_sync_at: Optional[datetime.datetime] = None
+    last_full_sync_at: Optional[datetime.datetime] = None
+    last_error: Optional[str] = None
+
+class OptimizationRun(SQLModel, table=True):
+    """One scheduled fetch -> optimize -> apply run of an organization (see app.optimization_scheduler)."""
+    __tablename__ = "optimization_run"
+    # Last run of each organization (the scheduler's due check)
+    __table_args__ = (Index("ix_optimization_run_organization_id_started_at", "organization_id", "started_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    organization_id: int = Field(foreign_key="organization.id", index=True)
+    status: str = Field(default="running", index=True) # "running", "succeeded", "failed"
+    dry_run: bool = True
+    started_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc), index=True)
+    finished_at: Optional[datetime.datetime] = None
+    campaigns: int = 0
+    # Budget changes recommended, and applied / rejected by the platforms
+    changes: int = 0
+    applied: int = 0
+    failed: int = 0
+    fetch_seconds: Optional[float] = None
+    optimize_seconds: Optional[float] = None
+    apply_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class OptimizationJob(SQLModel, table=True):
+    """An optimization requested through POST /api/optimize, run by app.optimization_worker (see app.job_queue)."""
+    __tablename__ = "optimization_job"
+    __table_args__ = (
+        # A retried request with the same Idempotency-Key gets the same job
+        UniqueConstraint("organization_id", "idempotency_key", name="uq_optimization_job_idempotency_key"),
+        # Claiming: the oldest queued job that is due
+        Index("ix_optimization_job_status_run_after", "status", "run_after"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    organization_id: int = Field(foreign_key="organization.id", index=True)
+    idempotency_key: Optional[str] = None
+    dry_run: bool = True
+    status: str = Field(default="queued") # "queued", "running", "succeeded", "failed"
+    attempts: int = 0
+    max_attempts: int = 3
+    # Not claimed before (retry backoff)
+    run_after: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    # Worker running the job, and until when; an expired lease is claimed again
+    locked_by: Optional[str] = None
+    locked_until: Optional[datetime.datetime] = None
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+    result: Optional[dict] = Field(default=None, sa_type=JSON)
+    error: Optional[str] = None
+
 # --- Schemas (Pydantic models for API) ---
 
 class UserCreate(UserBase):
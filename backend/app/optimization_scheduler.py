@@ -0,0 +1,395 @@
+"""
+Scheduled budget optimization of every organization.
+
+Each organization's bot settings say how often it is optimized
+(optimization_frequency: hourly / daily / weekly). Every
+OPTIMIZATION_CHECK_SECONDS the scheduler lists the organizations that are
+due (no run started within their interval) and, for each one, fetches its
+sales data and ad campaigns, plans the budget changes and applies them:
+
+- fetch and apply are blocking connector I/O: they run on a thread pool,
+  at most OPTIMIZATION_IO_CONCURRENCY organizations at a time;
+- planning (plan_campaigns) is CPU work: it runs on a pool of
+  OPTIMIZATION_PROCESSES worker processes, off the API's event loop and GIL;
+- changes are applied only when the organization enabled auto scaling and
+  OPTIMIZATION_DRY_RUN is off, otherwise they are only counted;
+- every run is recorded in the optimization_run table with its durations
+  and outcome. An organization whose previous run is still going is
+  skipped rather than run twice (a run older than
+  OPTIMIZATION_STALE_RUN_SECONDS is considered dead and marked failed).
+  Runs older than OPTIMIZATION_RUN_RETENTION_SECONDS are deleted.
+
+On PostgreSQL only one API worker schedules (advisory lock, held for as
+long as that worker is the scheduler; its connection is checked every
+tick, since the lock goes with it).
+"""
+import asyncio
+import datetime
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, text, update
+from sqlmodel import Session, select, func
+
+from app.database import engine
+from app.models import OptimizationRun
+from app.tenant_config import auto_scaling_enabled
+from antigravity_ads.connectors.composite_connector import CompositeAdConnector
+from antigravity_ads.engine.planner import plan_campaigns, budget_changes
+
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+FREQUENCY_SECONDS = {"hourly": 3600, "daily": 86400, "weekly": 7 * 86400}
+DEFAULT_FREQUENCY = "daily"
+
+# Old runs are purged at most this often
+PURGE_SECONDS = 3600
+
+# Arbitrary key for pg_try_advisory_lock, so only one worker schedules
+SCHEDULER_LOCK_ID = 72_650_004
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def frequency_seconds(config: dict) -> float:
+    frequency = (config.get("bot_settings") or {}).get("optimization_frequency") or DEFAULT_FREQUENCY
+    return FREQUENCY_SECONDS.get(frequency, FREQUENCY_SECONDS[DEFAULT_FREQUENCY])
+
+class OptimizationScheduler:
+    def __init__(
+        self,
+        load_targets: Callable[[], List[Tuple[int, dict]]],
+        fetch_sales: Callable[[dict], dict],
+        ad_connector: Callable[[dict], CompositeAdConnector],
+        enabled: bool = False,
+        check_seconds: float = 60.0,
+        io_concurrency: int = 16,
+        processes: int = 2,
+        dry_run: bool = True,
+        stale_run_seconds: float = 3600.0,
+        run_retention_seconds: float = 30 * 86400,
+    ):
+        """
+        `load_targets()` lists (organization id, config) of the organizations
+        to optimize, `fetch_sales(config)` returns the sales payload and
+        `ad_connector(config)` the connector campaigns are fetched from and
+        budgets applied through. `processes=0` plans on the I/O threads.
+        """
+        self.load_targets = load_targets
+        self.fetch_sales = fetch_sales
+        self.ad_connector = ad_connector
+        self.enabled = enabled
+        self.check_seconds = check_seconds
+        self.io_concurrency = io_concurrency
+        self.processes = processes
+        self.dry_run = dry_run
+        self.stale_run = datetime.timedelta(seconds=stale_run_seconds)
+        # Runs within the longest frequency decide what is due: never purge those
+        self.run_retention = datetime.timedelta(seconds=max(run_retention_seconds, max(FREQUENCY_SECONDS.values())))
+        self._last_purge = 0.0
+
+        self._task: Optional[asyncio.Task] = None
+        self._runs: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[Executor] = None
+        self._lock_connection = None
+        # Organizations scheduled or running in this process
+        self._in_flight: Set[int] = set()
+        self._lock = threading.Lock()
+
+        self.stats_counters = {
+            "ticks": 0,
+            "scheduled": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "skipped_overlap": 0,
+            "abandoned": 0,
+            "changes": 0,
+            "applied": 0,
+            "apply_failures": 0,
+            "purged": 0,
+        }
+        self._durations = {name: deque(maxlen=500) for name in ("fetch", "optimize", "apply", "total")}
+        self._finished_at: deque = deque(maxlen=100_000)
+
+    # --- Due organizations ---
+
+    def due(self) -> List[Tuple[int, dict]]:
+        """(organization id, config) of the organizations whose next run is due and not already running."""
+        now = utcnow()
+        targets = self.load_targets()
+        with Session(engine) as session:
+            # Runs that never finished (worker killed): not running anymore
+            abandoned = session.execute(
+                update(OptimizationRun)
+                .where(OptimizationRun.status == RUNNING, OptimizationRun.started_at < now - self.stale_run)
+                .values(status=FAILED, finished_at=now, error="abandoned")
+            ).rowcount
+            session.commit()
+            # An organization without a run within the longest frequency is due anyway
+            last_started = dict(session.exec(
+                select(OptimizationRun.organization_id, func.max(OptimizationRun.started_at))
+                .where(OptimizationRun.started_at >= now - datetime.timedelta(seconds=max(FREQUENCY_SECONDS.values())))
+                .group_by(OptimizationRun.organization_id)
+            ).all())
+            running = set(session.exec(
+                select(OptimizationRun.organization_id).where(OptimizationRun.status == RUNNING)
+            ).all())
+
+        due, overlapping = [], 0
+        for organization_id, config in targets:
+            started = last_started.get(organization_id)
+            if started is not None:
+                if started.tzinfo is None:
+                    started = started.replace(tzinfo=datetime.timezone.utc)  # SQLite
+                if (now - started).total_seconds() < frequency_seconds(config):
+                    continue
+            if organization_id in self._in_flight or organization_id in running:
+                overlapping += 1
+                continue
+            due.append((organization_id, config))
+        with self._lock:
+            self.stats_counters["abandoned"] += abandoned
+            self.stats_counters["skipped_overlap"] += overlapping
+        return due
+
+    def purge(self) -> int:
+        """Deletes the finished runs started more than OPTIMIZATION_RUN_RETENTION_SECONDS ago."""
+        with Session(engine) as session:
+            deleted = session.execute(
+                delete(OptimizationRun).where(
+                    OptimizationRun.status != RUNNING,
+                    OptimizationRun.started_at < utcnow() - self.run_retention,
+                )
+            ).rowcount
+            session.commit()
+        with self._lock:
+            self.stats_counters["purged"] += deleted
+        return deleted
+
+    # --- Runs ---
+
+    def _start_run(self, organization_id: int, dry_run: bool) -> int:
+        with Session(engine) as session:
+            run = OptimizationRun(organization_id=organization_id, status=RUNNING, dry_run=dry_run)
+            session.add(run)
+            session.commit()
+            return run.id
+
+    def _finish_run(self, run_id: int, values: Dict[str, Any]):
+        with Session(engine) as session:
+            session.execute(
+                update(OptimizationRun).where(OptimizationRun.id == run_id).values(finished_at=utcnow(), **values)
+            )
+            session.commit()
+
+    @staticmethod
+    def _fetch_ads(connector: CompositeAdConnector) -> dict:
+        campaigns, platforms = connector.fetch()
+        return {"campaigns": campaigns, "platforms": platforms}
+
+    async def _io(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io_pool, fn, *args)
+
+    async def run_organization(self, organization_id: int, config: dict) -> Dict[str, Any]:
+        """fetch -> optimize -> apply for one organization; the outcome as recorded in optimization_run."""
+        try:
+            async with self._semaphore:
+                return await self._run_organization(organization_id, config)
+        finally:
+            # Whatever failed, the organization is scheduled again at its next due time
+            self._in_flight.discard(organization_id)
+
+    async def _run_organization(self, organization_id: int, config: dict) -> Dict[str, Any]:
+        dry_run = self.dry_run or not auto_scaling_enabled(config)
+        run_id = None
+        values: Dict[str, Any] = {}
+        start = time.perf_counter()
+        try:
+            run_id = await self._io(self._start_run, organization_id, dry_run)
+            connector = self.ad_connector(config)
+            sales_payload, ad_payload = await asyncio.gather(
+                self._io(self.fetch_sales, config), self._io(self._fetch_ads, connector)
+            )
+            values["fetch_seconds"] = round(time.perf_counter() - start, 3)
+
+            step = time.perf_counter()
+            rows, keys = await asyncio.get_running_loop().run_in_executor(
+                self._cpu_pool or self._io_pool, plan_campaigns, config, sales_payload, ad_payload
+            )
+            changes = budget_changes(rows, keys)
+            values.update(
+                optimize_seconds=round(time.perf_counter() - step, 3), campaigns=len(rows), changes=len(changes)
+            )
+
+            if changes and not dry_run:
+                step = time.perf_counter()
+                results = await self._io(connector.update_budgets, changes)
+                values["applied"] = sum(1 for r in results.values() if r["success"])
+                values["failed"] = len(results) - values["applied"]
+                values["apply_seconds"] = round(time.perf_counter() - step, 3)
+            values["status"] = SUCCEEDED
+        except Exception as e:
+            print(f"Optimization run failed for organization {organization_id}: {e}")
+            values.update(status=FAILED, error=str(e)[:500])
+
+        if run_id is not None:
+            try:
+                await self._io(self._finish_run, run_id, values)
+            except Exception as e:
+                # The row stays "running" until it is marked abandoned
+                print(f"Could not record optimization run {run_id}: {e}")
+        self._record(values, time.perf_counter() - start)
+        return {"id": run_id, "organization_id": organization_id, "dry_run": dry_run, **values}
+
+    def _record(self, values: Dict[str, Any], seconds: float):
+        with self._lock:
+            self.stats_counters["succeeded" if values["status"] == SUCCEEDED else "failed"] += 1
+            self.stats_counters["changes"] += values.get("changes", 0)
+            self.stats_counters["applied"] += values.get("applied", 0)
+            self.stats_counters["apply_failures"] += values.get("failed", 0)
+            for name in ("fetch", "optimize", "apply"):
+                if values.get(f"{name}_seconds") is not None:
+                    self._durations[name].append(values[f"{name}_seconds"])
+            self._durations["total"].append(seconds)
+            self._finished_at.append(time.monotonic())
+
+    async def tick(self) -> int:
+        """Schedules every due organization (runs continue in the background). Returns how many."""
+        due = await asyncio.to_thread(self.due)
+        for organization_id, config in due:
+            self._in_flight.add(organization_id)
+            task = asyncio.create_task(self.run_organization(organization_id, config))
+            self._runs.add(task)
+            task.add_done_callback(self._runs.discard)
+        with self._lock:
+            self.stats_counters["ticks"] += 1
+            self.stats_counters["scheduled"] += len(due)
+        return len(due)
+
+    async def drain(self):
+        """Waits for the scheduled runs to finish."""
+        while self._runs:
+            await asyncio.gather(*list(self._runs), return_exceptions=True)
+
+    # --- Lifecycle ---
+
+    def open(self):
+        """Creates the pools (start() does it; call directly to use tick() without the loop)."""
+        if self._io_pool is None:
+            self._semaphore = asyncio.Semaphore(self.io_concurrency)
+            # Sales and ads are fetched side by side
+            self._io_pool = ThreadPoolExecutor(max_workers=2 * self.io_concurrency, thread_name_prefix="optimization-io")
+            if self.processes > 0:
+                # spawn: workers only import the planner, not a copy of the API process
+                self._cpu_pool = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+                )
+                # Start the workers (and their imports) now rather than on the first run
+                for _ in range(self.processes):
+                    self._cpu_pool.submit(budget_changes, [], [])
+
+    def close(self):
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=False, cancel_futures=True)
+            self._io_pool = None
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self._cpu_pool = None
+        self._release_lock()
+
+    def _is_leader(self) -> bool:
+        if engine.dialect.name != "postgresql":
+            return True
+        if self._lock_connection is not None:
+            try:
+                # Postgres released the lock if this connection dropped
+                self._lock_connection.execute(text("SELECT 1"))
+                self._lock_connection.commit()
+                return True
+            except Exception as e:
+                print(f"Optimization scheduler lost its lock connection: {e}")
+                self._lock_connection.invalidate()
+                self._lock_connection.close()
+                self._lock_connection = None
+        connection = engine.connect()
+        locked = connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": SCHEDULER_LOCK_ID}).scalar()
+        # A session-level lock survives the commit, which keeps the connection out of an idle transaction
+        connection.commit()
+        if locked:
+            # The lock lives as long as this connection
+            self._lock_connection = connection
+            return True
+        connection.close()
+        return False
+
+    def _release_lock(self):
+        if self._lock_connection is not None:
+            try:
+                self._lock_connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": SCHEDULER_LOCK_ID})
+            finally:
+                self._lock_connection.close()
+                self._lock_connection = None
+
+    def start(self):
+        if self._task is not None or not self.enabled:
+            return
+        self.open()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        for task in list(self._runs):
+            task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self.close)
+
+    async def _run(self):
+        while True:
+            try:
+                if await asyncio.to_thread(self._is_leader):
+                    await self.tick()
+                    if time.monotonic() - self._last_purge > PURGE_SECONDS:
+                        self._last_purge = time.monotonic()
+                        await asyncio.to_thread(self.purge)
+            except Exception as e:
+                print(f"Optimization scheduler tick failed: {e}")
+            await asyncio.sleep(self.check_seconds)
+
+    # --- Metrics ---
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            counters = dict(self.stats_counters)
+            durations = {name: list(values) for name, values in self._durations.items()}
+            last_hour = sum(1 for t in self._finished_at if now - t <= 3600)
+        return {
+            "enabled": self.enabled,
+            "dry_run": self.dry_run,
+            "leader": self._lock_connection is not None or engine.dialect.name != "postgresql",
+            **counters,
+            "in_flight": len(self._in_flight),
+            "runs_last_hour": last_hour,
+            "durations": {
+                name: {
+                    "p50_ms": round(statistics.median(values) * 1000, 1) if values else 0.0,
+                    "max_ms": round(max(values) * 1000, 1) if values else 0.0,
+                }
+                for name, values in durations.items()
+            },
+        }
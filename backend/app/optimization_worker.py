@@ -0,0 +1,216 @@
+"""
+Worker process running the optimization jobs of app.job_queue:
+
+    python -m app.optimization_worker
+
+Each of OPTIMIZATION_WORKER_CONCURRENCY threads claims a job, fetches the
+organization's sales data and ad campaigns, plans the budget changes and,
+unless the job is a dry run, applies them (failing the job when the
+organization has turned auto scaling off since). The result (the campaigns as
+/api/campaigns returns them, plus the changes and how they were applied)
+is stored on the job. Any number of workers can run side by side.
+
+Applying sets absolute budgets, so a job retried after a partial apply
+does not change a budget twice.
+"""
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+# The API's .env, loaded before the modules below read their settings
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.job_queue import OptimizationJobQueue, PermanentJobError, LeaseLost
+from app.migrate_db import check_schema
+from app.models import OptimizationJob, Organization
+from app.tenant_config import load_config_from_org, auto_scaling_enabled, fetch_sales_payload, get_ad_connector
+from antigravity_ads.engine.planner import plan_campaigns, budget_changes
+
+# Finished jobs are purged at most this often
+PURGE_SECONDS = 3600
+
+def load_organization_config(organization_id: int) -> dict:
+    with Session(engine) as session:
+        org = session.exec(
+            select(Organization)
+            .where(Organization.id == organization_id)
+            .options(selectinload(Organization.integrations))
+        ).first()
+        if org is None:
+            raise PermanentJobError("Organization not found")
+        return load_config_from_org(org)
+
+class JobLease:
+    """
+    Keeps a claimed job's lease alive while it runs, renewing it every third
+    of OPTIMIZATION_JOB_LEASE_SECONDS. check() raises LeaseLost once a
+    renewal finds the job taken over, so the job stops before applying.
+    """
+
+    def __init__(self, queue: OptimizationJobQueue, job: OptimizationJob, worker_id: str):
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.lost = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._renew, name=f"job-lease-{job.id}", daemon=True)
+
+    def _renew(self):
+        interval = self.queue.lease.total_seconds() / 3
+        while not self._done.wait(interval):
+            try:
+                if not self.queue.renew(self.job, self.worker_id):
+                    self.lost.set()
+                    return
+            except Exception as e:
+                # Database briefly unreachable: the lease has time left, try again
+                print(f"Could not renew the lease of optimization job {self.job.id}: {e}")
+
+    def check(self):
+        if self.lost.is_set():
+            raise LeaseLost(f"Lease of optimization job {self.job.id} lost")
+
+    def __enter__(self) -> "JobLease":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+
+def run_optimization(job: OptimizationJob, lease: JobLease) -> Dict[str, Any]:
+    """fetch -> plan -> apply (unless dry run) for the job's organization."""
+    config = load_organization_config(job.organization_id)
+    if not job.dry_run and not auto_scaling_enabled(config):
+        # Turned off since the job was queued
+        raise PermanentJobError("Auto scaling is disabled for this organization")
+    start = time.perf_counter()
+    sales_payload = fetch_sales_payload(config)
+    connector = get_ad_connector(config)
+    campaigns, platforms = connector.fetch()
+    fetch_seconds = time.perf_counter() - start
+
+    lease.check()
+    step = time.perf_counter()
+    rows, keys = plan_campaigns(config, sales_payload, {"campaigns": campaigns, "platforms": platforms})
+    changes = budget_changes(rows, keys)
+    optimize_seconds = time.perf_counter() - step
+
+    results = {}
+    step = time.perf_counter()
+    if changes and not job.dry_run:
+        # Another worker may be running the job now: never apply twice
+        lease.check()
+        results = connector.update_budgets(changes)
+    apply_seconds = time.perf_counter() - step
+
+    return {
+        "campaigns": rows,
+        "platforms": platforms,
+        "changes": changes,
+        "applied": sum(1 for r in results.values() if r["success"]),
+        "failed": sum(1 for r in results.values() if not r["success"]),
+        "apply_results": results,
+        "fetch_seconds": round(fetch_seconds, 3),
+        "optimize_seconds": round(optimize_seconds, 3),
+        "apply_seconds": round(apply_seconds, 3),
+    }
+
+class OptimizationWorker:
+    """
+    `execute(job, lease)` returns the job's result (calling lease.check()
+    before any step that must not run twice); it runs on `concurrency` threads.
+    """
+
+    def __init__(
+        self,
+        queue: OptimizationJobQueue,
+        execute: Callable[[OptimizationJob, JobLease], Dict[str, Any]] = run_optimization,
+        concurrency: int = 4,
+        poll_seconds: float = 1.0,
+        name: Optional[str] = None,
+    ):
+        self.queue = queue
+        self.execute = execute
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._last_purge = 0.0
+
+    def run_one(self, worker_id: str) -> bool:
+        """Claims and runs one job; False when none was due."""
+        jobs = self.queue.claim(worker_id)
+        if not jobs:
+            return False
+        job = jobs[0]
+        with JobLease(self.queue, job, worker_id) as lease:
+            try:
+                result = self.execute(job, lease)
+            except LeaseLost as e:
+                # The worker that took the job over records its outcome
+                print(e)
+            except PermanentJobError as e:
+                self.queue.fail(job, worker_id, str(e), retry=False)
+            except Exception as e:
+                print(f"Optimization job {job.id} failed (attempt {job.attempts}/{job.max_attempts}): {e}")
+                self.queue.fail(job, worker_id, str(e)[:500])
+            else:
+                self.queue.complete(job, worker_id, result)
+        return True
+
+    def _loop(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                if self.run_one(worker_id):
+                    continue
+            except Exception as e:
+                # Database unreachable and the like: wait and try again
+                print(f"Optimization worker {worker_id}: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def run(self):
+        """Runs until stop() (blocking)."""
+        threads = [
+            threading.Thread(target=self._loop, args=(f"{self.name}:{i}",), name=f"optimization-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        while not self._stop.wait(self.poll_seconds):
+            if time.monotonic() - self._last_purge > PURGE_SECONDS:
+                self._last_purge = time.monotonic()
+                try:
+                    self.queue.purge()
+                except Exception as e:
+                    print(f"Optimization job purge failed: {e}")
+        for thread in threads:
+            thread.join()
+
+    def stop(self):
+        """Lets the running jobs finish, then returns from run()."""
+        self._stop.set()
+
+def main():
+    check_schema()
+    worker = OptimizationWorker(
+        OptimizationJobQueue(),
+        concurrency=int(os.getenv("OPTIMIZATION_WORKER_CONCURRENCY", "4")),
+        poll_seconds=float(os.getenv("OPTIMIZATION_WORKER_POLL_SECONDS", "1")),
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: worker.stop())
+    print(f"Optimization worker {worker.name} started ({worker.concurrency} threads)")
+    worker.run()
+
+if __name__ == "__main__":
+    main()
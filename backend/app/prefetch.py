@@ -0,0 +1,327 @@
+"""
+Background prefetch of tenant data (sales payload + ad campaigns).
+
+The scheduler keeps one snapshot per organization and refreshes it ahead of
+demand, so /api/campaigns and /api/global-status answer from memory instead
+of waiting for the Sheets and Meta round trips:
+
+- cadence: from BotSettings.optimization_frequency (PREFETCH_INTERVALS),
+  shortened to PREFETCH_ACTIVE_INTERVAL_SECONDS while the organization's
+  users are using the dashboard (a request in the last
+  PREFETCH_ACTIVE_WINDOW_SECONDS);
+- jitter: first runs are spread over a whole interval and every next run is
+  moved by +/- PREFETCH_JITTER, so tenants never refresh in lockstep;
+- bounded concurrency: at most PREFETCH_CONCURRENCY tenants at once;
+- per-upstream quotas: token buckets (requests per minute) in front of
+  Google Sheets and Meta, so prefetching never eats the quota the
+  interactive requests need.
+
+Each API worker process runs its own scheduler: with several workers, enable
+it on one of them only (or accept the duplicated upstream calls).
+"""
+import asyncio
+import hashlib
+import heapq
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict
+
+# Base refresh interval per optimization frequency (seconds)
+PREFETCH_INTERVALS = {
+    "hourly": 15 * 60,
+    "daily": 60 * 60,
+    "weekly": 6 * 60 * 60,
+}
+
+class TenantSnapshot(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    organization_id: int
+    config_key: str
+    sales_payload: Dict[str, Any]
+    ad_payload: Optional[Dict[str, Any]] = None
+    fetched_at: float  # time.monotonic()
+
+def config_key(config: dict) -> str:
+    """Fingerprint of the config parts the fetched data depends on."""
+    meta = config.get("ad_platforms", {}).get("meta", {})
+    relevant = {
+        "sales_source_type": config.get("sales_source_type"),
+        "google_sheets": {k: config.get("google_sheets", {}).get(k) for k in ("spreadsheet_id", "layout")},
+        "meta": {k: meta.get(k) for k in ("enabled", "ad_account_id", "access_token")},
+    }
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()
+
+def sales_upstream(config: dict) -> Optional[str]:
+    return "google_sheets" if config.get("sales_source_type") == "google_sheets" else None
+
+def ads_upstream(config: dict) -> Optional[str]:
+    meta = config.get("ad_platforms", {}).get("meta", {})
+    if meta.get("enabled") and meta.get("access_token") and meta.get("ad_account_id"):
+        return "meta"
+    return None
+
+class RateLimiter:
+    """asyncio token bucket: `per_minute` acquisitions per minute, bursts up to `burst`."""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, per_minute / 6)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+class PrefetchScheduler:
+    """
+    `load_targets()` returns [(organization_id, config)] for every organization
+    worth prefetching (blocking, run in a thread). `fetch_sales(config)` and
+    `fetch_ads(config)` are the blocking connector calls the API handlers
+    would otherwise make (`fetch_ads` is None when the ads come from
+    elsewhere, e.g. the campaign mirror).
+    """
+
+    def __init__(
+        self,
+        load_targets: Callable[[], List[Tuple[int, dict]]],
+        fetch_sales: Callable[[dict], dict],
+        fetch_ads: Optional[Callable[[dict], dict]],
+        concurrency: int = 4,
+        quotas_per_minute: Optional[Dict[str, float]] = None,
+        jitter: float = 0.1,
+        active_interval: float = 120.0,
+        active_window: float = 900.0,
+        targets_refresh_seconds: float = 60.0,
+        intervals: Optional[Dict[str, float]] = None,
+    ):
+        self.load_targets = load_targets
+        self.fetch_sales = fetch_sales
+        self.fetch_ads = fetch_ads
+        self.concurrency = concurrency
+        self.quotas_per_minute = quotas_per_minute or {}
+        self.jitter = jitter
+        self.active_interval = active_interval
+        self.active_window = active_window
+        self.targets_refresh_seconds = targets_refresh_seconds
+        self.intervals = intervals or PREFETCH_INTERVALS
+
+        self._targets: Dict[int, dict] = {}
+        self._snapshots: Dict[int, TenantSnapshot] = {}
+        self._last_activity: Dict[int, float] = {}
+        # (next run, organization id); stale entries are skipped when popped
+        self._queue: List[Tuple[float, int]] = []
+        self._next_run: Dict[int, float] = {}
+        self._running: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._limiters: Dict[str, RateLimiter] = {}
+
+        self.stats_counters = {
+            "runs": 0,
+            "failures": 0,
+            "snapshot_hits": 0,
+            "snapshot_misses": 0,
+            "inline_fetches": 0,
+        }
+        self._start_delay_total = 0.0
+        self._start_delay_max = 0.0
+
+    # --- Cadence ---
+
+    def interval_for(self, organization_id: int, config: dict) -> float:
+        frequency = (config.get("bot_settings") or {}).get("optimization_frequency", "daily")
+        interval = self.intervals.get(frequency, self.intervals["daily"])
+        last_activity = self._last_activity.get(organization_id)
+        if last_activity is not None and time.monotonic() - last_activity < self.active_window:
+            interval = min(interval, self.active_interval)
+        return interval
+
+    def _schedule(self, organization_id: int, delay: float):
+        run_at = time.monotonic() + delay
+        self._next_run[organization_id] = run_at
+        heapq.heappush(self._queue, (run_at, organization_id))
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    # --- Snapshots (called from request handlers, any thread) ---
+
+    def record_activity(self, organization_id: int, config: dict):
+        previous = self._last_activity.get(organization_id)
+        now = time.monotonic()
+        self._last_activity[organization_id] = now
+        if previous is not None and now - previous < self.active_window:
+            return
+        # Dashboard just opened: bring the next refresh forward to the active cadence
+        next_run = self._next_run.get(organization_id)
+        if self._loop is None or next_run is None:
+            return
+        interval = self.interval_for(organization_id, config)
+        if next_run - now > interval:
+            self._loop.call_soon_threadsafe(self._schedule_and_wake, organization_id, self._jittered(interval))
+
+    def _schedule_and_wake(self, organization_id: int, delay: float):
+        self._schedule(organization_id, delay)
+        self._wakeup.set()
+
+    def get(self, organization_id: int, config: dict) -> Optional[TenantSnapshot]:
+        """Warm snapshot for this config, or None when missing or too old."""
+        snapshot = self._snapshots.get(organization_id)
+        if snapshot is None or snapshot.config_key != config_key(config):
+            self.stats_counters["snapshot_misses"] += 1
+            return None
+        # A snapshot may miss one scheduled refresh (quota waits, failures)
+        max_age = 2 * self.interval_for(organization_id, config) * (1 + self.jitter)
+        if time.monotonic() - snapshot.fetched_at > max_age:
+            self.stats_counters["snapshot_misses"] += 1
+            return None
+        self.stats_counters["snapshot_hits"] += 1
+        return snapshot
+
+    def put(self, organization_id: int, config: dict, sales_payload: dict, ad_payload: Optional[dict] = None):
+        """Stores data a handler fetched itself, so the next request can use it."""
+        self.stats_counters["inline_fetches"] += 1
+        self._snapshots[organization_id] = TenantSnapshot(
+            organization_id=organization_id,
+            config_key=config_key(config),
+            sales_payload=sales_payload,
+            ad_payload=ad_payload,
+            fetched_at=time.monotonic()
+        )
+
+    # --- Background loop ---
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._limiters = {name: RateLimiter(rate) for name, rate in self.quotas_per_minute.items()}
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _refresh_targets(self):
+        try:
+            targets = dict(await asyncio.to_thread(self.load_targets))
+        except Exception as e:
+            print(f"Prefetch: could not load organizations: {e}")
+            return
+
+        for organization_id, config in targets.items():
+            if organization_id not in self._next_run:
+                # First run anywhere in the first interval: no thundering herd at boot
+                self._schedule(organization_id, random.uniform(0, self.interval_for(organization_id, config)))
+        for organization_id in set(self._targets) - set(targets):
+            self._next_run.pop(organization_id, None)
+            self._snapshots.pop(organization_id, None)
+        self._targets = targets
+
+    async def _run(self):
+        next_targets_refresh = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= next_targets_refresh:
+                await self._refresh_targets()
+                next_targets_refresh = now + self.targets_refresh_seconds
+
+            while self._queue and self._queue[0][0] <= time.monotonic():
+                run_at, organization_id = heapq.heappop(self._queue)
+                if self._next_run.get(organization_id) != run_at or organization_id in self._running:
+                    continue  # rescheduled, removed, or still running
+                await self._semaphore.acquire()
+                self._running.add(organization_id)
+                asyncio.create_task(self._prefetch(organization_id, run_at))
+
+            timeout = self.targets_refresh_seconds
+            if self._queue:
+                timeout = min(timeout, max(0.0, self._queue[0][0] - time.monotonic()))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _prefetch(self, organization_id: int, run_at: float):
+        config = self._targets.get(organization_id)
+        try:
+            if config is None:
+                return
+            delay = time.monotonic() - run_at
+            self._start_delay_total += delay
+            self._start_delay_max = max(self._start_delay_max, delay)
+
+            sales_payload = await self._call(sales_upstream(config), self.fetch_sales, config)
+            ad_payload = None
+            if self.fetch_ads is not None:
+                ad_payload = await self._call(ads_upstream(config), self.fetch_ads, config)
+            self._snapshots[organization_id] = TenantSnapshot(
+                organization_id=organization_id,
+                config_key=config_key(config),
+                sales_payload=sales_payload,
+                ad_payload=ad_payload,
+                fetched_at=time.monotonic()
+            )
+            self.stats_counters["runs"] += 1
+        except Exception as e:
+            self.stats_counters["failures"] += 1
+            print(f"Prefetch failed for organization {organization_id}: {e}")
+        finally:
+            self._running.discard(organization_id)
+            self._semaphore.release()
+            if config is not None and organization_id in self._targets:
+                self._schedule(organization_id, self._jittered(self.interval_for(organization_id, config)))
+                self._wakeup.set()
+
+    async def _call(self, upstream: Optional[str], fetch: Callable[[dict], dict], config: dict) -> dict:
+        limiter = self._limiters.get(upstream) if upstream else None
+        if limiter is not None:
+            await limiter.acquire()
+        return await asyncio.to_thread(fetch, config)
+
+    def stats(self) -> Dict[str, Any]:
+        runs = self.stats_counters["runs"] + self.stats_counters["failures"]
+        now = time.monotonic()
+        ages = [now - s.fetched_at for s in list(self._snapshots.values())]
+        lookups = self.stats_counters["snapshot_hits"] + self.stats_counters["snapshot_misses"]
+        return {
+            "enabled": self._task is not None,
+            "organizations": len(self._targets),
+            "running": len(self._running),
+            "concurrency": self.concurrency,
+            **self.stats_counters,
+            "snapshot_hit_ratio": round(self.stats_counters["snapshot_hits"] / lookups, 4) if lookups else 0.0,
+            "snapshots": len(ages),
+            "oldest_snapshot_seconds": round(max(ages), 1) if ages else 0.0,
+            # How late runs start compared to their schedule (concurrency / quota pressure)
+            "start_delay_avg_seconds": round(self._start_delay_total / runs, 3) if runs else 0.0,
+            "start_delay_max_seconds": round(self._start_delay_max, 3),
+            "quota_wait_seconds": {name: round(l.waited_seconds, 3) for name, l in self._limiters.items()},
+        }
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import zlib
+from contextlib import nullcontext
+from typing import Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.util.concurrency import in_greenlet
+from sqlmodel import Session, select
+
+from app.models import User, Organization
+
+# Striped locks: concurrent first logins for the same email in this process
+# wait for a single provisioning instead of racing each other.
+_PROVISION_LOCKS = [threading.Lock() for _ in range(64)]
+
+def _lock_for(email: str):
+    if in_greenlet():
+        # Async engine (Database.run): every request shares the event loop
+        # thread, so a thread lock would deadlock. Callers collapse requests
+        # with an asyncio lock instead (see provision_guard).
+        return nullcontext()
+    return _PROVISION_LOCKS[zlib.crc32(email.encode("utf-8")) % len(_PROVISION_LOCKS)]
+
+def get_or_provision_user(
+    session: Session,
+    email: str,
+    full_name: str,
+    company_name: str,
+    hashed_password: str = "supabase_managed",
+    options: tuple = ()
+) -> Tuple[User, bool]:
+    """
+    Returns (user, created). A missing user is created together with its
+    Organization in a single transaction, so a failed insert never leaves an
+    orphan organization behind.
+
+    Races are handled at two levels:
+    - in-process, requests for the same email are serialized on a lock and
+      re-check for the user once they get it (with the async engine this is
+      done by the caller, see provision_guard);
+    - across processes, the unique index on user.email rejects the second
+      insert, which is rolled back (with its organization) before we re-read
+      the winner's row.
+    """
+    statement = select(User).where(User.email == email).options(*options)
+    user = session.exec(statement).first()
+    if user:
+        return user, False
+
+    with _lock_for(email):
+        # Another request may have provisioned this user while we waited
+        user = session.exec(statement).first()
+        if user:
+            return user, False
+
+        user = User(
+            email=email,
+            hashed_password=hashed_password,
+            full_name=full_name,
+            organization=Organization(name=company_name),
+            is_superuser=False,
+            role="user"
+        )
+        session.add(user)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Lost the race against another process: keep its user and org
+            session.rollback()
+            return session.exec(statement).one(), False
+
+    return user, True
+
+# Async counterpart of _PROVISION_LOCKS, created lazily inside the event loop
+_ASYNC_PROVISION_LOCKS: list = []
+
+def provision_guard(email: str) -> asyncio.Lock:
+    """asyncio lock shared by concurrent requests provisioning the same email."""
+    if not _ASYNC_PROVISION_LOCKS:
+        _ASYNC_PROVISION_LOCKS.extend(asyncio.Lock() for _ in range(len(_PROVISION_LOCKS)))
+    return _ASYNC_PROVISION_LOCKS[zlib.crc32(email.encode("utf-8")) % len(_ASYNC_PROVISION_LOCKS)]
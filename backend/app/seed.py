@@ -1,11 +1,12 @@
 from sqlmodel import Session, select
-from app.database import create_db_and_tables, engine
+from app.database import engine
+from app.migrate_db import migrate
 from app.models import User, Organization
 from app.auth import get_password_hash
 import sys
 
 def seed_db():
-    create_db_and_tables()
+    migrate()
     
     with Session(engine) as session:
         # Check if Admin Org exists
@@ -0,0 +1,155 @@
+"""
+Background provisioning of client spreadsheets.
+
+POST /api/sheets/create used to copy the template and share it while the
+request waited (several seconds, often past the proxy timeout). It now
+submits a SheetJob and returns at once; the job runs on a small thread pool
+and the client polls GET /api/sheets/jobs/{job_id}.
+
+Jobs live in memory (per API worker) and are forgotten
+SHEET_JOBS_RETENTION_SECONDS after they finish.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+# Job states, in order. "claiming" is taking a pre-copied sheet from the
+# template pool ("copying" follows only when the pool is empty); "sharing"
+# only appears when the batched permission call has to be retried on its own.
+QUEUED = "queued"
+CLAIMING = "claiming"
+COPYING = "copying"
+SHARING = "sharing"
+SAVING = "saving"
+COMPLETED = "completed"
+FAILED = "failed"
+
+FINISHED_STATES = (COMPLETED, FAILED)
+
+class SheetJob(BaseModel):
+    """Immutable state of a provisioning job (replaced on every step)."""
+    model_config = ConfigDict(frozen=True)
+
+    id: str
+    organization_id: int
+    client_name: str
+    client_email: Optional[str] = None
+    status: str = QUEUED
+    spreadsheet_id: Optional[str] = None
+    spreadsheet_url: Optional[str] = None
+    title: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float  # time.time()
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class SheetProvisioningJobs:
+    """
+    `provision(job, on_progress)` copies and shares the spreadsheet and
+    returns the copy_template result; `on_complete(job, result)` stores it
+    on the organization. Both block and run on the pool.
+    """
+
+    def __init__(
+        self,
+        provision: Callable[[SheetJob, Callable[[str], None]], Dict[str, Any]],
+        on_complete: Callable[[SheetJob, Dict[str, Any]], None],
+        max_workers: int = 2,
+        retention_seconds: float = 3600.0,
+    ):
+        self.provision = provision
+        self.on_complete = on_complete
+        self.retention_seconds = retention_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheet-jobs")
+        self._jobs: "OrderedDict[str, SheetJob]" = OrderedDict()
+        self._active_by_org: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+        self.stats_counters = {"submitted": 0, "completed": 0, "failed": 0, "deduplicated": 0}
+        self._duration_total = 0.0
+        self._duration_max = 0.0
+
+    def submit(self, organization_id: int, client_name: str, client_email: Optional[str] = None) -> SheetJob:
+        """Queues a job, or returns the one already running for this organization."""
+        with self._lock:
+            self._expire()
+            active = self._jobs.get(self._active_by_org.get(organization_id, ""))
+            if active is not None:
+                self.stats_counters["deduplicated"] += 1
+                return active
+            job = SheetJob(
+                id=uuid.uuid4().hex,
+                organization_id=organization_id,
+                client_name=client_name,
+                client_email=client_email,
+                created_at=time.time()
+            )
+            self._jobs[job.id] = job
+            self._active_by_org[organization_id] = job.id
+            self.stats_counters["submitted"] += 1
+        self._pool.submit(self._run, job.id)
+        return job
+
+    def get(self, job_id: str) -> Optional[SheetJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _update(self, job_id: str, **fields) -> SheetJob:
+        with self._lock:
+            job = self._jobs[job_id].model_copy(update=fields)
+            self._jobs[job_id] = job
+            if job.status in FINISHED_STATES:
+                self._active_by_org.pop(job.organization_id, None)
+            return job
+
+    def _run(self, job_id: str):
+        job = self._update(job_id, started_at=time.time())
+        try:
+            result = self.provision(job, lambda step: self._update(job_id, status=step))
+            job = self._update(job_id, status=SAVING, **{
+                k: result[k] for k in ("spreadsheet_id", "spreadsheet_url", "title")
+            })
+            self.on_complete(job, result)
+        except FileNotFoundError as e:
+            self._finish(job_id, FAILED, error=str(e))
+        except Exception as e:
+            print(f"Sheet provisioning job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, error=f"Failed to create spreadsheet: {str(e)}")
+        else:
+            self._finish(job_id, COMPLETED)
+
+    def _finish(self, job_id: str, status: str, **fields):
+        job = self._update(job_id, status=status, finished_at=time.time(), **fields)
+        duration = job.finished_at - job.created_at
+        with self._lock:
+            self.stats_counters[status] += 1
+            self._duration_total += duration
+            self._duration_max = max(self._duration_max, duration)
+
+    def _expire(self):
+        # Called with the lock held; jobs are ordered by creation
+        cutoff = time.time() - self.retention_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.created_at > cutoff:
+                break
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self.stats_counters["completed"] + self.stats_counters["failed"]
+            return {
+                **self.stats_counters,
+                "active": len(self._active_by_org),
+                "retained": len(self._jobs),
+                "duration_avg_seconds": round(self._duration_total / finished, 3) if finished else 0.0,
+                "duration_max_seconds": round(self._duration_max, 3),
+            }
@@ -0,0 +1,154 @@
+import heapq
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Same statement repeated this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = 5
+# Number of slowest statements kept per request and globally
+SLOWEST_KEPT = 5
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(statement: str) -> str:
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+class RequestQueryStats:
+    """SQL activity of a single HTTP request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest: List[tuple] = []  # min-heap of (duration, statement)
+        self.statement_counts: Dict[str, int] = {}
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.statement_counts[statement] = self.statement_counts.get(statement, 0) + 1
+        if len(self.slowest) < SLOWEST_KEPT:
+            heapq.heappush(self.slowest, (duration, statement))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, statement))
+
+    def n_plus_one(self) -> Dict[str, int]:
+        """Statements executed at least N_PLUS_ONE_THRESHOLD times."""
+        return {s: n for s, n in self.statement_counts.items() if n >= N_PLUS_ONE_THRESHOLD}
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("sql_request_stats", default=None)
+
+
+class SQLMetrics:
+    """
+    Opt-in SQL instrumentation based on SQLAlchemy engine events.
+
+    `start_request` / `finish_request` bracket an HTTP request; every statement
+    executed in between (on any thread the request's context is copied to) is
+    counted and timed. Finished requests are aggregated per route for the
+    metrics endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._slowest: List[tuple] = []
+
+    def instrument(self, engine: Engine):
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # --- Engine events ---
+    # The start time lives on the statement's execution context: a statement
+    # that raises never gets after_cursor_execute, and its context is dropped
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._sql_metrics_start = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_sql_metrics_start", None)
+        stats = _current_stats.get()
+        if stats is not None and start is not None:
+            stats.record(statement, time.perf_counter() - start)
+
+    # --- Request scope ---
+
+    def start_request(self) -> RequestQueryStats:
+        stats = RequestQueryStats()
+        _current_stats.set(stats)
+        return stats
+
+    def finish_request(self, route: str, stats: RequestQueryStats):
+        _current_stats.set(None)
+        suspects = stats.n_plus_one()
+        for statement, n in suspects.items():
+            print(f"[SQL] Possible N+1 on {route}: {n}x {_normalize(statement)[:200]}")
+
+        with self._lock:
+            agg = self._routes.setdefault(route, {
+                "requests": 0,
+                "queries": 0,
+                "sql_time_ms": 0.0,
+                "max_queries": 0,
+                "n_plus_one_requests": 0
+            })
+            agg["requests"] += 1
+            agg["queries"] += stats.count
+            agg["sql_time_ms"] += stats.total_time * 1000
+            agg["max_queries"] = max(agg["max_queries"], stats.count)
+            if suspects:
+                agg["n_plus_one_requests"] += 1
+
+            for duration, statement in stats.slowest:
+                item = (duration, route, statement)
+                if len(self._slowest) < SLOWEST_KEPT:
+                    heapq.heappush(self._slowest, item)
+                elif duration > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, item)
+
+    @staticmethod
+    def response_headers(stats: RequestQueryStats) -> Dict[str, str]:
+        headers = {
+            "X-SQL-Queries": str(stats.count),
+            "X-SQL-Time-Ms": f"{stats.total_time * 1000:.2f}"
+        }
+        if stats.slowest:
+            headers["X-SQL-Slowest-Ms"] = f"{max(stats.slowest)[0] * 1000:.2f}"
+        if stats.n_plus_one():
+            headers["X-SQL-N-Plus-One"] = str(len(stats.n_plus_one()))
+        return headers
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {}
+            for route, agg in self._routes.items():
+                requests = agg["requests"] or 1
+                routes[route] = {
+                    **agg,
+                    "sql_time_ms": round(agg["sql_time_ms"], 2),
+                    "avg_queries": round(agg["queries"] / requests, 2),
+                    "avg_sql_time_ms": round(agg["sql_time_ms"] / requests, 2)
+                }
+            slowest = [
+                {"duration_ms": round(d * 1000, 2), "route": r, "statement": _normalize(s)}
+                for d, r, s in sorted(self._slowest, reverse=True)
+            ]
+        return {"routes": routes, "slowest_statements": slowest}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._slowest.clear()
+
+
+sql_metrics = SQLMetrics()
@@ -0,0 +1,292 @@
+"""
+Warm pool of pre-copied client template spreadsheets.
+
+Copying the template is the slowest step of onboarding, so copies are made
+ahead of time and kept unassigned in the `template_copy` table. A new client
+claims one (a conditional UPDATE, so two claims never get the same copy),
+which only costs a rename + share batch request; the full copy is the
+fallback when the pool is empty.
+
+A background refiller keeps TEMPLATE_POOL_SIZE copies available, made from
+the current template revision: when the template is edited, the available
+copies of the previous revision are retired and deleted. On PostgreSQL
+only one API worker refills at a time (advisory lock).
+"""
+import asyncio
+import datetime
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+from sqlalchemy import text, update
+from sqlmodel import Session, select, func
+
+from app.database import engine
+from app.models import TemplateCopy
+from antigravity_ads.connectors.google_drive_service import GoogleDriveService
+
+AVAILABLE = "available"
+CLAIMED = "claimed"
+RETIRED = "retired"
+
+# Arbitrary key for pg_try_advisory_lock, so only one worker refills
+REFILL_LOCK_ID = 72_650_002
+
+class TemplatePool:
+    def __init__(
+        self,
+        drive_service: Callable[[], GoogleDriveService],
+        target_size: int = 5,
+        folder_id: Optional[str] = None,
+        refill_batch: int = 5,
+        check_seconds: float = 60.0,
+    ):
+        self.drive_service = drive_service
+        self.target_size = target_size
+        self.folder_id = folder_id
+        self.refill_batch = refill_batch
+        self.check_seconds = check_seconds
+
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+
+        self.stats_counters = {
+            "claims": 0,
+            "empty": 0,
+            "claim_failures": 0,
+            "created": 0,
+            "retired": 0,
+            "refills": 0,
+            "refill_errors": 0,
+        }
+        self.template_revision: Optional[str] = None
+        self._claim_seconds: deque = deque(maxlen=200)
+        # (time.time(), copies created) of recent refills, for the refill rate
+        self._created_log: deque = deque(maxlen=1000)
+        self._last_refill_at: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_size > 0
+
+    # --- Claiming (request / job threads) ---
+
+    def _claim_row(self, organization_id: int) -> Optional[Tuple[int, str]]:
+        """(id, spreadsheet id) of the copy now assigned to the organization."""
+        with Session(engine) as session:
+            for _ in range(5):
+                candidate = session.exec(
+                    select(TemplateCopy.id, TemplateCopy.spreadsheet_id)
+                    .where(TemplateCopy.status == AVAILABLE)
+                    .order_by(TemplateCopy.id)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                ).first()
+                if candidate is None:
+                    return None
+                claimed = session.execute(
+                    update(TemplateCopy)
+                    .where(TemplateCopy.id == candidate[0], TemplateCopy.status == AVAILABLE)
+                    .values(status=CLAIMED, organization_id=organization_id, claimed_at=datetime.datetime.now(datetime.timezone.utc))
+                )
+                session.commit()
+                if claimed.rowcount == 1:
+                    return tuple(candidate)
+                # Claimed (or retired) by someone else in between: next one
+            return None
+
+    def _set_status(self, copy_id: int, status: str, **values):
+        with Session(engine) as session:
+            session.execute(update(TemplateCopy).where(TemplateCopy.id == copy_id).values(status=status, **values))
+            session.commit()
+
+    def claim(
+        self,
+        organization_id: int,
+        client_name: str,
+        client_email: Optional[str] = None,
+        folder_id: Optional[str] = None
+    ) -> Optional[dict]:
+        """
+        Assigns a pool copy to the organization (renamed and shared like
+        copy_template would). None when the pool is empty or the copy
+        could not be claimed: make a full copy instead.
+        """
+        start = time.perf_counter()
+        claimed = self._claim_row(organization_id)
+        if claimed is None:
+            with self._lock:
+                self.stats_counters["empty"] += 1
+            self._wake()
+            return None
+
+        copy_id, spreadsheet_id = claimed
+        drive = self.drive_service()
+        try:
+            result = drive.claim_pool_copy(spreadsheet_id, client_name, client_email, folder_id)
+        except Exception as e:
+            print(f"Template pool: could not claim {spreadsheet_id}: {e}")
+            if isinstance(e, HttpError) and e.resp.status in (403, 404):
+                # Deleted or inaccessible in Drive: never hand it out again
+                self._set_status(copy_id, RETIRED)
+                try:
+                    drive.delete_files([spreadsheet_id])
+                except Exception as delete_error:
+                    print(f"Template pool: could not delete {spreadsheet_id}: {delete_error}")
+            else:
+                # Transient (rate limit, 5xx, network): the copy is fine, hand it out later
+                self._set_status(copy_id, AVAILABLE, organization_id=None, claimed_at=None)
+            with self._lock:
+                self.stats_counters["claim_failures"] += 1
+            self._wake()
+            return None
+
+        with self._lock:
+            self.stats_counters["claims"] += 1
+            self._claim_seconds.append(time.perf_counter() - start)
+        self._wake()
+        return result
+
+    # --- Refilling ---
+
+    def refill_once(self) -> int:
+        """Retires copies of an old template revision and tops the pool up. Returns copies created."""
+        with engine.connect() as lock_connection:
+            postgres = lock_connection.dialect.name == "postgresql"
+            if postgres and not lock_connection.execute(
+                text("SELECT pg_try_advisory_lock(:id)"), {"id": REFILL_LOCK_ID}
+            ).scalar():
+                return 0  # another worker is refilling
+            try:
+                return self._refill()
+            finally:
+                if postgres:
+                    lock_connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": REFILL_LOCK_ID})
+
+    def _refill(self) -> int:
+        drive = self.drive_service()
+        revision = drive.get_template_revision()
+        self.template_revision = revision
+
+        with Session(engine) as session:
+            outdated = session.exec(
+                select(TemplateCopy.id, TemplateCopy.spreadsheet_id)
+                .where(TemplateCopy.status == AVAILABLE, TemplateCopy.template_revision != revision)
+            ).all()
+            retired = []
+            for copy_id, spreadsheet_id in outdated:
+                result = session.execute(
+                    update(TemplateCopy)
+                    .where(TemplateCopy.id == copy_id, TemplateCopy.status == AVAILABLE)
+                    .values(status=RETIRED)
+                )
+                if result.rowcount == 1:
+                    retired.append(spreadsheet_id)
+            session.commit()
+
+            available = session.exec(
+                select(func.count(TemplateCopy.id)).where(TemplateCopy.status == AVAILABLE)
+            ).one()
+
+        if retired:
+            drive.delete_files(retired)
+            print(f"Template pool: retired {len(retired)} copies of an older template revision")
+
+        created: List[str] = []
+        while available + len(created) < self.target_size:
+            batch = drive.create_pool_copies(
+                min(self.refill_batch, self.target_size - available - len(created)), self.folder_id
+            )
+            if not batch:
+                break
+            with Session(engine) as session:
+                for spreadsheet_id in batch:
+                    session.add(TemplateCopy(spreadsheet_id=spreadsheet_id, template_revision=revision))
+                session.commit()
+            created.extend(batch)
+
+        now = time.time()
+        with self._lock:
+            self.stats_counters["refills"] += 1
+            self.stats_counters["created"] += len(created)
+            self.stats_counters["retired"] += len(retired)
+            if created:
+                self._created_log.append((now, len(created)))
+            self._last_refill_at = now
+        return len(created)
+
+    # --- Background loop ---
+
+    def _wake(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self):
+        if self._task is not None or not self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.refill_once)
+            except Exception as e:
+                self.stats_counters["refill_errors"] += 1
+                print(f"Template pool refill failed: {e}")
+            try:
+                # Claims wake the refiller up; otherwise check the template revision periodically
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.check_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    # --- Metrics ---
+
+    def depth(self) -> Dict[str, int]:
+        """Copies per status, from the database (shared by all workers)."""
+        with Session(engine) as session:
+            rows = session.exec(
+                select(TemplateCopy.status, func.count(TemplateCopy.id)).group_by(TemplateCopy.status)
+            ).all()
+        return {AVAILABLE: 0, CLAIMED: 0, RETIRED: 0, **dict(rows)}
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            claim_seconds = list(self._claim_seconds)
+            created_last_hour = sum(n for at, n in self._created_log if now - at < 3600)
+            counters = dict(self.stats_counters)
+            last_refill_at = self._last_refill_at
+        lookups = counters["claims"] + counters["empty"] + counters["claim_failures"]
+        return {
+            "enabled": self.enabled,
+            "target_size": self.target_size,
+            "depth": self.depth(),
+            "template_revision": self.template_revision,
+            **counters,
+            "claim_hit_ratio": round(counters["claims"] / lookups, 4) if lookups else 0.0,
+            "claim_latency": {
+                "p50_ms": round(statistics.median(claim_seconds) * 1000, 1) if claim_seconds else 0.0,
+                "max_ms": round(max(claim_seconds) * 1000, 1) if claim_seconds else 0.0,
+            },
+            "refill_rate_per_hour": created_last_hour,
+            "last_refill_seconds_ago": round(now - last_refill_at, 1) if last_refill_at else None,
+        }
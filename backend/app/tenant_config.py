@@ -0,0 +1,114 @@
+"""
+Per-organization configuration and connectors, shared by the API
+(app.main) and the optimization worker (app.optimization_worker) without
+either importing the other.
+"""
+import os
+from typing import Any, Dict, Optional, Union
+
+from pydantic import BaseModel
+
+from app.identity_cache import OrganizationSnapshot
+from app.models import Organization
+from antigravity_ads.connectors.sales_connector import MockSalesConnector
+from antigravity_ads.connectors.google_sheet_connector import GoogleSheetConnector
+from antigravity_ads.connectors.google_sheet_cache import SheetDataCache
+from antigravity_ads.connectors.ad_connector import MockAdConnector
+from antigravity_ads.connectors.composite_connector import CompositeAdConnector
+
+class BotSettings(BaseModel):
+    global_budget_cap: int = 5000
+    target_roas: float = 2.5
+    optimization_frequency: str = "daily"
+    auto_scaling_enabled: bool = True
+    # BudgetOptimizer budget_rules (thresholds, limits, declarative "rules")
+    budget_rules: Optional[Dict[str, Any]] = None
+
+def load_config_from_org(org: Union[Organization, OrganizationSnapshot]):
+    # 1. Base Config Structure
+    config = {
+        "sales_source_type": "google_sheets" if org.google_sheet_id else "mock",
+        "google_sheets": {
+            "spreadsheet_id": org.google_sheet_id or "",
+            "range_name": "Feuille 1!A2:C",
+            "drive_folder_id": org.drive_folder_id,
+            "layout": org.sheet_layout
+        },
+        "ad_platforms": {
+            "meta": {"enabled": False}, # Defaults, to be expanded with Integration Table
+            "google": {"enabled": False},
+            "snap": {"enabled": False}
+        },
+        "billing": {
+            "current_plan": org.plan or "free",
+            "status": "active"
+        },
+        "bot_settings": BotSettings(**(org.bot_settings or {})).model_dump()
+    }
+    config["budget_rules"] = config["bot_settings"]["budget_rules"] or {}
+    
+    # Check Integrations Table (Not fully implemented in UI yet, but structure is ready)
+    if org.integrations:
+        for integration in org.integrations:
+            if integration.provider in config["ad_platforms"]:
+                config["ad_platforms"][integration.provider] = {
+                    "enabled": integration.is_enabled,
+                    **integration.credentials
+                }
+                
+    return config
+
+def auto_scaling_enabled(config) -> bool:
+    """Whether budget changes may be applied to the organization's campaigns (not only planned)."""
+    return bool((config.get("bot_settings") or {}).get("auto_scaling_enabled"))
+
+def get_sales_connector(config):
+    sales_source_type = config.get("sales_source_type", "mock")
+    if sales_source_type == "google_sheets":
+        return GoogleSheetConnector(config.get("google_sheets", {}))
+    return MockSalesConnector()
+
+def get_ad_connector_classes():
+    """Ad platforms with an API integration, by AdPlatforms key."""
+    from antigravity_ads.connectors.meta_connector import MetaAdsConnector
+    return {"meta": MetaAdsConnector}
+
+def enabled_ad_platforms(config) -> Dict[str, dict]:
+    """{platform: platform config} of the enabled platforms with an API integration and credentials."""
+    connector_classes = get_ad_connector_classes()
+    platforms = {}
+    for platform, platform_config in (config.get("ad_platforms") or {}).items():
+        platform_config = platform_config or {}
+        if platform in connector_classes and platform_config.get("enabled") and platform_config.get("access_token") and platform_config.get("ad_account_id"):
+            platforms[platform] = platform_config
+    return platforms
+
+def build_ad_connector(platform: str, platform_config: dict):
+    return get_ad_connector_classes()[platform](platform_config)
+
+def get_ad_connector(config):
+    """Every enabled and configured platform behind one CompositeAdConnector (the mock when there is none)."""
+    connectors = {
+        platform: build_ad_connector(platform, platform_config)
+        for platform, platform_config in enabled_ad_platforms(config).items()
+    }
+    if not connectors:
+        connectors["mock"] = MockAdConnector(platform_name="Meta Ads (Mock)", config=config)
+    return CompositeAdConnector(connectors)
+
+# Parsed client sheets, reread only when the Drive revision changes
+sheet_cache = SheetDataCache(
+    max_size=int(os.getenv("SHEET_CACHE_MAX_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("SHEET_CACHE_TTL_SECONDS", "900")),
+    revision_check_seconds=float(os.getenv("SHEET_CACHE_REVISION_CHECK_SECONDS", "30")),
+    webhook_url=os.getenv("GOOGLE_DRIVE_WEBHOOK_URL") or None,
+    webhook_token=os.getenv("GOOGLE_DRIVE_WEBHOOK_TOKEN", ""),
+)
+
+def get_sales_payload(sales_connector):
+    if isinstance(sales_connector, GoogleSheetConnector):
+        return sheet_cache.get(sales_connector)
+    return sales_connector.get_performance_data()
+
+def fetch_sales_payload(config):
+    return get_sales_payload(get_sales_connector(config))
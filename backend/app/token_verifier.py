@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Optional
+
+from jose import JWTError, jwt
+
+# Supabase signs access tokens for logged-in users with this audience
+SUPABASE_AUDIENCE = "authenticated"
+JWKS_REFRESH_SECONDS = 600
+# Minimum delay between two forced JWKS refreshes triggered by unknown key IDs
+JWKS_MIN_REFETCH_SECONDS = 30
+
+# Asymmetric algorithms python-jose can verify (not EdDSA): tokens signed
+# with anything else are checked by Supabase
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256"}
+
+
+class UnknownSigningKey(Exception):
+    """Raised when a token cannot be checked locally (unknown kid, missing secret or unsupported algorithm)."""
+
+
+class SupabaseTokenVerifier:
+    """
+    Verifies Supabase access tokens.
+
+    In "local" mode the JWT signature, expiry and audience are checked in-process,
+    using the project's JWT secret (HS256) or the project's JWKS (asymmetric keys),
+    cached and refreshed every `jwks_refresh_seconds`. Only tokens signed by a key
+    we do not know, or with an algorithm python-jose cannot verify (e.g. EdDSA),
+    fall back to `supabase.auth.get_user` (one network round trip).
+    In "remote" mode every token is checked with `get_user`.
+
+    `verify` returns the token claims: at least `sub`, `email` and `user_metadata`.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        jwt_secret: Optional[str] = None,
+        mode: str = "local",
+        client_factory: Optional[Callable[[], Any]] = None,
+        audience: str = SUPABASE_AUDIENCE,
+        jwks_refresh_seconds: float = JWKS_REFRESH_SECONDS,
+    ):
+        self.supabase_url = supabase_url.rstrip("/")
+        self.jwt_secret = jwt_secret or None
+        self.mode = mode
+        self.client_factory = client_factory
+        self.audience = audience
+        self.jwks_refresh_seconds = jwks_refresh_seconds
+
+        self._jwks: Dict[str, dict] = {}
+        self._jwks_fetched_at = 0.0
+        self._jwks_lock = threading.Lock()
+
+    @property
+    def jwks_url(self) -> str:
+        return f"{self.supabase_url}/auth/v1/.well-known/jwks.json"
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        if self.mode == "local":
+            try:
+                return self.verify_local(token)
+            except UnknownSigningKey:
+                pass
+        return self.verify_remote(token)
+
+    def verify_local(self, token: str) -> Dict[str, Any]:
+        """Checks signature, expiry and audience without leaving the process."""
+        header = jwt.get_unverified_header(token)
+        alg = header.get("alg")
+
+        if alg == "HS256":
+            if not self.jwt_secret:
+                raise UnknownSigningKey("No JWT secret configured for HS256 tokens")
+            key = self.jwt_secret
+        elif alg in ASYMMETRIC_ALGORITHMS:
+            key = self._get_signing_key(header.get("kid"))
+        else:
+            raise UnknownSigningKey(f"Token algorithm {alg} cannot be verified locally")
+
+        claims = jwt.decode(token, key, algorithms=[alg], audience=self.audience)
+        if not claims.get("email"):
+            raise JWTError("Token has no email claim")
+        claims.setdefault("user_metadata", {})
+        return claims
+
+    def verify_remote(self, token: str) -> Dict[str, Any]:
+        """Asks Supabase to validate the token (network round trip)."""
+        client = self.client_factory() if self.client_factory else None
+        if not client:
+            raise JWTError("Supabase client is not configured")
+
+        user_response = client.auth.get_user(token)
+        if not user_response or not user_response.user:
+            raise JWTError("Supabase rejected the token")
+
+        sb_user = user_response.user
+        return {
+            "sub": sb_user.id,
+            "email": sb_user.email,
+            "user_metadata": sb_user.user_metadata or {},
+        }
+
+    # --- JWKS cache ---
+
+    def _get_signing_key(self, kid: Optional[str]) -> dict:
+        if not kid:
+            raise UnknownSigningKey("Token header has no kid")
+
+        now = time.monotonic()
+        if now - self._jwks_fetched_at > self.jwks_refresh_seconds:
+            self._refresh_jwks(now)
+
+        key = self._jwks.get(kid)
+        if key is None and now - self._jwks_fetched_at > JWKS_MIN_REFETCH_SECONDS:
+            # Key rotation: the project may have published a new key since our last fetch
+            self._refresh_jwks(now)
+            key = self._jwks.get(kid)
+
+        if key is None:
+            raise UnknownSigningKey(f"Unknown signing key: {kid}")
+        return key
+
+    def _refresh_jwks(self, now: float):
+        with self._jwks_lock:
+            # Another thread may have refreshed while we were waiting
+            if self._jwks_fetched_at >= now:
+                return
+            try:
+                keys = self._fetch_jwks()
+                self._jwks = {k["kid"]: k for k in keys if k.get("kid")}
+            except Exception as e:
+                print(f"JWKS fetch failed: {e}")
+            # Also set on failure, so an outage does not turn into one fetch per request
+            self._jwks_fetched_at = time.monotonic()
+
+    def _fetch_jwks(self) -> list:
+        with urllib.request.urlopen(self.jwks_url, timeout=5) as response:
+            return json.load(response).get("keys", [])
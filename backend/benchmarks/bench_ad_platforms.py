@@ -0,0 +1,89 @@
+"""
+Multi-platform campaign fetch: CompositeAdConnector against one platform
+after the other.
+
+Meta runs against the local stand-in Graph API (benchmarks/fake_graph.py);
+the other platforms are simulated connectors with a fixed response time,
+one of them slower than its timeout. Reports the end-to-end time of:
+- sequential: get_campaigns of every platform in turn (no timeouts)
+- composite: all platforms at once, each with its own timeout
+and the status per platform (the slow one is reported, not waited for).
+
+Usage (from backend/):
+    python benchmarks/bench_ad_platforms.py [meta_campaigns] [latency_ms]
+"""
+import sys
+import os
+import time
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_graph import FakeGraphServer, make_campaigns
+from antigravity_ads.connectors.ad_connector import AdPlatformConnector
+from antigravity_ads.connectors.composite_connector import CompositeAdConnector, OK, TIMEOUT
+from antigravity_ads.connectors.meta_connector import MetaAdsConnector
+from antigravity_ads.connectors.meta_throttle import MetaThrottle
+
+# Simulated platforms: (response time, timeout) in seconds
+SIMULATED = {"google": (0.6, 2.0), "snap": (0.9, 2.0), "tiktok": (4.0, 1.5)}
+
+
+class SimulatedConnector(AdPlatformConnector):
+    def __init__(self, platform_name: str, seconds: float, campaigns: int = 200):
+        super().__init__(platform_name, {})
+        self.seconds = seconds
+        self._campaigns = {
+            f"{i}": {"name": f"{platform_name} campaign {i}", "daily_budget": 50.0, "status": "ACTIVE", "platform_id": f"{i}"}
+            for i in range(campaigns)
+        }
+
+    def get_campaigns(self):
+        time.sleep(self.seconds)
+        return self._campaigns
+
+
+def main():
+    n_meta = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    logging.disable(logging.CRITICAL)
+
+    server = FakeGraphServer(latency=latency).start()
+    server.add_account("act_1", make_campaigns(1, n_meta))
+    connectors = {
+        "meta": MetaAdsConnector(
+            {"ad_account_id": "act_1", "access_token": "t", "graph_api_url": server.url},
+            throttle=MetaThrottle(enabled=False),
+        ),
+        **{name: SimulatedConnector(name, seconds) for name, (seconds, _) in SIMULATED.items()},
+    }
+    timeouts = {"meta": 10.0, **{name: timeout for name, (_, timeout) in SIMULATED.items()}}
+    print(f"Platforms: meta ({n_meta} campaigns, {latency * 1000:.0f} ms per page), "
+          + ", ".join(f"{n} ({s:.1f} s, timeout {t:.1f} s)" for n, (s, t) in SIMULATED.items()) + "\n")
+
+    start = time.perf_counter()
+    total = 0
+    for name, connector in connectors.items():
+        platform_start = time.perf_counter()
+        total += len(connector.get_campaigns())
+        print(f"  {name:<8} {time.perf_counter() - platform_start:6.2f} s")
+    print(f"{'sequential':<12} total={time.perf_counter() - start:6.2f} s  campaigns={total}")
+
+    composite = CompositeAdConnector(connectors, timeouts=timeouts)
+    start = time.perf_counter()
+    campaigns, status = composite.fetch()
+    elapsed = time.perf_counter() - start
+    print(f"{'composite':<12} total={elapsed:6.2f} s  campaigns={len(campaigns)}")
+    for name, platform in status.items():
+        print(f"  {name:<8} {platform}")
+
+    assert status["tiktok"]["status"] == TIMEOUT
+    assert all(status[name]["status"] == OK for name in ("meta", "google", "snap"))
+    assert elapsed < max(timeouts["tiktok"], max(status[n]["seconds"] for n in ("meta", "google", "snap"))) + 0.3
+    # Same campaign ids on several platforms: kept apart, tagged by platform
+    assert campaigns["0"]["platform"] == "google" and campaigns["snap:0"]["platform"] == "snap"
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Admin endpoints on a large tenant base: 10k organizations, 50k users.
+
+Times the query functions behind /api/admin/stats and /api/admin/organizations
+(first page, a page deep in the keyset, full walk) and the previous
+implementations (load every org, touch org.users, sum plans in Python), then
+prints the query plans of the foreign-key lookups to show the indexes in use.
+
+Usage (from backend/):
+    python benchmarks/bench_admin.py [orgs] [users]
+Uses DATABASE_URL if set (tables must be empty), a temporary SQLite file otherwise.
+"""
+import sys
+import os
+import time
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.getenv("DATABASE_URL"):
+    # app.database creates database.db in the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench_admin_"))
+
+from sqlalchemy import insert, text
+from sqlmodel import Session, select
+from app.database import engine
+from app.migrate_db import migrate
+from app.models import User, Organization
+from app.main import compute_admin_stats, list_admin_organizations, PLAN_PRICES
+
+PLANS = list(PLAN_PRICES)
+
+
+def seed(n_orgs: int, n_users: int):
+    with Session(engine) as session:
+        session.execute(insert(Organization), [
+            {"id": i + 1, "name": f"Org {i}", "plan": PLANS[i % len(PLANS)]} for i in range(n_orgs)
+        ])
+        session.execute(insert(User), [
+            {
+                "email": f"user{i}@example.com",
+                "hashed_password": "-",
+                "organization_id": i % n_orgs + 1,
+                "role": "admin" if i < n_orgs else "user",
+                "is_active": True,
+                "is_superuser": False,
+            }
+            for i in range(n_users)
+        ])
+        session.commit()
+
+
+def legacy_stats(session: Session) -> dict:
+    from sqlmodel import func
+    org_count = session.exec(select(func.count(Organization.id))).one()
+    user_count = session.exec(select(func.count(User.id)).where(User.is_active == True)).one()
+    orgs = session.exec(select(Organization)).all()
+    mrr = sum(PLAN_PRICES.get(org.plan, 0) for org in orgs)
+    return {"total_organizations": org_count, "active_users": user_count, "mrr": mrr}
+
+
+def legacy_organizations(session: Session) -> list:
+    result = []
+    for org in session.exec(select(Organization)).all():
+        admin_user = next((u for u in org.users if u.is_superuser or u.role == "admin"), None)
+        if not admin_user and org.users:
+            admin_user = org.users[0]
+        result.append({"id": org.id, "admin_email": admin_user.email if admin_user else None, "user_count": len(org.users)})
+    return result
+
+
+def walk_all_pages(session: Session, limit: int = 100) -> int:
+    total, after_id = 0, 0
+    while True:
+        page = list_admin_organizations(session, after_id, limit)
+        total += len(page)
+        if len(page) < limit:
+            return total
+        after_id = page[-1]["id"]
+
+
+def timed(label: str, fn, *args):
+    with Session(engine) as session:
+        start = time.perf_counter()
+        result = fn(session, *args)
+        elapsed = time.perf_counter() - start
+    print(f"{label:<42} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+PLANNED_QUERIES = [
+    'SELECT organization_id, email FROM "user" WHERE organization_id IN (1, 2, 3) ORDER BY organization_id, id',
+    "SELECT * FROM integration WHERE organization_id = 1",
+    "SELECT * FROM integration WHERE provider = 'meta'",
+]
+
+
+def explain():
+    prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+    with engine.connect() as connection:
+        for query in PLANNED_QUERIES:
+            print(f"\n{query}")
+            for row in connection.execute(text(f"{prefix} {query}")):
+                print(f"  {row[-1]}")
+
+
+def main():
+    n_orgs = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_users = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+
+    migrate()
+    start = time.perf_counter()
+    seed(n_orgs, n_users)
+    print(f"Seeded {n_orgs} orgs / {n_users} users in {time.perf_counter() - start:.1f}s\n")
+
+    new = timed("stats (GROUP BY plan)", compute_admin_stats)
+    old = timed("stats (legacy, all orgs in Python)", legacy_stats)
+    assert new == old, (new, old)
+
+    timed("organizations, first page (100)", list_admin_organizations, 0, 100)
+    timed("organizations, deep page (after 90% of ids)", list_admin_organizations, n_orgs * 9 // 10, 100)
+    count = timed("organizations, all pages (100/page)", walk_all_pages)
+    assert count == n_orgs
+    timed("organizations (legacy, N+1, unpaginated)", legacy_organizations)
+    explain()
+
+
+if __name__ == "__main__":
+    main()
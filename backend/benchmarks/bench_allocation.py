@@ -0,0 +1,64 @@
+"""
+Global lead cap allocation (antigravity_ads.engine.allocation) against the
+uniform scaling /api/campaigns used to apply, from 1k to 1M campaigns.
+
+Campaigns get random budgets, CVR ratios, costs per lead and min/max
+budgets; the cap is half the leads they want. Reports, per size:
+- time of allocate_budgets (sort + fill) and of the uniform scaling
+- leads of the result (must fit the cap) and the CVR-weighted leads
+  (sum of CVR ratio x leads), the quantity the allocation maximizes
+and checks the min/max budgets and the cap are respected.
+
+Usage (from backend/):
+    python benchmarks/bench_allocation.py [max_campaigns] [cap_fraction]
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from antigravity_ads.engine.allocation import allocate_budgets
+
+
+def main():
+    max_campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    cap_fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    rng = np.random.default_rng(7)
+
+    print(f"{'campaigns':>10} {'allocate':>10} {'uniform':>10} {'cap':>12} {'leads':>12} "
+          f"{'value, allocate':>16} {'value, uniform':>15}")
+    n = 1_000
+    while n <= max_campaigns:
+        desired = rng.uniform(20, 500, n).round(2)
+        score = rng.lognormal(0, 0.4, n)
+        cost_per_lead = rng.uniform(10, 40, n)
+        min_budget = (desired * rng.uniform(0.1, 0.3, n)).round(2)
+        max_budget = (desired * rng.uniform(0.9, 1.2, n)).round(2)
+        wanted = np.clip(desired, min_budget, max_budget)
+        cap = cap_fraction * float((wanted / cost_per_lead).sum())
+
+        start = time.perf_counter()
+        result = allocate_budgets(desired, cap, score, cost_per_lead, min_budget, max_budget)
+        allocate_s = time.perf_counter() - start
+
+        # Before: every campaign scaled by the same factor (bounds ignored)
+        start = time.perf_counter()
+        uniform = desired * min(1.0, cap / float((desired / cost_per_lead).sum()))
+        uniform_s = time.perf_counter() - start
+
+        budgets = result["budgets"]
+        leads = budgets / cost_per_lead
+        assert result["capped"] and result["feasible"]
+        assert leads.sum() <= cap * (1 + 1e-9)
+        assert np.all(budgets >= min_budget - 1e-9) and np.all(budgets <= max_budget + 1e-9)
+
+        print(f"{n:>10} {allocate_s * 1000:>8.1f}ms {uniform_s * 1000:>8.2f}ms {cap:>12.0f} {leads.sum():>12.0f} "
+              f"{float(score @ leads):>16.0f} {float(score @ (uniform / cost_per_lead)):>15.0f}")
+        n *= 10
+
+
+if __name__ == "__main__":
+    main()
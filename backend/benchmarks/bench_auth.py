@@ -0,0 +1,98 @@
+"""
+Auth overhead per request: local JWT verification vs supabase.auth.get_user.
+
+A stand-in Supabase Auth server runs on localhost, so the "remote" numbers are
+a lower bound (loopback RTT, no TLS). Real deployments pay the full Supabase RTT.
+
+Usage (from backend/):
+    python benchmarks/bench_auth.py [iterations]
+"""
+import sys
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt
+from supabase import create_client
+from app.token_verifier import SupabaseTokenVerifier
+
+JWT_SECRET = "bench-secret-bench-secret-bench-secret"
+
+
+class FakeSupabaseAuth(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if not self.path.startswith("/auth/v1/user"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        token = self.headers.get("Authorization", "").replace("Bearer ", "")
+        claims = jwt.decode(token, JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+        body = json.dumps({
+            "id": claims["sub"],
+            "aud": "authenticated",
+            "email": claims["email"],
+            "app_metadata": {},
+            "user_metadata": claims["user_metadata"],
+            "created_at": "2024-01-01T00:00:00Z",
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_token() -> str:
+    now = datetime.now(timezone.utc)
+    return jwt.encode({
+        "sub": "00000000-0000-0000-0000-000000000001",
+        "email": "bench@example.com",
+        "aud": "authenticated",
+        "role": "authenticated",
+        "iat": int(now.timestamp()),
+        "exp": int((now + timedelta(hours=1)).timestamp()),
+        "user_metadata": {"company_name": "Bench Co", "full_name": "Bench User"},
+    }, JWT_SECRET, algorithm="HS256")
+
+
+def run(verifier: SupabaseTokenVerifier, token: str, iterations: int) -> float:
+    verifier.verify(token)  # warm-up (connection setup)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        verifier.verify(token)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSupabaseAuth)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    client = create_client(url, make_token())
+    token = make_token()
+
+    remote = SupabaseTokenVerifier(url, mode="remote", client_factory=lambda: client)
+    local = SupabaseTokenVerifier(url, jwt_secret=JWT_SECRET, mode="local", client_factory=lambda: client)
+
+    remote_s = run(remote, token, iterations)
+    local_s = run(local, token, iterations)
+    server.shutdown()
+
+    print(f"Iterations: {iterations}")
+    print(f"remote (get_user, loopback): {remote_s * 1e6:10.1f} us/request")
+    print(f"local  (in-process JWT)    : {local_s * 1e6:10.1f} us/request")
+    print(f"speedup                    : {remote_s / local_s:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+BudgetOptimizer: calculate_adjustment in a loop against the vectorized
+calculate_adjustments, from 1k to 1M campaigns.
+
+Reports, per size:
+- scalar: one calculate_adjustment call per campaign (what /api/campaigns did)
+- batch: calculate_adjustments on NumPy arrays, without reason strings
+- batch+reasons: the same, with the reason strings
+- DataFrame: calculate_adjustments on a pandas DataFrame
+and checks that every multiplier, action and reason matches the scalar path.
+
+Usage (from backend/):
+    python benchmarks/bench_budget_optimizer.py [max_campaigns] [global_constraint]
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from antigravity_ads.engine.rules import BudgetOptimizer, action_names
+
+RULES = {"increase_threshold": 1.10, "decrease_threshold": 0.90, "increase_percentage": 0.15, "decrease_percentage": 0.10}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    max_campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    constraint = float(sys.argv[2]) if len(sys.argv) > 2 else 0.85
+    optimizer = BudgetOptimizer({"budget_rules": RULES})
+    rng = np.random.default_rng(42)
+
+    print(f"{'campaigns':>10} {'scalar':>10} {'batch':>10} {'+reasons':>10} {'DataFrame':>10} {'speedup':>8}")
+    n = 1_000
+    while n <= max_campaigns:
+        objective = rng.uniform(0, 20_000, n).round(2)
+        objective[::50] = 0  # no objective set
+        actual = (objective * rng.uniform(0.5, 1.5, n)).round(2)
+        actual_list, objective_list = actual.tolist(), objective.tolist()
+        frame = pd.DataFrame({"actual": actual, "objective": objective})
+
+        scalar, scalar_s = timed(lambda: [
+            optimizer.calculate_adjustment({"actual": a, "objective": o}, constraint)
+            for a, o in zip(actual_list, objective_list)
+        ])
+        _, batch_s = timed(lambda: optimizer.calculate_adjustments(actual, objective, constraint))
+        batch, reasons_s = timed(lambda: optimizer.calculate_adjustments(actual, objective, constraint, with_reasons=True))
+        _, frame_s = timed(lambda: optimizer.calculate_adjustments(frame, global_constraint=constraint))
+
+        assert [d["multiplier"] for d in scalar] == batch["multiplier"].tolist()
+        assert [d["action"] for d in scalar] == action_names(batch["action"]).tolist()
+        assert [d["reason"] for d in scalar] == batch["reason"]
+
+        print(f"{n:>10} {scalar_s * 1000:>8.1f}ms {batch_s * 1000:>8.1f}ms {reasons_s * 1000:>8.1f}ms "
+              f"{frame_s * 1000:>8.1f}ms {scalar_s / batch_s:>7.0f}x")
+        n *= 10
+
+
+if __name__ == "__main__":
+    main()
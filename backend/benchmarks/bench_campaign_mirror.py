@@ -0,0 +1,135 @@
+"""
+Campaign mirror against the local stand-in Graph API (benchmarks/fake_graph.py).
+
+- full sync: Graph requests and time to load every active campaign
+- read latency: /api/campaigns data from the mirror vs listing the
+  campaigns from the Graph API (what every request used to do)
+- incremental sync after a few campaigns are paused, deleted or get a new
+  budget: requests, time, and the changes visible in the next read
+- full reconciliation: campaigns that vanished without an update are dropped
+- sync lag reported with the data
+
+Uses DATABASE_URL when set (e.g. the docker-compose Postgres), a temporary
+SQLite file otherwise.
+
+Usage (from backend/):
+    python benchmarks/bench_campaign_mirror.py [campaigns] [changed] [latency_ms]
+"""
+import sys
+import os
+import time
+import tempfile
+import logging
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+if not os.getenv("DATABASE_URL"):
+    os.chdir(tempfile.mkdtemp(prefix="bench_campaign_mirror_"))  # SQLite database.db goes here
+
+from sqlmodel import Session
+
+from benchmarks.fake_graph import FakeGraphServer, make_campaigns
+from antigravity_ads.connectors.meta_connector import MetaAdsConnector
+from antigravity_ads.connectors.meta_throttle import MetaThrottle
+from app.database import engine
+from app.migrate_db import migrate
+from app.models import Organization
+from app.campaign_mirror import CampaignMirror
+
+READS = 20
+
+
+def main():
+    n_campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_changed = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.05
+    logging.disable(logging.WARNING)
+
+    migrate()
+    with Session(engine) as session:
+        org = Organization(name="Mirror bench")
+        session.add(org)
+        session.commit()
+        org_id = org.id
+
+    server = FakeGraphServer(latency=latency).start()
+    half = n_campaigns // 2
+    server.add_account("act_1", make_campaigns(1, half, paused_every=10))
+    server.add_account("act_2", make_campaigns(2, n_campaigns - half, paused_every=10))
+    active = sum(1 for c in server.campaigns.values() if c["effective_status"] == "ACTIVE")
+    meta_config = {"enabled": True, "ad_account_id": "act_1,act_2", "access_token": "t", "graph_api_url": server.url}
+    config = {"ad_platforms": {"meta": meta_config}}
+    throttle = MetaThrottle(enabled=False)
+    mirror = CampaignMirror(
+        load_targets=lambda: [(org_id, config)],
+        enabled_platforms=lambda c: dict(c["ad_platforms"]),
+        build_connector=lambda platform, platform_config: MetaAdsConnector(platform_config, throttle=throttle),
+        enabled=True,
+    )
+    print(f"{n_campaigns} campaigns ({active} active) in 2 ad accounts, Graph latency: {latency * 1000:.0f} ms\n")
+
+    def pages():
+        return len(server.page_sizes)
+
+    # Full sync (the first read of a cold organization)
+    server.reset_counts()
+    start = time.perf_counter()
+    payload = mirror.read(org_id, config)
+    print(f"{'full sync':<18} {time.perf_counter() - start:6.2f} s  graph requests={pages():4d}  "
+          f"campaigns={len(payload['campaigns'])}")
+    assert len(payload["campaigns"]) == active
+
+    # Read latency
+    live, mirrored = [], []
+    for _ in range(3):
+        start = time.perf_counter()
+        MetaAdsConnector(meta_config, throttle=throttle).get_campaigns()
+        live.append(time.perf_counter() - start)
+    for _ in range(READS):
+        start = time.perf_counter()
+        payload = mirror.read(org_id, config)
+        mirrored.append(time.perf_counter() - start)
+    print(f"{'read, live Graph':<18} p50={statistics.median(live) * 1000:8.1f} ms")
+    print(f"{'read, mirror':<18} p50={statistics.median(mirrored) * 1000:8.1f} ms  "
+          f"({statistics.median(live) / statistics.median(mirrored):.0f}x)")
+
+    # Incremental sync: pauses, deletions and budget changes
+    ids = [c["id"] for c in server.campaigns.values() if c["effective_status"] == "ACTIVE"][:n_changed]
+    paused, deleted, rebudgeted = ids[0::3], ids[1::3], ids[2::3]
+    for campaign_id in paused:
+        server.set_campaign(campaign_id, status="PAUSED", effective_status="PAUSED")
+    for campaign_id in deleted:
+        server.delete_campaign(campaign_id)
+    for campaign_id in rebudgeted:
+        server.set_campaign(campaign_id, daily_budget="123400")
+    server.reset_counts()
+    result = mirror.sync_platform(org_id, "meta", meta_config)
+    payload = mirror.read(org_id, config)
+    print(f"{'incremental sync':<18} {result['seconds']:6.2f} s  graph requests={pages():4d}  "
+          f"upserted={result['upserted']} removed={result['removed']}")
+    assert not result["full"]
+    assert not any(c in payload["campaigns"] for c in paused + deleted)
+    assert all(payload["campaigns"][c]["daily_budget"] == 1234.0 for c in rebudgeted)
+    assert len(payload["campaigns"]) == active - len(paused) - len(deleted)
+
+    # Full reconciliation: campaigns gone without a trace on the changes listing
+    vanished = [c["id"] for c in server.accounts["act_1"][-20:] if c["effective_status"] == "ACTIVE"]
+    server.accounts["act_1"] = server.accounts["act_1"][:-20]
+    server._filtered.clear()
+    server.reset_counts()
+    result = mirror.sync_platform(org_id, "meta", meta_config, full=True)
+    payload = mirror.read(org_id, config)
+    print(f"{'full reconcile':<18} {result['seconds']:6.2f} s  graph requests={pages():4d}  "
+          f"removed={result['removed']}")
+    assert result["removed"] == len(vanished) and not any(c in payload["campaigns"] for c in vanished)
+
+    print(f"\nplatform status: {payload['platforms']['meta']}")
+    stats = mirror.stats()
+    print(f"stats: syncs={stats['syncs']} (full={stats['full_syncs']}, incremental={stats['incremental_syncs']}) "
+          f"rows={stats['mirrored_campaigns']} sync lag max={stats['sync_lag_seconds']['max']} s")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
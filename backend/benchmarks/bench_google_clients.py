@@ -0,0 +1,108 @@
+"""
+Per-request cost of building Google API clients, against the local stand-in
+OAuth/Sheets server.
+
+Simulates N API requests from different tenants (a new connector each, as
+get_connectors does) and compares:
+- legacy: key file parsed, discovery document built and an OAuth token
+  fetched by every new connector
+- registry: credentials, token and per-thread service shared process-wide
+  (google_clients)
+reporting construction time per request, token fetches and end-to-end time.
+
+Usage (from backend/):
+    python benchmarks/bench_google_clients.py [requests] [token_latency_ms]
+"""
+import sys
+import os
+import time
+import tempfile
+import logging
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+
+from benchmarks.fake_google import FakeGoogleServer, template_tabs, write_service_account
+from antigravity_ads.connectors.google_clients import google_clients
+from antigravity_ads.connectors.google_sheet_connector import GoogleSheetConnector, SCOPES
+
+
+def legacy_service(sa_path: str, api_url: str):
+    # What _get_service + the first request did for every new connector
+    creds = Credentials.from_service_account_file(sa_path, scopes=SCOPES)
+    service = build('sheets', 'v4', credentials=creds, client_options={"api_endpoint": api_url})
+    creds.refresh(Request())
+    return service
+
+
+def main():
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    logging.disable(logging.INFO)
+
+    server = FakeGoogleServer(latency=0.0).start()
+    n_tenants = 20
+    for i in range(n_tenants):
+        server.spreadsheets[f"sheet-{i}"] = template_tabs(campaigns=5)
+
+    # Only the token endpoint is slowed down: it is the cost the registry removes
+    original_count = server.count
+
+    def count_with_latency(kind):
+        if kind == "token":
+            time.sleep(latency)
+        original_count(kind)
+    server.count = count_with_latency
+
+    sa_path = os.path.join(tempfile.mkdtemp(prefix="bench_clients_"), "service_account.json")
+    write_service_account(sa_path, server.url)
+
+    print(f"Requests: {n_requests} over {n_tenants} tenants, simulated token latency: {latency * 1000:.0f} ms\n")
+
+    def report(label, construct_times, total):
+        print(
+            f"{label:<10} construct p50={statistics.median(construct_times) * 1000:7.2f} ms  "
+            f"mean={statistics.mean(construct_times) * 1000:7.2f} ms  "
+            f"total={total:6.2f} s  token_fetches={server.requests['token']}"
+        )
+        server.reset_counts()
+
+    # Legacy: everything rebuilt per connector
+    times = []
+    start = time.perf_counter()
+    for r in range(n_requests):
+        connector = GoogleSheetConnector({"spreadsheet_id": f"sheet-{r % n_tenants}", "api_url": server.url,
+                                          "service_account_path": sa_path})
+        t0 = time.perf_counter()
+        service = legacy_service(sa_path, server.url)
+        times.append(time.perf_counter() - t0)
+        result = service.spreadsheets().values().batchGet(
+            spreadsheetId=connector.spreadsheet_id, ranges=["Feuille 1!A1:Z10", "Ressources Sales!A1:C10"]
+        ).execute()
+        connector.parse_value_ranges([vr.get('values', []) for vr in result['valueRanges']])
+    report("legacy", times, time.perf_counter() - start)
+
+    # Registry: same work through the connector
+    times = []
+    start = time.perf_counter()
+    results = []
+    for r in range(n_requests):
+        connector = GoogleSheetConnector({"spreadsheet_id": f"sheet-{r % n_tenants}", "api_url": server.url,
+                                          "service_account_path": sa_path})
+        t0 = time.perf_counter()
+        connector._get_service()
+        times.append(time.perf_counter() - t0)
+        results.append(connector.get_performance_data())
+    report("registry", times, time.perf_counter() - start)
+
+    assert all(len(r["campaigns"]) == 5 for r in results)
+    print(f"\nregistry stats: {google_clients.stats()}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Throughput of the optimization job queue (app.job_queue) itself: the jobs
+do nothing, so this measures submit / claim / complete round trips.
+
+Reports:
+- submit rate (one job per call, as POST /api/optimize does), and the
+  cost of resubmitting with an already used idempotency key
+- per worker thread count: jobs/s drained by workers claiming and
+  completing concurrently, claim latency p50 / p99, and that no job ran
+  twice (the SKIP LOCKED / single-UPDATE claim guarantee)
+- a job failing twice then succeeding: attempts and final status
+
+Uses DATABASE_URL when set (e.g. the docker-compose Postgres), a temporary
+SQLite file otherwise.
+
+Usage (from backend/):
+    python benchmarks/bench_job_queue.py [jobs] [max_workers]
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+if not os.getenv("DATABASE_URL"):
+    os.chdir(tempfile.mkdtemp(prefix="bench_job_queue_"))  # SQLite database.db goes here
+
+from sqlmodel import Session, delete
+
+from app.database import engine
+from app.migrate_db import migrate
+from app.models import Organization, OptimizationJob
+from app.job_queue import OptimizationJobQueue, SUCCEEDED
+
+
+def drain(queue: OptimizationJobQueue, n_workers: int):
+    """Workers claim and complete jobs until the queue is empty: (seconds, claim latencies, job ids run)."""
+    latencies, ran = [], []
+    lock = threading.Lock()
+
+    def work(worker_id: str):
+        while True:
+            start = time.perf_counter()
+            jobs = queue.claim(worker_id)
+            elapsed = time.perf_counter() - start
+            if not jobs:
+                return
+            queue.complete(jobs[0], worker_id, {"ok": True})
+            with lock:
+                latencies.append(elapsed)
+                ran.append(jobs[0].id)
+
+    threads = [threading.Thread(target=work, args=(f"bench:{i}",)) for i in range(n_workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, ran
+
+
+def main():
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    migrate()
+    with Session(engine) as session:
+        org = Organization(name="Job queue bench")
+        session.add(org)
+        session.commit()
+        org_id = org.id
+    queue = OptimizationJobQueue(retry_seconds=0)
+
+    start = time.perf_counter()
+    for i in range(n_jobs):
+        queue.submit(org_id, idempotency_key=f"submit-{i}")
+    submit_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(min(n_jobs, 500)):
+        queue.submit(org_id, idempotency_key=f"submit-{i}")
+    resubmit_s = (time.perf_counter() - start) / min(n_jobs, 500)
+    print(f"submit: {n_jobs / submit_s:.0f} jobs/s, resubmit (same key): {resubmit_s * 1000:.2f} ms\n")
+
+    print(f"{'workers':>7} {'jobs':>6} {'total':>8} {'jobs/s':>8} {'claim p50':>10} {'claim p99':>10} {'ran twice':>10}")
+    workers = 1
+    first = True
+    while workers <= max_workers:
+        if not first:
+            with Session(engine) as session:
+                session.exec(delete(OptimizationJob))
+                session.commit()
+            for i in range(n_jobs):
+                queue.submit(org_id)
+        first = False
+        elapsed, latencies, ran = drain(queue, workers)
+        latencies.sort()
+        assert len(ran) == n_jobs
+        print(f"{workers:>7} {len(ran):>6} {elapsed:>7.2f}s {len(ran) / elapsed:>8.0f} "
+              f"{statistics.median(latencies) * 1000:>8.2f}ms {latencies[int(len(latencies) * 0.99)] * 1000:>8.2f}ms "
+              f"{len(ran) - len(set(ran)):>10}")
+        workers *= 2
+
+    # Retries: two failed attempts, then success
+    job = queue.submit(org_id, idempotency_key="flaky")
+    for attempt in range(3):
+        claimed = queue.claim("bench:retry")[0]
+        assert claimed.id == job.id and claimed.attempts == attempt + 1
+        if attempt < 2:
+            queue.fail(claimed, "bench:retry", "upstream down")
+        else:
+            queue.complete(claimed, "bench:retry", {"ok": True})
+    job = queue.get(job.id)
+    assert job.status == SUCCEEDED and job.attempts == 3
+    print(f"\nflaky job: {job.attempts} attempts, {job.status}")
+    print(queue.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Login throughput and event-loop lag, before/after moving bcrypt off the event loop.
+
+- "before": the previous /token handler (async def calling bcrypt inline),
+  mounted on the app under /token-legacy for the duration of the benchmark
+- "after": the current /token handler (bcrypt awaited on the bounded pool)
+
+Event-loop lag is measured by a ticker coroutine that sleeps 10 ms and records
+how late it wakes up while the logins are in flight. Keep the concurrency under
+the DB pool size: the legacy handler queries the DB from the loop thread and
+deadlocks once the pool is exhausted.
+
+Usage (from backend/):
+    python benchmarks/bench_login.py [concurrent_logins] [rounds]
+"""
+import sys
+import os
+import time
+import asyncio
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.pop("DATABASE_URL", None)
+# app.database creates database.db in the working directory
+os.chdir(tempfile.mkdtemp(prefix="bench_login_"))
+
+import httpx
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlmodel import Session, select
+from app.main import app
+from app.database import get_session, engine
+from app.migrate_db import migrate
+from app.models import User
+from app.auth import verify_password, get_password_hash, BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+TICK = 0.01
+
+
+@app.post("/token-legacy")
+async def legacy_login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
+    user = session.exec(select(User).where(User.email == form_data.username)).first()
+    if not user or not verify_password(form_data.password, user.hashed_password):
+        raise HTTPException(status_code=401)
+    return {"access_token": "-", "token_type": "bearer"}
+
+
+async def lag_monitor(stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        samples.append(time.perf_counter() - start - TICK)
+
+
+async def run_logins(path: str, n: int, rounds: int):
+    stop = asyncio.Event()
+    lags = []
+    monitor = asyncio.create_task(lag_monitor(stop, lags))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            responses = await asyncio.gather(*[
+                client.post(path, data={"username": "bench@example.com", "password": "bench-password"})
+                for _ in range(n)
+            ])
+            assert all(r.status_code == 200 for r in responses), [r.status_code for r in responses]
+        elapsed = time.perf_counter() - start
+
+    stop.set()
+    await monitor
+    lags.sort()
+    p99 = lags[max(int(len(lags) * 0.99) - 1, 0)] if lags else 0.0
+    return n * rounds / elapsed, max(lags, default=0.0), p99
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    migrate()
+    with Session(engine) as session:
+        session.add(User(email="bench@example.com", hashed_password=get_password_hash("bench-password")))
+        session.commit()
+
+    print(f"Concurrent logins: {n} x {rounds}, bcrypt cost: {BCRYPT_ROUNDS}, pool workers: {PASSWORD_HASH_WORKERS}")
+    for label, path in [("before (inline)", "/token-legacy"), ("after (pooled) ", "/token")]:
+        throughput, lag_max, lag_p99 = asyncio.run(run_logins(path, n, rounds))
+        print(f"{label}: {throughput:7.1f} logins/s | loop lag max {lag_max * 1000:7.1f} ms, p99 {lag_p99 * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
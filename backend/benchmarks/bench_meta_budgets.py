@@ -0,0 +1,106 @@
+"""
+Meta budget updates against the local stand-in Graph API (benchmarks/fake_graph.py).
+
+Applies an optimization run's budget changes to N campaigns:
+- legacy: one Campaign.api_update request per campaign, one after the other
+  (what the CLI loop over update_budget did)
+- batched: update_budgets, 50 operations per Graph batch request with up
+  to META_BATCH_CONCURRENCY requests in flight
+reporting the time and the Graph requests made, then checks the budgets
+on the server. Also checks per-campaign results (rejected budgets and
+unknown campaigns fail alone), the resend of operations a batch did not
+run, and that dry run sends nothing.
+
+Usage (from backend/):
+    python benchmarks/bench_meta_budgets.py [campaigns] [latency_ms]
+"""
+import sys
+import os
+import time
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from facebook_business.adobjects.campaign import Campaign
+
+from benchmarks.fake_graph import FakeGraphServer, make_campaigns
+from antigravity_ads.connectors.meta_connector import MetaAdsConnector, to_cents
+
+# Server time per operation in a batch
+OPERATION_LATENCY = 0.002
+
+
+def legacy_update(connector: MetaAdsConnector, changes: dict):
+    results = {}
+    for campaign_id, new_budget in changes.items():
+        try:
+            Campaign(campaign_id, api=connector.api).api_update(
+                params={Campaign.Field.daily_budget: to_cents(new_budget)}
+            )
+            results[campaign_id] = True
+        except Exception:
+            results[campaign_id] = False
+    return results
+
+
+def main():
+    n_campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    logging.disable(logging.WARNING)
+
+    server = FakeGraphServer(latency=latency, item_latency=OPERATION_LATENCY).start()
+    campaigns = make_campaigns(1, n_campaigns)
+    server.add_account("act_1", campaigns)
+    ids = [c["id"] for c in campaigns]
+
+    config = {"ad_account_id": "act_1", "access_token": "t", "graph_api_url": server.url, "dry_run": False}
+    connector = MetaAdsConnector(config)
+    print(f"Campaigns: {n_campaigns}, Graph latency: {latency * 1000:.0f} ms, "
+          f"batch concurrency: {connector.batch_concurrency}\n")
+
+    def check(changes):
+        for campaign_id, new_budget in changes.items():
+            assert server.campaigns[campaign_id]["daily_budget"] == str(to_cents(new_budget)), campaign_id
+
+    changes = {campaign_id: 12.5 + i % 40 for i, campaign_id in enumerate(ids)}
+    server.reset_counts()
+    start = time.perf_counter()
+    legacy = legacy_update(connector, changes)
+    elapsed = time.perf_counter() - start
+    assert all(legacy.values())
+    check(changes)
+    print(f"{'legacy (1 per request)':<24} total={elapsed:6.2f} s  requests={dict(server.requests)}")
+
+    changes = {campaign_id: 20.29 + i % 40 for i, campaign_id in enumerate(ids)}
+    server.reset_counts()
+    start = time.perf_counter()
+    results = connector.update_budgets(changes)
+    elapsed = time.perf_counter() - start
+    assert all(r["success"] for r in results.values()) and len(results) == len(changes)
+    check(changes)
+    print(f"{'update_budgets':<24} total={elapsed:6.2f} s  requests={dict(server.requests)}")
+
+    # A rejected budget and an unknown campaign fail alone
+    changes = {ids[0]: 0.5, "999999": 30.0, ids[1]: 31.0}
+    results = connector.update_budgets(changes)
+    assert not results[ids[0]]["success"] and not results["999999"]["success"] and results[ids[1]]["success"]
+    print(f"{'per-campaign errors':<24} {ids[0]}: {results[ids[0]]['error']!r}, 999999: {results['999999']['error'][:40]!r}...")
+
+    # Operations the batch did not run are sent again
+    server.unrun_every = 7
+    changes = {campaign_id: 44.0 for campaign_id in ids[:100]}
+    server.reset_counts()
+    results = connector.update_budgets(changes)
+    assert all(r["success"] for r in results.values())
+    check(changes)
+    print(f"{'unrun operations resent':<24} requests={dict(server.requests)}")
+
+    server.reset_counts()
+    dry = MetaAdsConnector({**config, "dry_run": True}).update_budgets({campaign_id: 1.0 for campaign_id in ids})
+    assert all(r["success"] and r["dry_run"] for r in dry.values()) and not server.requests
+    print(f"{'dry run':<24} {len(dry)} results, requests={dict(server.requests)}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Meta campaign fetch against the local stand-in Graph API (benchmarks/fake_graph.py).
+
+N campaigns spread over several ad accounts of one organization:
+- legacy: SDK cursor with `limit: 50` and SDK Campaign objects, one account
+  after the other (what get_campaigns did, when it handled one account)
+- stream, 1 account at a time: iter_campaigns with large pages and the
+  `fields` projection, no fan-out
+- stream: iter_campaigns fanning out across the accounts
+reporting the time to the first campaign, the total time and the Graph
+requests made. Also checks that every campaign arrives exactly once, that
+closing the stream early stops the fetch, and that a failing account raises
+instead of returning a truncated list.
+
+Usage (from backend/):
+    python benchmarks/bench_meta_campaigns.py [campaigns] [accounts] [latency_ms]
+"""
+import sys
+import os
+import time
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from facebook_business.adobjects.adaccount import AdAccount
+from facebook_business.adobjects.campaign import Campaign
+from facebook_business.exceptions import FacebookRequestError
+
+from benchmarks.fake_graph import FakeGraphServer, make_campaigns
+from antigravity_ads.connectors.meta_connector import MetaAdsConnector
+
+# Server time per campaign serialized (larger pages are not free)
+ITEM_LATENCY = 0.00002
+
+
+def legacy_fetch(connector: MetaAdsConnector):
+    fields = [Campaign.Field.name, Campaign.Field.id, Campaign.Field.daily_budget,
+              Campaign.Field.status, Campaign.Field.objective]
+    for account_id in connector.ad_account_ids:
+        account = AdAccount(account_id, api=connector.api)
+        for cmp in account.get_campaigns(fields=fields, params={"effective_status": ["ACTIVE"], "limit": 50}):
+            yield {
+                "name": cmp[Campaign.Field.name],
+                "daily_budget": int(cmp.get(Campaign.Field.daily_budget, 0)) / 100.0,
+                "status": cmp[Campaign.Field.status],
+                "platform_id": cmp[Campaign.Field.id],
+            }
+
+
+def run(label, server, campaigns, expected):
+    server.reset_counts()
+    start = time.perf_counter()
+    first = None
+    seen = set()
+    for campaign in campaigns:
+        if first is None:
+            first = time.perf_counter() - start
+        seen.add(campaign["platform_id"])
+    total = time.perf_counter() - start
+    assert len(seen) == expected, (len(seen), expected)
+    print(f"{label:<22} first={first * 1000:7.1f} ms  total={total:6.2f} s  "
+          f"requests={server.requests['campaigns']:5d}  campaigns={len(seen)}")
+
+
+def main():
+    n_campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_accounts = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.02
+    logging.disable(logging.WARNING)
+
+    server = FakeGraphServer(latency=latency, item_latency=ITEM_LATENCY).start()
+    accounts = [f"act_{i + 1}" for i in range(n_accounts)]
+    per_account = n_campaigns // n_accounts
+    for i, account_id in enumerate(accounts):
+        # A few paused campaigns, filtered out by effective_status
+        server.add_account(account_id, make_campaigns(i + 1, per_account + per_account // 100, paused_every=101))
+    expected = sum(c["effective_status"] == "ACTIVE" for a in accounts for c in server.accounts[a])
+
+    config = {"ad_account_id": ",".join(accounts), "access_token": "t", "graph_api_url": server.url}
+    connector = MetaAdsConnector(config)
+    sequential = MetaAdsConnector({**config, "account_concurrency": 1})
+    print(f"Campaigns: {expected} active over {n_accounts} accounts, Graph latency: {latency * 1000:.0f} ms, "
+          f"page size: {connector.page_size}\n")
+
+    run("legacy (limit 50)", server, legacy_fetch(connector), expected)
+    run("stream, no fan-out", server, sequential.iter_campaigns(), expected)
+    run(f"stream, {connector.account_concurrency} accounts", server, connector.iter_campaigns(), expected)
+
+    server.reset_counts()
+    start = time.perf_counter()
+    assert len(connector.get_campaigns()) == expected
+    print(f"{'get_campaigns':<22} total={time.perf_counter() - start:6.2f} s")
+
+    # Consumer stops after the first page: the other accounts stop too
+    server.reset_counts()
+    stream = connector.iter_campaigns()
+    for _ in range(connector.page_size):
+        next(stream)
+    stream.close()
+    time.sleep(latency * 3)
+    print(f"{'closed after 1 page':<22} requests={server.requests['campaigns']}")
+    assert server.requests["campaigns"] <= 4 * connector.account_concurrency
+
+    server.failing_accounts.add(accounts[-1])
+    try:
+        connector.get_campaigns()
+        raise AssertionError("a failing account must not look like a complete result")
+    except FacebookRequestError as e:
+        print(f"{'failing account':<22} raised {type(e).__name__}: {e.api_error_message()}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
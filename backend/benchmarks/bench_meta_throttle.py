@@ -0,0 +1,100 @@
+"""
+Meta throttling against the local stand-in Graph API with per-account limits
+(benchmarks/fake_graph.py, `account_limit` calls per `usage_window`).
+
+One heavy tenant (many ad accounts, many campaign pages) and several light
+tenants fetch their campaigns at the same time:
+- unthrottled: every call goes straight out; accounts over the limit get
+  throttling errors (which used to become empty campaign lists)
+- throttled, FIFO: MetaThrottle with every tenant in one queue
+- throttled, fair: MetaThrottle admitting calls round-robin across tenants
+reporting failed tenants, throttling errors received, the light tenants'
+completion time and the heavy tenant's.
+
+Usage (from backend/):
+    python benchmarks/bench_meta_throttle.py [light_tenants] [heavy_accounts] [latency_ms]
+"""
+import sys
+import os
+import time
+import logging
+import statistics
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_graph import FakeGraphServer, make_campaigns
+from antigravity_ads.connectors.meta_connector import MetaAdsConnector
+from antigravity_ads.connectors.meta_throttle import MetaThrottle
+
+PAGE_SIZE = 500
+HEAVY_CAMPAIGNS_PER_ACCOUNT = 6_000
+LIGHT_CAMPAIGNS = 2_000
+# Calls per ad account per window, on the fake server
+ACCOUNT_LIMIT = 8
+USAGE_WINDOW = 4.0
+
+
+def main():
+    n_light = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    heavy_accounts = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.05
+    logging.disable(logging.CRITICAL)
+
+    server = FakeGraphServer(latency=latency).start()
+    server.account_limit = ACCOUNT_LIMIT
+    server.usage_window = USAGE_WINDOW
+
+    tenants = {}
+    heavy = [f"act_{100 + i}" for i in range(heavy_accounts)]
+    for i, account_id in enumerate(heavy):
+        server.add_account(account_id, make_campaigns(100 + i, HEAVY_CAMPAIGNS_PER_ACCOUNT))
+    tenants["heavy"] = {"ad_account_id": ",".join(heavy), "access_token": "heavy-token",
+                        "account_concurrency": heavy_accounts}
+    for i in range(n_light):
+        server.add_account(f"act_{i + 1}", make_campaigns(i + 1, LIGHT_CAMPAIGNS))
+        tenants[f"light-{i}"] = {"ad_account_id": f"act_{i + 1}", "access_token": f"light-token-{i}"}
+
+    print(f"Tenants: 1 heavy ({heavy_accounts} accounts x {HEAVY_CAMPAIGNS_PER_ACCOUNT // PAGE_SIZE} pages), "
+          f"{n_light} light ({LIGHT_CAMPAIGNS // PAGE_SIZE} pages), Graph latency: {latency * 1000:.0f} ms, "
+          f"limit: {ACCOUNT_LIMIT} calls / {USAGE_WINDOW:.0f} s per account\n")
+
+    def run(label, throttle, fifo=False):
+        server.reset_counts()
+        server._calls.clear()
+        finished, failed = {}, []
+        start = time.perf_counter()
+
+        def fetch(name, config):
+            config = {**config, "graph_api_url": server.url, "page_size": PAGE_SIZE}
+            if fifo:
+                config["tenant"] = "everyone"
+            try:
+                MetaAdsConnector(config, throttle=throttle).get_campaigns()
+            except Exception:
+                failed.append(name)
+            finished[name] = time.perf_counter() - start
+
+        threads = [threading.Thread(target=fetch, args=item) for item in tenants.items()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        light = [v for k, v in finished.items() if k != "heavy"]
+        print(f"{label:<18} failed tenants={len(failed):2d}  throttle errors={server.requests['throttled']:3d}  "
+              f"light p50={statistics.median(light):6.2f} s max={max(light):6.2f} s  heavy={finished['heavy']:6.2f} s")
+        return throttle
+
+    run("unthrottled", MetaThrottle(enabled=False))
+    # Few call slots, so that tenants compete for them
+    settings = dict(account_calls_per_minute=240, max_concurrent_calls=3, backoff_base=0.5, backoff_max=5)
+    run("throttled, FIFO", MetaThrottle(**settings), fifo=True)
+    fair = run("throttled, fair", MetaThrottle(**settings))
+    stats = fair.stats()
+    print(f"\nfair run: calls={stats['calls']} waits={stats['waits']} retries={stats['retries']} "
+          f"waited={stats['waited_seconds']} s")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Optimization scheduler (app.optimization_scheduler) over many organizations.
+
+Every organization gets an in-process ad connector whose fetch and budget
+updates sleep like platform calls, and a sales sheet of `campaigns`
+campaigns (planned by plan_campaigns, the CPU part). Reports, with the
+planning done on the I/O threads (processes=0) and on a process pool:
+- time to run every due organization once, and the orgs/hour it amounts to
+- p50 / max of the fetch, optimize and apply steps
+- optimization_run rows recorded, and that a second tick finds nothing due
+  (and skips an organization whose run is still going)
+
+Uses DATABASE_URL when set (e.g. the docker-compose Postgres), a temporary
+SQLite file otherwise.
+
+Usage (from backend/):
+    python benchmarks/bench_optimization_scheduler.py [organizations] [campaigns] [latency_ms] [processes]
+"""
+import sys
+import os
+import time
+import datetime
+import asyncio
+import tempfile
+import random
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+if not os.getenv("DATABASE_URL"):
+    os.chdir(tempfile.mkdtemp(prefix="bench_optimization_scheduler_"))  # SQLite database.db goes here
+
+from sqlmodel import Session, select, func, delete
+
+from app.database import engine
+from app.migrate_db import migrate
+from app.models import Organization, OptimizationRun
+from app.optimization_scheduler import OptimizationScheduler, RUNNING
+
+WARM_UP_SECONDS = 10
+
+
+class FakeConnector:
+    """fetch() / update_budgets() of CompositeAdConnector, sleeping `latency` per call."""
+
+    def __init__(self, campaigns: dict, latency: float):
+        self.campaigns = campaigns
+        self.latency = latency
+
+    def fetch(self):
+        time.sleep(self.latency)
+        return self.campaigns, {"meta": {"ok": True}}
+
+    def update_budgets(self, changes):
+        time.sleep(self.latency)
+        return {key: {"success": True} for key in changes}
+
+
+def make_tenant(org_id: int, n_campaigns: int):
+    rng = random.Random(org_id)
+    sales, ads = {}, {}
+    for i in range(n_campaigns):
+        cid = f"{org_id}_{i}"
+        objective = rng.uniform(100, 10_000)
+        sales[cid] = {"name": f"Campaign {cid}", "actual": objective * rng.uniform(0.6, 1.4), "objective": objective}
+        ads[f"meta:{cid}"] = {
+            "name": f"Campaign {cid}", "daily_budget": round(rng.uniform(10, 500), 2),
+            "status": "ACTIVE", "platform": "meta", "platform_id": cid,
+        }
+    config = {
+        "bot_settings": {"optimization_frequency": "hourly", "auto_scaling_enabled": True},
+        "budget_rules": {},
+        "bench_org": org_id,
+    }
+    return config, {"campaigns": sales, "global_cap": n_campaigns * 5}, ads
+
+
+async def run(scheduler: OptimizationScheduler):
+    scheduler.open()
+    try:
+        # Workers are spawned by open(): measure once they are up
+        await asyncio.sleep(WARM_UP_SECONDS if scheduler.processes else 0)
+        start = time.perf_counter()
+        scheduled = await scheduler.tick()
+        await scheduler.drain()
+        elapsed = time.perf_counter() - start
+        again = await scheduler.tick()
+    finally:
+        scheduler.close()
+    return scheduled, elapsed, again
+
+
+def main():
+    n_orgs = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    n_campaigns = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.2
+    processes = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count() or 2
+
+    migrate()
+    with Session(engine) as session:
+        orgs = [Organization(name=f"Scheduler bench {i}") for i in range(n_orgs)]
+        session.add_all(orgs)
+        session.commit()
+        org_ids = [org.id for org in orgs]
+    tenants = {org_id: make_tenant(org_id, n_campaigns) for org_id in org_ids}
+
+    print(f"{n_orgs} organizations x {n_campaigns} campaigns, {latency * 1000:.0f} ms per platform call\n")
+    print(f"{'processes':>9} {'scheduled':>9} {'total':>8} {'orgs/hour':>10} {'fetch p50':>10} "
+          f"{'optimize p50':>13} {'optimize max':>13} {'apply p50':>10} {'2nd tick':>9}")
+    for n_processes in (0, processes):
+        with Session(engine) as session:
+            session.exec(delete(OptimizationRun))
+            session.commit()
+        scheduler = OptimizationScheduler(
+            load_targets=lambda: [(org_id, tenants[org_id][0]) for org_id in org_ids],
+            fetch_sales=lambda config: tenants[config["bench_org"]][1],
+            ad_connector=lambda config: FakeConnector(tenants[config["bench_org"]][2], latency),
+            io_concurrency=32,
+            processes=n_processes,
+            dry_run=False,
+        )
+        scheduled, elapsed, again = asyncio.run(run(scheduler))
+        stats = scheduler.stats()
+        durations = stats["durations"]
+        assert stats["failed"] == 0 and stats["succeeded"] == n_orgs
+        print(f"{n_processes:>9} {scheduled:>9} {elapsed:>7.1f}s {n_orgs / elapsed * 3600:>10.0f} "
+              f"{durations['fetch']['p50_ms']:>8.0f}ms {durations['optimize']['p50_ms']:>11.1f}ms "
+              f"{durations['optimize']['max_ms']:>11.1f}ms {durations['apply']['p50_ms']:>8.0f}ms {again:>9}")
+
+    with Session(engine) as session:
+        runs = session.exec(select(func.count()).select_from(OptimizationRun)).one()
+        changes = session.exec(select(func.sum(OptimizationRun.applied))).one()
+        # An organization whose run is still going is skipped, even once due
+        session.exec(delete(OptimizationRun).where(OptimizationRun.organization_id == org_ids[0]))
+        started = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=2)
+        session.add(OptimizationRun(organization_id=org_ids[0], status=RUNNING, started_at=started))
+        session.commit()
+    scheduler = OptimizationScheduler(load_targets=lambda: [(org_ids[0], tenants[org_ids[0]][0])],
+                                      fetch_sales=None, ad_connector=None, stale_run_seconds=4 * 3600)
+    assert scheduler.due() == [] and scheduler.stats()["skipped_overlap"] == 1
+    print(f"\n{runs} runs recorded, {changes} budget changes applied; running organization skipped")
+
+
+if __name__ == "__main__":
+    main()
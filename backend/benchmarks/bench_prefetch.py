@@ -0,0 +1,140 @@
+"""
+Background prefetch against the local stand-in Sheets/Drive server (plus a
+simulated Meta latency).
+
+Runs the PrefetchScheduler for N tenants with short intervals, then simulates
+dashboard loads and compares the time a handler spends getting its data:
+- inline: sales payload + ad campaigns fetched during the request
+- prefetched: served from the warm TenantSnapshot (inline fetch on a miss)
+and checks that no more than `concurrency` tenants are refreshed at once and
+that the per-upstream quotas hold.
+
+Usage (from backend/):
+    python benchmarks/bench_prefetch.py [tenants] [seconds] [concurrency]
+"""
+import sys
+import os
+import time
+import random
+import asyncio
+import tempfile
+import logging
+import threading
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeGoogleServer, template_tabs, write_service_account
+from antigravity_ads.connectors.google_sheet_connector import GoogleSheetConnector
+from app.prefetch import PrefetchScheduler
+
+# Simulated round trip of the Meta campaigns call
+META_LATENCY = 0.15
+
+
+def main():
+    n_tenants = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 8.0
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    logging.disable(logging.WARNING)
+
+    server = FakeGoogleServer(latency=0.05).start()
+    sa_path = os.path.join(tempfile.mkdtemp(prefix="bench_prefetch_"), "service_account.json")
+    write_service_account(sa_path, server.url)
+
+    configs = {}
+    for i in range(n_tenants):
+        server.spreadsheets[f"sheet-{i}"] = template_tabs(campaigns=5)
+        configs[i + 1] = {
+            "sales_source_type": "google_sheets",
+            "google_sheets": {"spreadsheet_id": f"sheet-{i}", "api_url": server.url,
+                              "drive_api_url": server.drive_url, "service_account_path": sa_path},
+            "ad_platforms": {"meta": {"enabled": True, "ad_account_id": f"act_{i}", "access_token": "t"}},
+            "bot_settings": {"optimization_frequency": "hourly" if i % 2 else "daily"},
+        }
+
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def fetch_sales(config):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        try:
+            return GoogleSheetConnector(config["google_sheets"]).get_performance_data()
+        finally:
+            with lock:
+                in_flight -= 1
+
+    def fetch_ads(config):
+        time.sleep(META_LATENCY)
+        return {"c1": {"name": "Campaign 1", "daily_budget": 50.0, "status": "ACTIVE"}}
+
+    def dashboard_load(scheduler, organization_id):
+        config = configs[organization_id]
+        start = time.perf_counter()
+        if scheduler is None:
+            fetch_sales(config), fetch_ads(config)
+        else:
+            scheduler.record_activity(organization_id, config)
+            if scheduler.get(organization_id, config) is None:
+                scheduler.put(organization_id, config, fetch_sales(config), fetch_ads(config))
+        return time.perf_counter() - start
+
+    print(f"Tenants: {n_tenants}, duration: {duration:.0f} s, concurrency: {concurrency}, "
+          f"Sheets latency: 50 ms, Meta latency: {META_LATENCY * 1000:.0f} ms\n")
+
+    fetch_sales(configs[1])  # warm credentials
+    inline = [dashboard_load(None, random.randint(1, n_tenants)) for _ in range(20)]
+    print(f"{'inline':<12} p50={statistics.median(inline) * 1000:7.1f} ms  max={max(inline) * 1000:7.1f} ms")
+
+    # Intervals scaled down from 15 min / 1 h; quotas low enough to be hit
+    sheets_per_minute = 300
+    scheduler = PrefetchScheduler(
+        load_targets=lambda: list(configs.items()),
+        fetch_sales=fetch_sales,
+        fetch_ads=fetch_ads,
+        concurrency=concurrency,
+        quotas_per_minute={"google_sheets": sheets_per_minute, "meta": 600},
+        jitter=0.1,
+        active_interval=1.0,
+        active_window=duration,
+        intervals={"hourly": 2.0, "daily": 4.0, "weekly": 8.0},
+    )
+
+    async def run():
+        scheduler.start()
+        latencies = []
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + duration
+        # Let the first (spread) runs happen, then open dashboards
+        await asyncio.sleep(min(4.0, duration / 2))
+        while time.monotonic() < deadline:
+            organization_id = random.randint(1, n_tenants)
+            latencies.append(await loop.run_in_executor(None, dashboard_load, scheduler, organization_id))
+            await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return latencies
+
+    latencies = asyncio.run(run())
+    print(f"{'prefetched':<12} p50={statistics.median(latencies) * 1000:7.1f} ms  max={max(latencies) * 1000:7.1f} ms  "
+          f"loads={len(latencies)}")
+
+    stats = scheduler.stats()
+    print(f"\n{stats}\n")
+    assert max_in_flight <= concurrency + 1, "concurrency bound exceeded"  # +1: a handler's inline fetch
+
+    # Background Sheets reads: at most the bucket burst + the rate over the run
+    background = stats["runs"] + stats["failures"]
+    allowed = sheets_per_minute / 6 + sheets_per_minute / 60 * duration
+    assert background <= allowed + concurrency, "Sheets quota exceeded"
+    print(f"max tenants fetching at once: {max_in_flight} (limit {concurrency})")
+    print(f"background Sheets reads: {background} in {duration:.0f} s (quota allows {allowed:.0f}, "
+          f"waited {stats['quota_wait_seconds']['google_sheets']:.2f} s)")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Declarative budget rules (antigravity_ads.engine.rule_plan), from 1k to 1M
+campaigns.
+
+Reports:
+- compile: validating + compiling a rule set, and getting it back from the
+  plan cache (what every later BudgetOptimizer of the same config pays)
+- per size: a per-campaign interpreter walking the rules (what evaluating
+  the config without compiling it would do) against the compiled plan
+  through BudgetOptimizer.calculate_adjustments, checked to agree
+- the legacy thresholds written as rules give the legacy results
+
+Usage (from backend/):
+    python benchmarks/bench_rule_plan.py [max_campaigns]
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from antigravity_ads.engine.rules import BudgetOptimizer, action_names
+from antigravity_ads.engine.rule_plan import RulePlan, compile_rules, Rule
+
+RULES = [
+    {"name": "Weekend push", "priority": 30, "when": {"cvr_ratio": {"gte": 1.2}, "day_of_week": ["sat", "sun"]}, "then": {"increase": 0.25}},
+    {"name": "Small winners", "priority": 20, "when": {"cvr_ratio": {"gte": 1.1}, "spend": {"lt": 200}}, "then": {"increase": 0.2}},
+    {"name": "Winners", "priority": 10, "when": {"cvr_ratio": {"gte": 1.1}}, "then": {"increase": 0.1}},
+    {"name": "Meta losers", "priority": 10, "when": {"cvr_ratio": {"lt": 0.8}, "platform": ["meta"]}, "then": {"decrease": 0.3}},
+    {"name": "Losers", "priority": 5, "when": {"cvr_ratio": {"lte": 0.9}}, "then": {"decrease": 0.1}},
+    {"name": "Big spenders", "priority": 1, "when": {"spend": {"gte": 900}}, "then": {"multiplier": 0.95}},
+]
+LEGACY_AS_RULES = [
+    {"name": "High Performance", "priority": 2, "when": {"cvr_ratio": {"gte": 1.1}}, "then": {"increase": 0.1}},
+    {"name": "Low Performance", "priority": 1, "when": {"cvr_ratio": {"lte": 0.9}}, "then": {"decrease": 0.1}},
+]
+WEEKDAY = 5  # saturday
+
+
+def interpret(rules, ratio, spend, platform, weekday):
+    """Walks the validated rules for one campaign: multiplier of the first match by priority."""
+    for rule in rules:
+        when = rule.when
+        if when.cvr_ratio is not None and not _in_range(ratio, when.cvr_ratio):
+            continue
+        if when.spend is not None and not _in_range(spend, when.spend):
+            continue
+        if when.day_of_week is not None and weekday not in when.day_of_week:
+            continue
+        if when.platform is not None and platform not in when.platform:
+            continue
+        return rule.then.value
+    return 1.0
+
+
+def _in_range(value, bounds):
+    return ((bounds.gt is None or value > bounds.gt) and (bounds.gte is None or value >= bounds.gte)
+            and (bounds.lt is None or value < bounds.lt) and (bounds.lte is None or value <= bounds.lte))
+
+
+def main():
+    max_campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(3)
+
+    start = time.perf_counter()
+    RulePlan.from_config(RULES)
+    compile_s = time.perf_counter() - start
+    compile_rules(RULES)
+    start = time.perf_counter()
+    compile_rules(RULES)
+    cached_s = time.perf_counter() - start
+    print(f"compile {compile_s * 1e6:.0f} us, cached {cached_s * 1e6:.0f} us ({len(RULES)} rules)\n")
+
+    optimizer = BudgetOptimizer({"budget_rules": {"rules": RULES}})
+    ordered = optimizer.plan.rules
+    print(f"{'campaigns':>10} {'interpreted':>12} {'compiled':>10} {'+reasons':>10} {'speedup':>8}")
+    n = 1_000
+    while n <= max_campaigns:
+        objective = rng.uniform(100, 10_000, n)
+        actual = objective * rng.uniform(0.6, 1.4, n)
+        spend = rng.uniform(10, 1_000, n).round(2)
+        platform = rng.choice(np.array(["meta", "google", "snap"], dtype=object), n)
+        ratio = (actual / objective).tolist()
+
+        start = time.perf_counter()
+        expected = [interpret(ordered, r, s, p, WEEKDAY) for r, s, p in zip(ratio, spend.tolist(), platform.tolist())]
+        interpreted_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = optimizer.calculate_adjustments(actual, objective, spend=spend, platform=platform, weekday=WEEKDAY)
+        compiled_s = time.perf_counter() - start
+        start = time.perf_counter()
+        optimizer.calculate_adjustments(actual, objective, spend=spend, platform=platform, weekday=WEEKDAY, with_reasons=True)
+        reasons_s = time.perf_counter() - start
+
+        assert [float(f"{m:.2f}") for m in expected] == result["multiplier"].tolist()
+        print(f"{n:>10} {interpreted_s * 1000:>10.1f}ms {compiled_s * 1000:>8.1f}ms {reasons_s * 1000:>8.1f}ms "
+              f"{interpreted_s / compiled_s:>7.0f}x")
+        n *= 10
+
+    # The legacy thresholds, as rules: same multipliers, actions and reasons
+    actual, objective = rng.uniform(0, 20_000, 10_000), rng.uniform(0, 10_000, 10_000)
+    objective[::10] = 0
+    legacy = BudgetOptimizer({"budget_rules": {}}).calculate_adjustments(actual, objective, 0.9, with_reasons=True)
+    as_rules = BudgetOptimizer({"budget_rules": {"rules": LEGACY_AS_RULES}}).calculate_adjustments(
+        actual, objective, 0.9, with_reasons=True
+    )
+    assert legacy["multiplier"].tolist() == as_rules["multiplier"].tolist()
+    assert action_names(legacy["action"]).tolist() == action_names(as_rules["action"]).tolist()
+    assert legacy["reason"] == as_rules["reason"]
+    print("\nlegacy thresholds as rules: identical results")
+
+
+if __name__ == "__main__":
+    main()
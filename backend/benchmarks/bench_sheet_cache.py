@@ -0,0 +1,103 @@
+"""
+Sheet data cache against the local stand-in Sheets/Drive server.
+
+Simulates dashboard loads (/api/campaigns + /api/global-status both read the
+sheet) for N tenants while some sheets are edited, and compares:
+- no cache: every load reads the sheet values
+- revision checks: values reread only when the Drive version moved
+- push: Drive notifications invalidate entries, no polling in between
+- TTL fallback: Drive metadata unavailable, entries expire after the TTL
+reporting Google requests, hit ratio and staleness, and checking that every
+edit is visible after at most one revision-check interval (or immediately
+after a push notification).
+
+Usage (from backend/):
+    python benchmarks/bench_sheet_cache.py [tenants] [loads] [latency_ms]
+"""
+import sys
+import os
+import time
+import tempfile
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeGoogleServer, template_tabs, write_service_account
+from antigravity_ads.connectors.google_sheet_connector import GoogleSheetConnector
+from antigravity_ads.connectors.google_sheet_cache import SheetDataCache
+
+
+def main():
+    n_tenants = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n_loads = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.03
+    logging.disable(logging.WARNING)
+
+    server = FakeGoogleServer(latency=latency).start()
+    sa_path = os.path.join(tempfile.mkdtemp(prefix="bench_sheet_cache_"), "service_account.json")
+    write_service_account(sa_path, server.url)
+
+    def reset_sheets():
+        for i in range(n_tenants):
+            server.spreadsheets[f"sheet-{i}"] = template_tabs(campaigns=5)
+
+    def connector(i, drive_url=server.drive_url):
+        return GoogleSheetConnector({
+            "spreadsheet_id": f"sheet-{i}", "api_url": server.url,
+            "drive_api_url": drive_url, "service_account_path": sa_path
+        })
+
+    print(f"Tenants: {n_tenants}, dashboard loads: {n_loads}, simulated Google latency: {latency * 1000:.0f} ms\n")
+
+    def run(label, read, drive_url=server.drive_url, on_edit=None, check_interval=0.0):
+        reset_sheets()
+        connector(0, drive_url)._get_service()  # warm credentials
+        server.reset_counts()
+        start = time.perf_counter()
+        edits = 0
+        for load in range(n_loads):
+            i = load % n_tenants
+            if load and load % 50 == 0:
+                # A sales rep updates the daily cap of this tenant's sheet
+                edits += 1
+                cap = str(300 + edits)
+                server.edit(f"sheet-{i}", template_tabs(campaigns=5, daily_cap=cap))
+                if on_edit:
+                    on_edit(f"sheet-{i}")
+                time.sleep(check_interval)
+                payload = read(connector(i, drive_url))
+                assert payload["global_cap"] == float(cap), f"{label}: edit not visible"
+            read(connector(i, drive_url))  # /api/campaigns
+            read(connector(i, drive_url))  # /api/global-status
+        elapsed = time.perf_counter() - start
+        counts = {k: v for k, v in sorted(server.requests.items()) if k != "token"}
+        print(f"{label:<18} {elapsed:6.2f} s  requests={counts}")
+
+    run("no cache", lambda c: c.get_performance_data())
+
+    cache = SheetDataCache(revision_check_seconds=0.05)
+    run("revision checks", cache.get, check_interval=0.05)
+    print(f"{'':<18} {cache.stats()}")
+
+    push_cache = SheetDataCache(revision_check_seconds=3600, webhook_url="https://api.example.com/api/webhooks/google-drive",
+                                webhook_token="bench-secret")
+
+    def notify(spreadsheet_id):
+        # What Google POSTs to /api/webhooks/google-drive after an edit
+        for channel_id, channel in server.channels.items():
+            if channel["fileId"] == spreadsheet_id:
+                assert push_cache.handle_notification(channel_id, channel["token"], "update")
+        assert not push_cache.handle_notification("unknown", "wrong-token", "update")
+
+    run("push", push_cache.get, on_edit=notify)
+    print(f"{'':<18} {push_cache.stats()}")
+
+    ttl_cache = SheetDataCache(revision_check_seconds=0.0, ttl_seconds=0.2)
+    run("TTL fallback", ttl_cache.get, drive_url=f"{server.url}/unavailable", check_interval=0.2)
+    print(f"{'':<18} {ttl_cache.stats()}")
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Sheet parsing: previous cell-by-cell loop vs the vectorized SheetLayout parser.
+
+Parses performance grids of 10 to 10,000 campaign columns with both (with
+and without unparseable cells) and checks they produce the same payload,
+then checks the locale formats only the new parser understands
+(non-breaking spaces, '6,30 %', '1 400,5').
+
+Usage (from backend/):
+    python benchmarks/bench_sheet_parser.py [max_columns]
+"""
+import sys
+import os
+import time
+import random
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from antigravity_ads.connectors.sheet_layout import SheetLayout
+
+
+def legacy_parse(value_ranges):
+    """GoogleSheetConnector.parse_value_ranges before SheetLayout (fixed rows 0/7/8, column 2+)."""
+    data = {"campaigns": {}, "global_cap": None, "global_cap_weekly": None}
+    rows = value_ranges[0] if len(value_ranges) > 0 else []
+    rows_res = value_ranges[1] if len(value_ranges) > 1 else []
+
+    def parse_percentage(val):
+        if not val:
+            return 0.0
+        val = val.replace('%', '').replace(',', '.').strip()
+        return float(val) if val else 0.0
+
+    if len(rows) >= 9:
+        campaign_names, cvr_actuals, cvr_objs = rows[0], rows[7], rows[8]
+        for i in range(2, len(campaign_names)):
+            if i >= len(cvr_actuals) or i >= len(cvr_objs):
+                break
+            c_name = campaign_names[i].strip()
+            if not c_name:
+                continue
+            try:
+                actual_val = parse_percentage(cvr_actuals[i])
+                obj_val = parse_percentage(cvr_objs[i])
+                c_id = c_name.lower().replace(" ", "_")
+                data["campaigns"][c_id] = {"name": c_name, "actual": actual_val, "objective": obj_val, "metric_name": "CVR"}
+            except (ValueError, IndexError):
+                continue
+
+    if len(rows_res) > 4:
+        row_cap = rows_res[4]
+        if len(row_cap) > 1:
+            try:
+                data["global_cap"] = float(row_cap[1].replace(',', '').replace(' ', ''))
+                if len(row_cap) > 2:
+                    data["global_cap_weekly"] = float(row_cap[2].replace(',', '').replace(' ', ''))
+            except ValueError:
+                pass
+    return data
+
+
+def grid(columns: int, seed: int = 0, bad_cells: bool = True):
+    """Performance + resources values with `columns` campaigns (some blanks, and "n/a" cells)."""
+    rng = random.Random(seed)
+    names = ["W1", ""] + [("" if i % 97 == 13 else f"Campaign {i + 1}") for i in range(columns)]
+    actual = ["CVR", ""] + [
+        "" if i % 53 == 7 else ("n/a" if bad_cells and i % 211 == 5 else f"{rng.randint(0, 9)},{rng.randint(0, 99):02d}%")
+        for i in range(columns)
+    ]
+    objective = ["Objectif", ""] + [f"{rng.randint(3, 6)}%" for _ in range(columns)]
+    performance = [names] + [[] for _ in range(6)] + [actual, objective]
+    resources = [["", "Jour", "Semaine"], [], [], [], ["Nombre de leads", "280", "1,400"]]
+    return [performance, resources]
+
+
+def timed(fn, *args, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    max_columns = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    layout = SheetLayout()
+
+    for bad_cells in (False, True):
+        print(f"\n{'columns':>8} {'legacy':>11} {'vectorized':>11} {'campaigns':>10}   ({'with' if bad_cells else 'no'} n/a cells)")
+        columns = 10
+        while columns <= max_columns:
+            value_ranges = grid(columns, bad_cells=bad_cells)
+            legacy_time, legacy = timed(legacy_parse, value_ranges)
+            new_time, parsed = timed(layout.parse, value_ranges)
+            assert parsed == legacy, f"payload mismatch at {columns} columns"
+            print(f"{columns:>8} {legacy_time * 1000:>8.2f} ms {new_time * 1000:>8.2f} ms {len(parsed['campaigns']):>10}")
+            columns *= 10
+
+    # Locale formats: narrow / non-breaking spaces, decimal commas
+    performance = [
+        ["W1", "", "Campagne A", "Campagne B"],
+        [], [], [], [], [], [],
+        ["CVR", "", "6,30 %", " 12,5 %"],
+        ["Objectif", "", "5 %", "10%"],
+    ]
+    resources = [[], [], [], [], ["Nombre de leads", "1 400,5", "7 002,5"]]
+    french = SheetLayout.from_config({"number_decimal": ","})
+    parsed = french.parse([performance, resources])
+    assert parsed["campaigns"]["campagne_a"]["actual"] == 6.3
+    assert parsed["campaigns"]["campagne_b"]["actual"] == 12.5
+    assert parsed["global_cap"] == 1400.5 and parsed["global_cap_weekly"] == 7002.5
+    print("\nlocale formats: ok", parsed["global_cap"], parsed["global_cap_weekly"])
+
+
+if __name__ == "__main__":
+    main()
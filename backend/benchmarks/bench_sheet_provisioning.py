@@ -0,0 +1,110 @@
+"""
+Client sheet provisioning against the local stand-in Drive server.
+
+Compares, for N new clients:
+- legacy: the request copies the template, then shares it (two Drive round
+  trips, request blocked until both are done)
+- jobs: the request submits a SheetJob and returns; copy + permission go
+  out as one batch request (file IDs reserved 10 at a time)
+reporting how long the request is held, the provisioning time (and with the
+job queue: time to a usable sheet) and the Drive HTTP requests made. Also
+runs with batch parts executed out of order to check the permission retry.
+
+Usage (from backend/):
+    python benchmarks/bench_sheet_provisioning.py [clients] [latency_ms] [copy_ms]
+"""
+import sys
+import os
+import time
+import tempfile
+import logging
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeGoogleServer, write_service_account
+from antigravity_ads.connectors.google_drive_service import GoogleDriveService, TEMPLATE_SPREADSHEET_ID
+from app.sheet_jobs import SheetProvisioningJobs, FINISHED_STATES, COMPLETED
+
+
+def legacy_copy(drive_service: GoogleDriveService, client_name: str, client_email: str):
+    # copy_template before batching: files.copy, then permissions.create
+    drive = drive_service._get_drive_service()
+    copied = drive.files().copy(
+        fileId=TEMPLATE_SPREADSHEET_ID, body={"name": f"Antigravity - {client_name}"}, supportsAllDrives=True
+    ).execute()
+    drive.permissions().create(
+        fileId=copied["id"], body={"type": "user", "role": "writer", "emailAddress": client_email},
+        sendNotificationEmail=True
+    ).execute()
+    return copied["id"]
+
+
+def main():
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    copy_latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 1500 / 1000
+    logging.disable(logging.WARNING)
+
+    server = FakeGoogleServer(latency=latency, copy_latency=copy_latency).start()
+    sa_path = os.path.join(tempfile.mkdtemp(prefix="bench_provisioning_"), "service_account.json")
+    write_service_account(sa_path, server.url)
+    drive_service = GoogleDriveService(sa_path, api_url=server.drive_url)
+    drive_service._get_drive_service()  # warm credentials and discovery
+
+    print(f"Clients: {n_clients}, Drive latency: {latency * 1000:.0f} ms, copy time: {copy_latency * 1000:.0f} ms\n")
+
+    server.reset_counts()
+    held = []
+    for i in range(n_clients):
+        start = time.perf_counter()
+        legacy_copy(drive_service, f"Legacy {i}", f"client{i}@example.com")
+        held.append(time.perf_counter() - start)
+    counts = {k: v for k, v in sorted(server.requests.items()) if k != "token"}
+    print(f"{'legacy':<14} request held p50={statistics.median(held) * 1000:7.1f} ms  "
+          f"provisioning p50={statistics.median(held) * 1000:7.1f} ms  drive={counts}")
+
+    jobs_workers = 2
+
+    def run(label):
+        server.reset_counts()
+        jobs = SheetProvisioningJobs(
+            provision=lambda job, on_progress: drive_service.copy_template(
+                job.client_name, job.client_email, on_progress=on_progress
+            ),
+            on_complete=lambda job, result: None,
+            max_workers=jobs_workers,
+        )
+        held, submitted = [], []
+        for i in range(n_clients):
+            start = time.perf_counter()
+            job = jobs.submit(i + 1, f"{label} {i}", f"client{i}@example.com")
+            held.append(time.perf_counter() - start)
+            submitted.append(job.id)
+
+        ready, provisioning = [], []
+        pending = set(submitted)
+        while pending:
+            for job_id in list(pending):
+                job = jobs.get(job_id)
+                if job.status in FINISHED_STATES:
+                    assert job.status == COMPLETED, job.error
+                    assert server.permissions[job.spreadsheet_id], "sheet not shared"
+                    ready.append(job.finished_at - job.created_at)
+                    provisioning.append(job.finished_at - job.started_at)
+                    pending.discard(job_id)
+            time.sleep(0.005)
+        jobs.shutdown()
+        counts = {k: v for k, v in sorted(server.requests.items()) if k != "token"}
+        print(f"{label:<14} request held p50={statistics.median(held) * 1000:7.3f} ms  "
+              f"provisioning p50={statistics.median(provisioning) * 1000:7.1f} ms  drive={counts}")
+        print(f"{'':<14} sheet ready (incl. queue, {jobs_workers} workers) p50={statistics.median(ready) * 1000:7.1f} ms")
+
+    run("jobs")
+    server.batch_reversed = True
+    run("jobs reversed")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
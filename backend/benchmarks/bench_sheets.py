@@ -0,0 +1,88 @@
+"""
+Sheets reads against a local stand-in Sheets server with Google-like latency.
+
+Compares, for N client spreadsheets:
+- legacy: two sequential values.get calls per sheet (previous connector)
+- batched: one values.batchGet per sheet (get_performance_data)
+- async: batchGet for all sheets concurrently (get_performance_data_many)
+and reports the number of Sheets requests each mode sent.
+
+Usage (from backend/):
+    python benchmarks/bench_sheets.py [sheets] [latency_ms]
+"""
+import sys
+import os
+import time
+import asyncio
+import tempfile
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_google import FakeGoogleServer, template_tabs, write_service_account
+from antigravity_ads.connectors.google_sheet_connector import (
+    GoogleSheetConnector, get_performance_data_many, PERFORMANCE_RANGE, RESOURCES_RANGE
+)
+
+
+def main():
+    n_sheets = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.08
+    logging.disable(logging.INFO)
+
+    server = FakeGoogleServer(latency=latency).start()
+    for i in range(n_sheets):
+        server.spreadsheets[f"sheet-{i}"] = template_tabs(campaigns=5 + i % 10)
+
+    sa_path = os.path.join(tempfile.mkdtemp(prefix="bench_sheets_"), "service_account.json")
+    write_service_account(sa_path, server.url)
+
+    def connectors():
+        return [
+            GoogleSheetConnector({"spreadsheet_id": f"sheet-{i}", "api_url": server.url, "service_account_path": sa_path})
+            for i in range(n_sheets)
+        ]
+
+    print(f"Sheets: {n_sheets}, simulated Google latency: {latency * 1000:.0f} ms\n")
+
+    def report(label, elapsed, results):
+        counts = {k: v for k, v in server.requests.items() if k != "token"}
+        print(f"{label:<28} {elapsed * 1000:9.1f} ms  requests={counts}")
+        server.reset_counts()
+        return results
+
+    conns = connectors()
+    for c in conns:
+        c._get_access_token()  # warm credentials and discovery, not part of the comparison
+        c._get_values()
+    server.reset_counts()
+
+    start = time.perf_counter()
+    for c in conns:
+        values = c._get_values()
+        c.parse_value_ranges([c._get_range(values, PERFORMANCE_RANGE), c._get_range(values, RESOURCES_RANGE)])
+    report("legacy (2 x values.get)", time.perf_counter() - start, None)
+
+    start = time.perf_counter()
+    batched = [c.get_performance_data() for c in conns]
+    report("batched (1 x batchGet)", time.perf_counter() - start, batched)
+
+    start = time.perf_counter()
+    concurrent = asyncio.run(get_performance_data_many(conns))
+    report("async (batchGet, concurrent)", time.perf_counter() - start, concurrent)
+
+    assert batched == concurrent
+    assert batched[0]["global_cap"] == 280.0 and batched[0]["global_cap_weekly"] == 1400.0
+    assert len(batched[0]["campaigns"]) == 5
+
+    # A missing tab makes batchGet fail: the connector falls back to per-range reads
+    server.spreadsheets["sheet-0"].pop("Ressources Sales")
+    fallback = conns[0].get_performance_data()
+    assert len(fallback["campaigns"]) == 5 and fallback["global_cap"] is None
+    report("fallback (missing tab)", 0.0, fallback)
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Warm template pool against the local stand-in Drive server.
+
+- claim latency: taking a pre-copied sheet (rename, move to the client
+  folder + share batch) vs the full template copy, including the fallback
+  once the pool is empty
+- refill: copies created per refill batch request
+- template edit: copies of the old revision are retired and replaced
+- concurrent claims: N threads racing for a smaller pool never get the same
+  copy
+
+Uses DATABASE_URL when set (e.g. the docker-compose Postgres), a temporary
+SQLite file otherwise.
+
+Usage (from backend/):
+    python benchmarks/bench_template_pool.py [pool_size] [latency_ms] [copy_ms]
+"""
+import sys
+import os
+import time
+import tempfile
+import logging
+import statistics
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+if not os.getenv("DATABASE_URL"):
+    os.chdir(tempfile.mkdtemp(prefix="bench_template_pool_"))  # SQLite database.db goes here
+
+from sqlmodel import Session, delete
+
+from benchmarks.fake_google import FakeGoogleServer, template_tabs, write_service_account
+from antigravity_ads.connectors.google_drive_service import GoogleDriveService, TEMPLATE_SPREADSHEET_ID
+from app.database import engine
+from app.migrate_db import migrate
+from app.models import Organization, TemplateCopy
+from app.template_pool import TemplatePool, AVAILABLE
+
+
+def main():
+    pool_size = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    copy_latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.5
+    logging.disable(logging.WARNING)
+
+    migrate()
+    with Session(engine) as session:
+        session.exec(delete(TemplateCopy))
+        orgs = [Organization(name=f"Pool bench {i}") for i in range(2 * pool_size)]
+        session.add_all(orgs)
+        session.commit()
+        org_ids = [org.id for org in orgs]
+
+    server = FakeGoogleServer(latency=latency, copy_latency=copy_latency).start()
+    server.spreadsheets[TEMPLATE_SPREADSHEET_ID] = template_tabs()
+    sa_path = os.path.join(tempfile.mkdtemp(prefix="bench_template_pool_"), "service_account.json")
+    write_service_account(sa_path, server.url)
+    drive_service = GoogleDriveService(sa_path, api_url=server.drive_url)
+    pool = TemplatePool(lambda: drive_service, target_size=pool_size, refill_batch=pool_size)
+
+    print(f"Pool size: {pool_size}, Drive latency: {latency * 1000:.0f} ms, copy time: {copy_latency * 1000:.0f} ms\n")
+
+    start = time.perf_counter()
+    created = pool.refill_once()
+    print(f"refill: {created} copies in {time.perf_counter() - start:.2f} s, drive={dict(server.requests)}")
+
+    # Sequential onboarding: the pool first, full copies once it is empty
+    server.reset_counts()
+    pooled, fallback = [], []
+    for i, org_id in enumerate(org_ids[:pool_size + 2]):
+        start = time.perf_counter()
+        result = pool.claim(org_id, f"Client {i}", f"client{i}@example.com", "client-folder")
+        if result is None:
+            result = drive_service.copy_template(f"Client {i}", f"client{i}@example.com", "client-folder")
+            fallback.append(time.perf_counter() - start)
+        else:
+            pooled.append(time.perf_counter() - start)
+        assert server.names[result["spreadsheet_id"]] == f"Antigravity - Client {i}"
+        assert server.permissions[result["spreadsheet_id"]], "not shared"
+        assert server.parents[result["spreadsheet_id"]] == ["client-folder"]
+    print(f"claim from pool: p50={statistics.median(pooled) * 1000:7.1f} ms ({len(pooled)} claims)")
+    print(f"full copy:       p50={statistics.median(fallback) * 1000:7.1f} ms ({len(fallback)} when empty)")
+
+    pool.refill_once()
+    # The template is edited: available copies are now outdated
+    server.edit(TEMPLATE_SPREADSHEET_ID, template_tabs(campaigns=6))
+    server.reset_counts()
+    pool.refill_once()
+    depth = pool.depth()
+    assert depth[AVAILABLE] == pool_size
+    print(f"after template edit: depth={depth} drive={dict(server.requests)}")
+
+    # Concurrent claims for a pool smaller than the number of clients
+    claimed = []
+    barrier = threading.Barrier(len(org_ids))
+
+    def claim(org_id):
+        barrier.wait()
+        result = pool.claim(org_id, f"Race {org_id}")
+        if result:
+            claimed.append(result["spreadsheet_id"])
+
+    threads = [threading.Thread(target=claim, args=(org_id,)) for org_id in org_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(claimed) == len(set(claimed)) == pool_size, claimed
+    print(f"concurrent claims: {len(org_ids)} clients, {len(claimed)} distinct copies claimed")
+
+    print(f"\n{pool.stats()}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Local stand-in for the Google OAuth token endpoint, the Sheets v4 values API
+and the Drive v3 file metadata / watch / copy / update / delete /
+permissions endpoints (the last four through the Drive batch endpoint too).
+
+Serves spreadsheets from memory, counts the requests it receives and can add
+artificial latency to mimic the real Google round trip. Used by the Sheets
+benchmarks; point a connector at it with:
+
+    server = FakeGoogleServer(latency=0.05)
+    server.start()
+    server.spreadsheets["sheet-1"] = {"Feuille 1": rows, "Ressources Sales": rows}
+    write_service_account(path, server.url)
+    GoogleSheetConnector({"spreadsheet_id": "sheet-1", "api_url": server.url,
+                          "drive_api_url": server.drive_url,
+                          "service_account_path": path})
+
+Use `server.edit(spreadsheet_id, tabs)` to change a sheet: it bumps the Drive
+version like a real edit. Watch requests are recorded in `server.channels`,
+permissions in `server.permissions`, file names in `server.names` and
+parent folders in `server.parents` (one per file, as Drive enforces).
+`copy_latency` adds the time Drive takes to copy a file; `batch_reversed`
+runs batch parts last to first (Drive does not guarantee their order).
+"""
+import json
+import re
+import threading
+import time
+import uuid
+import datetime
+from collections import Counter, defaultdict
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+_CELL = re.compile(r"([A-Z]+)(\d+)")
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for ch in letters:
+        index = index * 26 + (ord(ch) - ord("A") + 1)
+    return index - 1
+
+
+def slice_range(tabs: dict, a1_range: str):
+    """Values of an A1 range like "Feuille 1!A1:Z10" or "Feuille 1!1:9" (None when the tab is missing)."""
+    tab, _, cells = a1_range.partition("!")
+    rows = tabs.get(tab.strip("'"))
+    if rows is None:
+        return None
+    if not cells:
+        return rows
+    start, _, end = cells.partition(":")
+    if start.isdigit():
+        # Whole rows ("1:9"): every column
+        values = [list(row) for row in rows[int(start) - 1:int(end or start)]]
+    else:
+        c0, r0 = _CELL.fullmatch(start).groups()
+        c1, r1 = _CELL.fullmatch(end or start).groups()
+        values = [row[_column_index(c0):_column_index(c1) + 1] for row in rows[int(r0) - 1:int(r1)]]
+    # Like the real API: trailing empty rows are omitted
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+
+class FakeGoogleServer:
+    def __init__(self, latency: float = 0.0, copy_latency: float = 0.0):
+        self.latency = latency
+        self.copy_latency = copy_latency
+        self.batch_reversed = False
+        self.spreadsheets = {}
+        self.versions = Counter()
+        self.channels = {}
+        self.permissions = defaultdict(list)
+        self.names = {}
+        self.parents = {}
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def drive_url(self) -> str:
+        return f"{self.url}/drive/v3"
+
+    def edit(self, spreadsheet_id: str, tabs: dict):
+        self.spreadsheets[spreadsheet_id] = tabs
+        with self._lock:
+            self.versions[spreadsheet_id] += 1
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def count(self, kind: str):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+
+    def drive_call(self, method: str, path: str, body: dict):
+        """(status, response) of one Drive files / permissions call (direct or batched)."""
+        url = urlparse(path)
+        file = re.fullmatch(r"/drive/v3/files/([^/]+)", url.path)
+        copy = re.fullmatch(r"/drive/v3/files/([^/]+)/copy", url.path)
+        permission = re.fullmatch(r"/drive/v3/files/([^/]+)/permissions", url.path)
+        if method == "GET" and url.path == "/drive/v3/files/generateIds":
+            self.count("generate_ids")
+            count = int(parse_qs(url.query).get("count", ["10"])[0])
+            return 200, {"kind": "drive#generatedIds", "space": "drive", "ids": [uuid.uuid4().hex for _ in range(count)]}
+        if method == "POST" and copy:
+            self.count("copy")
+            time.sleep(self.copy_latency)
+            file_id = body.get("id") or uuid.uuid4().hex
+            source = self.spreadsheets.get(copy.group(1))
+            self.spreadsheets[file_id] = source if source is not None else template_tabs()
+            self.names[file_id] = body.get("name")
+            self.parents[file_id] = list(body.get("parents") or ["root"])
+            return 200, {"kind": "drive#file", "id": file_id, "name": body.get("name"),
+                         "mimeType": "application/vnd.google-apps.spreadsheet"}
+        if method in ("PATCH", "DELETE") and file:
+            file_id = file.group(1)
+            self.count("update" if method == "PATCH" else "delete")
+            if file_id not in self.spreadsheets:
+                return 404, {"error": {"code": 404, "message": f"File not found: {file_id}."}}
+            if method == "DELETE":
+                del self.spreadsheets[file_id]
+                self.names.pop(file_id, None)
+                self.parents.pop(file_id, None)
+                return 204, None
+            query = parse_qs(url.query)
+            parents = [p for p in self.parents.get(file_id, ["root"])
+                       if p not in query.get("removeParents", [""])[0].split(",")]
+            parents += [p for p in query.get("addParents", [""])[0].split(",") if p and p not in parents]
+            if len(parents) > 1:
+                # Drive's single-parent rule
+                return 403, {"error": {"code": 403, "message": "Increasing the number of parents is not allowed",
+                                       "errors": [{"reason": "cannotAddParent"}]}}
+            self.parents[file_id] = parents
+            self.names[file_id] = body.get("name", self.names.get(file_id))
+            return 200, {"kind": "drive#file", "id": file_id, "name": self.names[file_id]}
+        if method == "POST" and permission:
+            self.count("permission")
+            file_id = permission.group(1)
+            if file_id not in self.spreadsheets:
+                return 404, {"error": {"code": 404, "message": f"File not found: {file_id}."}}
+            self.permissions[file_id].append(body)
+            return 200, {"kind": "drive#permission", "id": uuid.uuid4().hex, **body}
+        return 404, {"error": "not found"}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes: avoid the delayed-ACK stall
+            disable_nagle_algorithm = True
+
+            def _send(self, status: int, body: dict):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _batch(self, body: bytes):
+                # multipart/mixed of application/http parts, answered the same way
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+                )
+                parts = list(message.iter_parts())
+                responses = {}
+                for part in (reversed(parts) if fake.batch_reversed else parts):
+                    request = part.get_payload(decode=True).decode()
+                    head, _, part_body = request.partition("\r\n\r\n") if "\r\n\r\n" in request else request.partition("\n\n")
+                    method, path, _ = head.splitlines()[0].split(" ", 2)
+                    status, response = fake.drive_call(method, path, json.loads(part_body) if part_body.strip() else {})
+                    responses[part["Content-ID"]] = (status, response)
+
+                boundary = uuid.uuid4().hex
+                chunks = []
+                for part in parts:
+                    status, response = responses[part["Content-ID"]]
+                    content_id = part["Content-ID"].replace("<", "<response-", 1)
+                    chunks.append(
+                        f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n"
+                        f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}\r\n"
+                        f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                        f"{json.dumps(response) if response is not None else ''}\r\n"
+                    )
+                payload = ("".join(chunks) + f"--{boundary}--\r\n").encode()
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                url = urlparse(self.path)
+                watch = re.fullmatch(r"/drive/v3/files/([^/]+)/watch", url.path)
+                if self.path.startswith("/token"):
+                    fake.count("token")
+                    self._send(200, {"access_token": "fake-token", "expires_in": 3600, "token_type": "Bearer"})
+                elif watch:
+                    fake.count("watch")
+                    channel = json.loads(body)
+                    ttl = int(channel.get("params", {}).get("ttl", 3600))
+                    fake.channels[channel["id"]] = {**channel, "fileId": watch.group(1)}
+                    self._send(200, {
+                        "kind": "api#channel",
+                        "id": channel["id"],
+                        "resourceId": f"resource-{watch.group(1)}",
+                        "expiration": str(int((time.time() + ttl) * 1000))
+                    })
+                elif url.path == "/batch/drive/v3":
+                    time.sleep(fake.latency)
+                    fake.count("batch")
+                    self._batch(body)
+                elif url.path.startswith("/drive/v3/"):
+                    time.sleep(fake.latency)
+                    self._send(*fake.drive_call("POST", self.path, json.loads(body) if body else {}))
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_GET(self):
+                time.sleep(fake.latency)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/drive/v3/files/generateIds":
+                    self._send(*fake.drive_call("GET", self.path, {}))
+                    return
+                drive = re.fullmatch(r"/drive/v3/files/([^/]+)", url.path)
+                if drive:
+                    fake.count("drive_get")
+                    if drive.group(1) not in fake.spreadsheets:
+                        self._send(404, {"error": {"code": 404, "message": "File not found."}})
+                        return
+                    version = 1 + fake.versions[drive.group(1)]
+                    modified = datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=version)
+                    self._send(200, {"version": str(version), "modifiedTime": modified.isoformat() + "Z",
+                                     "parents": fake.parents.get(drive.group(1), ["root"])})
+                    return
+                match = re.fullmatch(r"/v4/spreadsheets/([^/]+)/values(?::batchGet|/(.+))", url.path)
+                if not match:
+                    self._send(404, {"error": "not found"})
+                    return
+
+                tabs = fake.spreadsheets.get(match.group(1))
+                if tabs is None:
+                    fake.count("not_found")
+                    self._send(404, {"error": {"code": 404, "message": "Requested entity was not found."}})
+                    return
+
+                if match.group(2) is None:
+                    fake.count("batchGet")
+                    value_ranges = []
+                    for a1_range in query.get("ranges", []):
+                        values = slice_range(tabs, a1_range)
+                        if values is None:
+                            self._send(400, {"error": {"code": 400, "message": f"Unable to parse range: {a1_range}"}})
+                            return
+                        value_ranges.append({"range": a1_range, "values": values})
+                    self._send(200, {"spreadsheetId": match.group(1), "valueRanges": value_ranges})
+                else:
+                    fake.count("get")
+                    a1_range = unquote(match.group(2))
+                    values = slice_range(tabs, a1_range)
+                    if values is None:
+                        self._send(400, {"error": {"code": 400, "message": f"Unable to parse range: {a1_range}"}})
+                        return
+                    self._send(200, {"range": a1_range, "values": values})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def template_tabs(campaigns: int = 5, daily_cap: str = "280", weekly_cap: str = "1 400") -> dict:
+    """Tabs laid out like the client template (campaigns in columns from C)."""
+    names = ["W1", ""] + [f"Campaign {i + 1}" for i in range(campaigns)]
+    performance = [names] + [[""] * len(names) for _ in range(6)]
+    performance.append(["CVR", ""] + [f"{4 + i % 5},{i % 10}0%" for i in range(campaigns)])
+    performance.append(["Objectif", ""] + ["5%" for _ in range(campaigns)])
+    resources = [["", "Jour", "Semaine"]] + [[""] for _ in range(3)] + [["Nombre de leads", daily_cap, weekly_cap]]
+    return {"Feuille 1": performance, "Ressources Sales": resources}
+
+
+def write_service_account(path: str, token_uri: str):
+    """Writes a service-account JSON with a fresh RSA key whose token_uri is the fake server."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+    with open(path, "w") as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": "local-bench",
+            "private_key_id": "local",
+            "private_key": pem,
+            "client_email": "bench@local-bench.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": f"{token_uri}/token",
+        }, f)
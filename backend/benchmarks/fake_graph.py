@@ -0,0 +1,322 @@
+"""
+Local stand-in for the Meta Graph API campaigns edge
+(GET /{version}/act_<id>/campaigns), campaign updates
+(POST /{version}/<campaign id>) and batch requests (POST / with `batch`).
+
+Serves campaigns from memory with the real paging contract: `limit`,
+`fields` projection, `effective_status` filter and `paging.cursors.after`
+plus a `next` link while there are more pages. Counts the requests it
+receives and can add artificial latency (per request and per campaign
+returned) to mimic the real round trip. Point a connector at it with:
+
+    server = FakeGraphServer(latency=0.05).start()
+    server.add_account("act_1", make_campaigns(1, 25_000))
+    MetaAdsConnector({"ad_account_id": "act_1", "access_token": "t",
+                      "graph_api_url": server.url})
+
+Accounts listed in `server.failing_accounts` answer with a Graph API error.
+The campaigns edge also takes `filtering` on updated_time (GREATER_THAN /
+LESS_THAN a unix time). `set_campaign` changes a campaign like an edit in
+Ads Manager would. Budget updates change the campaign (and its `updated_time`); with
+`unrun_every=n`, a batch leaves every n-th operation unrun (null response)
+the first time, like Graph does when a batch times out.
+
+With `account_limit=n`, an ad account accepts n calls per `usage_window`
+seconds: every response carries X-Ad-Account-Usage and
+X-Business-Use-Case-Usage headers with the share used, and calls over the
+limit get the (#80004) "too many calls to this ad-account" error.
+"""
+import base64
+import datetime
+import json
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Larger `limit` values are capped, like the real API
+MAX_PAGE_SIZE = 5000
+# Operations per batch request
+MAX_BATCH_SIZE = 50
+# Smallest daily budget accepted (in cents)
+MIN_DAILY_BUDGET = 100
+# updated_time of the first campaign of make_campaigns
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_campaigns(account: int, count: int, paused_every: int = 0) -> list:
+    """`count` campaigns of an account; every `paused_every`-th one is PAUSED."""
+    campaigns = []
+    for i in range(count):
+        paused = paused_every and i % paused_every == 0
+        campaigns.append({
+            "id": f"{account}{i:09d}",
+            "name": f"Account {account} campaign {i}",
+            "daily_budget": str(1000 + (i % 500) * 100),
+            "status": "PAUSED" if paused else "ACTIVE",
+            "effective_status": "PAUSED" if paused else "ACTIVE",
+            "objective": "OUTCOME_SALES",
+            "buying_type": "AUCTION",
+            "special_ad_categories": [],
+            "created_time": "2024-01-01T00:00:00+0000",
+            # One edit a minute, oldest first
+            "updated_time": (EPOCH + datetime.timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%S+0000"),
+        })
+    return campaigns
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S+0000", time.gmtime())
+
+
+def _unix(graph_time: str) -> float:
+    return datetime.datetime.strptime(graph_time, "%Y-%m-%dT%H:%M:%S%z").timestamp()
+
+
+def _cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+
+def _offset(cursor: str) -> int:
+    return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+
+class FakeGraphServer:
+    def __init__(self, latency: float = 0.0, item_latency: float = 0.0):
+        self.latency = latency
+        self.item_latency = item_latency
+        self.unrun_every = 0
+        self.account_limit = 0
+        self.usage_window = 60.0
+        self._calls = defaultdict(deque)
+        self.campaign_accounts = {}
+        self.accounts = {}
+        self.campaigns = {}
+        self._filtered = {}
+        self._unrun = set()
+        self.failing_accounts = set()
+        self.requests = Counter()
+        self.page_sizes = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def add_account(self, account_id: str, campaigns: list):
+        self.accounts[account_id] = []
+        self.add_campaigns(account_id, campaigns)
+
+    def add_campaigns(self, account_id: str, campaigns: list):
+        self.accounts[account_id].extend(campaigns)
+        self.campaigns.update((c["id"], c) for c in campaigns)
+        self.campaign_accounts.update((c["id"], account_id) for c in campaigns)
+        self._filtered.clear()
+
+    def set_campaign(self, campaign_id: str, **fields):
+        """Edits a campaign (e.g. status="PAUSED", effective_status="PAUSED") and bumps its updated_time."""
+        self.campaigns[campaign_id].update(fields, updated_time=_now())
+        self._filtered.clear()
+
+    def delete_campaign(self, campaign_id: str):
+        self.set_campaign(campaign_id, status="DELETED", effective_status="DELETED")
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def count(self, kind: str):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+            self.page_sizes.clear()
+
+    def usage(self, account_id: str) -> tuple:
+        """(error response or None, usage headers) of one call against the account's limit."""
+        if not self.account_limit:
+            return None, {}
+        with self._lock:
+            now = time.monotonic()
+            calls = self._calls[account_id]
+            while calls and now - calls[0] >= self.usage_window:
+                calls.popleft()
+            throttled = len(calls) >= self.account_limit
+            if not throttled:
+                calls.append(now)
+            pct = round(100.0 * len(calls) / self.account_limit, 2)
+            # Until the oldest call leaves the window
+            reset = round(self.usage_window - (now - calls[0]), 1) if calls else 0
+            if throttled:
+                self.requests["throttled"] += 1
+        headers = {
+            "X-Ad-Account-Usage": json.dumps(
+                {"acc_id_util_pct": pct, "reset_time_duration": reset, "ads_api_access_tier": "standard_access"}
+            ),
+            "X-Business-Use-Case-Usage": json.dumps({"1000": [{
+                "type": "ads_management", "call_count": pct, "total_cputime": pct / 2, "total_time": pct / 2,
+                "estimated_time_to_regain_access": 0,
+            }]}),
+        }
+        if throttled:
+            return (400, {"error": {
+                "message": "(#80004) There have been too many calls to this ad-account. Wait a bit and try again.",
+                "type": "OAuthException", "code": 80004, "error_subcode": 2446079,
+            }}), headers
+        return None, headers
+
+    def campaigns_page(self, path: str, account_id: str, query: dict) -> tuple:
+        """(status, response) of one campaigns edge request."""
+        if not query.get("access_token"):
+            return 400, {"error": {"message": "An access token is required.", "type": "OAuthException", "code": 104}}
+        if account_id in self.failing_accounts or account_id not in self.accounts:
+            return 400, {"error": {
+                "message": f"Unsupported get request. Object with ID '{account_id}' does not exist",
+                "type": "GraphMethodException", "code": 100, "error_subcode": 33,
+            }}
+
+        campaigns = self.accounts[account_id]
+        statuses = query.get("effective_status")
+        filtering = query.get("filtering")
+        if statuses or filtering:
+            key = (account_id, statuses, filtering)
+            if key not in self._filtered:
+                wanted = set(json.loads(statuses)) if statuses else None
+                conditions = [f for f in json.loads(filtering or "[]") if f["field"] == "updated_time"]
+                self._filtered[key] = [
+                    c for c in campaigns
+                    if (wanted is None or c["effective_status"] in wanted)
+                    and all((_unix(c["updated_time"]) > f["value"]) if f["operator"] == "GREATER_THAN"
+                            else (_unix(c["updated_time"]) < f["value"]) for f in conditions)
+                ]
+            campaigns = self._filtered[key]
+        limit = min(int(query.get("limit", 25)), MAX_PAGE_SIZE)
+        start = _offset(query["after"]) if query.get("after") else 0
+        page = campaigns[start:start + limit]
+        fields = query.get("fields", "id").split(",")
+
+        with self._lock:
+            self.page_sizes.append(len(page))
+        time.sleep(self.item_latency * len(page))
+        response = {"data": [{f: c[f] for f in fields if f in c} for c in page]}
+        if page:
+            end = start + len(page)
+            response["paging"] = {"cursors": {"before": _cursor(start), "after": _cursor(end)}}
+            if end < len(campaigns):
+                next_query = {**query, "after": _cursor(end)}
+                response["paging"]["next"] = f"{self.url}{path}?{urlencode(next_query)}"
+        return 200, response
+
+    def update_campaign(self, campaign_id: str, params: dict) -> tuple:
+        """(status, response) of one campaign update (direct or batched)."""
+        self.count("update")
+        campaign = self.campaigns.get(campaign_id)
+        if campaign is None:
+            return 400, {"error": {
+                "message": f"Unsupported post request. Object with ID '{campaign_id}' does not exist",
+                "type": "GraphMethodException", "code": 100, "error_subcode": 33,
+            }}
+        if "daily_budget" in params:
+            budget = int(params["daily_budget"])
+            if budget < MIN_DAILY_BUDGET:
+                return 400, {"error": {
+                    "message": "Invalid parameter", "type": "OAuthException", "code": 100,
+                    "error_user_msg": f"The daily budget must be at least {MIN_DAILY_BUDGET} cents.",
+                }}
+            campaign["daily_budget"] = str(budget)
+        campaign["updated_time"] = _now()
+        self._filtered.clear()
+        return 200, {"success": True}
+
+    def batch(self, operations: list) -> tuple:
+        """(status, response) of a batch request: one {code, headers, body} (or null) per operation."""
+        self.count("batch")
+        if len(operations) > MAX_BATCH_SIZE:
+            return 400, {"error": {
+                "message": f"Too many requests in batch message. Maximum batch size is {MAX_BATCH_SIZE}",
+                "type": "GraphBatchException", "code": 1,
+            }}
+        time.sleep(self.item_latency * len(operations))
+        responses = []
+        for index, operation in enumerate(operations):
+            path = urlparse(operation["relative_url"]).path.strip("/").split("/")
+            campaign_id = path[-1]
+            if self.unrun_every and index % self.unrun_every == 0 and campaign_id not in self._unrun:
+                self._unrun.add(campaign_id)
+                responses.append(None)
+                continue
+            params = {k: v[0] for k, v in parse_qs(operation.get("body", "")).items()}
+            status, body = self.update_campaign(campaign_id, params)
+            responses.append({
+                "code": status,
+                "headers": [{"name": "Content-Type", "value": "application/json; charset=UTF-8"}],
+                "body": json.dumps(body),
+            })
+        return 200, responses
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes: avoid the delayed-ACK stall
+            disable_nagle_algorithm = True
+
+            def _send(self, status: int, body, headers: dict = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                time.sleep(fake.latency)
+                length = int(self.headers.get("Content-Length", 0))
+                url = urlparse(self.path)
+                # The SDK sends the access token in the query string, the rest as a form
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                params.update((k, v[0]) for k, v in parse_qs(self.rfile.read(length).decode()).items())
+                if not params.get("access_token"):
+                    self._send(400, {"error": {"message": "An access token is required.", "type": "OAuthException", "code": 104}})
+                    return
+                if re.fullmatch(r"/v[0-9.]+/?", url.path) and "batch" in params:
+                    operations = json.loads(params["batch"])
+                    first = urlparse(operations[0]["relative_url"]).path.strip("/").split("/")[-1] if operations else ""
+                    error, headers = fake.usage(fake.campaign_accounts.get(first, "unknown"))
+                    self._send(*(error or fake.batch(operations)), headers)
+                    return
+                match = re.fullmatch(r"/v[0-9.]+/(\d+)/?", url.path)
+                if not match:
+                    self._send(404, {"error": {"message": "Unknown path", "type": "GraphMethodException", "code": 803}})
+                    return
+                error, headers = fake.usage(fake.campaign_accounts.get(match.group(1), "unknown"))
+                self._send(*(error or fake.update_campaign(match.group(1), params)), headers)
+
+            def do_GET(self):
+                time.sleep(fake.latency)
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                match = re.fullmatch(r"/v[0-9.]+/(act_[^/]+)/campaigns", url.path)
+                if not match:
+                    self._send(404, {"error": {"message": "Unknown path", "type": "GraphMethodException", "code": 803}})
+                    return
+                fake.count("campaigns")
+                error, headers = fake.usage(match.group(1))
+                self._send(*(error or fake.campaigns_page(url.path, match.group(1), query)), headers)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,80 @@
+"""
+Load test: N parallel first logins for the same (new) Supabase user.
+
+Fires N concurrent authenticated requests at /api/me against a fresh SQLite
+database and checks that exactly one Organization and one User were created.
+
+Usage (from backend/):
+    python benchmarks/load_first_login.py [parallel_requests]
+"""
+import sys
+import os
+import time
+import asyncio
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+JWT_SECRET = "load-test-secret-load-test-secret"
+os.environ.pop("DATABASE_URL", None)
+os.environ["NEXT_PUBLIC_SUPABASE_URL"] = "http://127.0.0.1:9"
+os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET
+os.environ["SUPABASE_AUTH_MODE"] = "local"
+
+# app.database creates database.db in the working directory
+os.chdir(tempfile.mkdtemp(prefix="first_login_"))
+
+import httpx
+from jose import jwt
+from sqlmodel import Session, select, func
+from app.main import app
+from app.database import engine
+from app.migrate_db import migrate
+from app.models import User, Organization
+
+
+def make_token(email: str) -> str:
+    return jwt.encode({
+        "sub": email,
+        "email": email,
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+        "user_metadata": {"company_name": "Burst Co", "full_name": "Burst User"},
+    }, JWT_SECRET, algorithm="HS256")
+
+
+async def fire(n: int):
+    headers = {"Authorization": f"Bearer {make_token('burst@example.com')}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[client.get("/api/me", headers=headers) for _ in range(n)])
+        elapsed = time.perf_counter() - start
+    return responses, elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    migrate()
+
+    responses, elapsed = asyncio.run(fire(n))
+    statuses = {}
+    for r in responses:
+        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    with Session(engine) as session:
+        org_count = session.exec(select(func.count(Organization.id))).one()
+        user_count = session.exec(select(func.count(User.id))).one()
+
+    print(f"Parallel first logins: {n} in {elapsed:.2f}s")
+    print(f"Status codes         : {statuses}")
+    print(f"Organizations created: {org_count}")
+    print(f"Users created        : {user_count}")
+
+    ok = org_count == 1 and user_count == 1 and statuses.get(200) == n
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
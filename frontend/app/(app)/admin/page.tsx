@@ -45,26 +45,36 @@ export default function AdminPage() {
 
         const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:8000";
 
+        // Organizations come in pages: follow X-Next-Cursor until the last one
+        const fetchAllOrganizations = async (): Promise<Organization[]> => {
+            const all: Organization[] = [];
+            let cursor: string | null = "0";
+            while (cursor !== null) {
+                const res = await fetch(`${API_URL}/api/admin/organizations?limit=500&after_id=${cursor}`, {
+                    headers: { Authorization: `Bearer ${token}` }
+                });
+                if (!res.ok) {
+                    throw new Error("Failed to fetch admin data");
+                }
+                all.push(...(await res.json()));
+                cursor = res.headers.get("X-Next-Cursor");
+            }
+            return all;
+        };
+
         try {
-            const [statsRes, orgsRes] = await Promise.all([
+            const [statsRes, orgsData] = await Promise.all([
                 fetch(`${API_URL}/api/admin/stats`, {
                     headers: { Authorization: `Bearer ${token}` }
                 }),
-                fetch(`${API_URL}/api/admin/organizations`, {
-                    headers: { Authorization: `Bearer ${token}` }
-                })
+                fetchAllOrganizations()
             ]);
 
-            if (!statsRes.ok || !orgsRes.ok) {
+            if (!statsRes.ok) {
                 throw new Error("Failed to fetch admin data");
             }
 
-            const [statsData, orgsData] = await Promise.all([
-                statsRes.json(),
-                orgsRes.json()
-            ]);
-
-            setStats(statsData);
+            setStats(await statsRes.json());
             setOrganizations(orgsData);
         } catch (err) {
             setError(err instanceof Error ? err.message : "An error occurred");
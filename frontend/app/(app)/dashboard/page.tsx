@@ -10,6 +10,8 @@ import { GlobalStatusCard } from "@/components/GlobalStatusCard";
 export default function Home() {
   const [campaigns, setCampaigns] = useState<Campaign[]>([]);
   const [globalStatus, setGlobalStatus] = useState<any>(null);
+  // Ad platforms that timed out or failed (their campaigns are missing)
+  const [platformIssues, setPlatformIssues] = useState<string[]>([]);
   const [loading, setLoading] = useState(false);
 
   // Use mock data initially if API fails (for demo purposes)
@@ -40,6 +42,11 @@ export default function Home() {
       if (!res.ok) throw new Error("Failed");
       const data = await res.json();
       setCampaigns(data);
+      // X-Ad-Platforms: "meta=ok, google=timeout"
+      const platforms = res.headers.get("X-Ad-Platforms") || "";
+      setPlatformIssues(
+        platforms.split(",").map(p => p.trim()).filter(p => p && !p.endsWith("=ok"))
+      );
 
       // Fetch Global Status
       const resStatus = await fetch("/api/global-status", { headers });
@@ -117,6 +124,12 @@ export default function Home() {
           </div>
         </header>
 
+        {platformIssues.length > 0 && (
+          <div className="mb-8 px-6 py-3 rounded-xl bg-yellow-500/10 border border-yellow-500/20 text-yellow-400 text-sm">
+            Partial data: {platformIssues.map(p => p.replace("=", " ")).join(", ")}. Campaigns from these platforms are not shown.
+          </div>
+        )}
+
         {/* Global Status Cards */}
         <GlobalStatusCard status={globalStatus} />
 
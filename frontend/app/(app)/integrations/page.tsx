@@ -274,7 +274,7 @@ export default function IntegrationsPage() {
 
                         <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
                             <div>
-                                <label className="block text-xs font-semibold text-gray-400 mb-2 uppercase">Ad Account ID</label>
+                                <label className="block text-xs font-semibold text-gray-400 mb-2 uppercase">Ad Account ID(s)</label>
                                 <input
                                     type="text"
                                     className="w-full bg-black/20 border border-white/10 rounded-lg px-4 py-3 text-white font-mono text-sm focus:border-blue-500/50 outline-none"
@@ -284,7 +284,7 @@ export default function IntegrationsPage() {
                                         newConfig.ad_platforms.meta.ad_account_id = e.target.value;
                                         setConfig(newConfig);
                                     }}
-                                    placeholder="act_123456789"
+                                    placeholder="act_123456789, act_987654321"
                                 />
                             </div>
                             <div>
@@ -75,7 +75,17 @@ export default function SalesPage() {
                 body: JSON.stringify({ client_name: clientName }),
             });
 
-            const data = await res.json();
+            let data = await res.json();
+
+            // Provisioning runs in the background: poll the job until it finishes
+            while (res.ok && data.status_url && data.status !== "completed" && data.status !== "failed") {
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                const statusRes = await fetch(data.status_url, {
+                    headers: { "Authorization": `Bearer ${token}` }
+                });
+                if (!statusRes.ok) break;
+                data = await statusRes.json();
+            }
 
             if (res.ok && data.spreadsheet_id) {
                 // Update local config with new spreadsheet ID
@@ -92,7 +102,7 @@ export default function SalesPage() {
                 // Open the new sheet in a new tab
                 window.open(data.spreadsheet_url, "_blank");
             } else {
-                setMessage(data.detail || "Failed to create sheet");
+                setMessage(data.detail || data.error || "Failed to create sheet");
             }
         } catch (e) {
             console.error("Error creating sheet", e);
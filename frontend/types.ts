@@ -16,4 +16,5 @@ export type Campaign = {
     metrics: CampaignMetrics;
     budget_recommendation: BudgetRecommendation;
     current_budget: number;
+    platform?: string | null; // Ad platform the campaign was found on
 };
@@ -2,4 +2,6 @@
 pkill -f "uvicorn app.main:app"
 export PYTHONPATH=$PYTHONPATH:/Users/lucas/Antigravity_Unify/backend
 cd /Users/lucas/Antigravity_Unify/backend
+# Same environment as uvicorn's --env-file, so both use the configured DATABASE_URL
+(set -a; . ./.env; set +a; /Users/lucas/Antigravity_Unify/venv/bin/python -m app.migrate_db)
 /Users/lucas/Antigravity_Unify/venv/bin/uvicorn app.main:app --host 0.0.0.0 --port 8000 --env-file .env